@@ -0,0 +1 @@
+from .certificates import register_commands as register_certificates
@@ -0,0 +1,111 @@
+import os
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func
+from api.models.colleges import College
+from api.services.certificate_service import CertificateService
+from api.services.certificate_batch_service import CertificateBatchService
+
+certificates_cli = AppGroup("certificates", help="Certificate maintenance commands.")
+
+@certificates_cli.command("sync-links")
+@click.option("--batch-size", default=100, show_default=True, help="Certificates committed per batch.")
+def sync_links(batch_size):
+    """Record PDF availability for certificates issued before it was persisted."""
+    try:
+        checked, found = CertificateService.sync_pdf_links(batch_size=batch_size)
+        click.echo(f"✅ Checked {checked} certificate(s); {found} PDF link(s) recorded.")
+    except Exception as e:
+        click.echo(f"❌ Error syncing certificate links: {str(e)}")
+
+@certificates_cli.command("thumbnails")
+@click.option("--batch-size", default=50, show_default=True, help="Certificates committed per batch.")
+def thumbnails(batch_size):
+    """Generate preview thumbnails for certificates issued before they existed."""
+    try:
+        checked, created = CertificateService.backfill_thumbnails(batch_size=batch_size)
+        click.echo(f"✅ Checked {checked} certificate(s); {created} thumbnail(s) created.")
+    except Exception as e:
+        click.echo(f"❌ Error generating certificate thumbnails: {str(e)}")
+
+@certificates_cli.command("issue")
+@click.option("--semester", default=None, help='Only IMs for this semester, e.g. "1st semester".')
+@click.option("--college", default=None, help="College ID or abbreviation.")
+@click.option("--workers", default=4, show_default=True, help="Parallel render/upload workers.")
+@click.option("--batch-size", default=20, show_default=True, help="Certificates committed per batch.")
+def issue(semester, college, workers, batch_size):
+    """Issue certificates for every published IM author that lacks one."""
+    college_id = None
+    if college:
+        college_obj = College.query.filter(
+            (College.id == int(college)) if college.isdigit() else (func.lower(College.abbreviation) == college.lower())
+        ).first()
+        if not college_obj:
+            click.echo(f"❌ College '{college}' not found.")
+            return
+        college_id = college_obj.id
+
+    pending = CertificateBatchService.find_pending_authors(semester=semester, college_id=college_id)
+    click.echo(f"Found {len(pending)} author(s) without a certificate.")
+    if not pending:
+        return
+
+    try:
+        stats = CertificateBatchService.issue(
+            pending,
+            workers=max(1, workers),
+            batch_size=max(1, batch_size),
+            echo=click.echo,
+        )
+    except Exception as e:
+        click.echo(f"❌ Bulk issuance stopped: {str(e)} (re-run to resume)")
+        return
+
+    avg_render = stats['render_seconds'] / stats['issued'] if stats['issued'] else 0.0
+    click.echo(
+        f"✅ Issued {stats['issued']} certificate(s), {stats['failed']} failed, "
+        f"{stats['queued']} email(s) queued, "
+        f"in {stats['elapsed']:.1f}s ({stats['per_second']:.2f} certs/s, {avg_render:.2f}s avg render+upload)."
+    )
+
+@certificates_cli.command("rerender-stale")
+@click.option("--workers", default=4, show_default=True, help="Parallel render/upload workers.")
+@click.option("--batch-size", default=20, show_default=True, help="Certificates committed per batch.")
+@click.option("--max-per-second", default=None, type=float, help="Cap on certificates uploaded to S3 per second.")
+@click.option("--max-conversions", default=None, type=int, help="Cap on concurrent renders/PDF conversions (default: workers).")
+@click.option("--checkpoint", default=None, help="Checkpoint file (default: instance/certificate-rerender.json).")
+@click.option("--include-legacy", is_flag=True,
+              help="Also sweep certificates issued before the template source was recorded (they may use an uploaded template).")
+@click.option("--dry-run", is_flag=True, help="Only count stale certificates.")
+def rerender_stale(workers, batch_size, max_per_second, max_conversions, checkpoint, include_legacy, dry_run):
+    """Re-render certificates issued from an older version of the default template."""
+    if dry_run:
+        template_hash = CertificateService._template_hash(CertificateService._download_template())
+        click.echo(f"{CertificateBatchService.count_stale(template_hash, include_legacy)} stale certificate(s).")
+        return
+
+    checkpoint_path = checkpoint or os.path.join(current_app.instance_path, 'certificate-rerender.json')
+    os.makedirs(os.path.dirname(os.path.abspath(checkpoint_path)), exist_ok=True)
+
+    try:
+        stats = CertificateBatchService.rerender_stale(
+            checkpoint_path,
+            workers=max(1, workers),
+            batch_size=max(1, batch_size),
+            max_per_second=max_per_second,
+            max_conversions=max_conversions,
+            include_legacy=include_legacy,
+            echo=click.echo,
+        )
+    except Exception as e:
+        click.echo(f"❌ Re-render sweep stopped: {str(e)} (re-run to resume)")
+        return
+
+    click.echo(
+        f"✅ Re-rendered {stats['rerendered']} certificate(s), {stats['failed']} failed, "
+        f"in {stats['elapsed']:.1f}s ({stats['per_second']:.2f} certs/s)."
+    )
+
+def register_commands(app):
+    app.cli.add_command(certificates_cli)
@@ -0,0 +1,39 @@
+import click
+from flask.cli import AppGroup
+from api.services.email_outbox_service import EmailOutboxService
+
+email_outbox_cli = AppGroup("email-outbox", help="Email outbox maintenance commands.")
+
+@click.command("email-worker")
+@click.option("--batch-size", default=None, type=int, help="Messages claimed per batch (default: EMAIL_OUTBOX_BATCH_SIZE).")
+@click.option("--interval", default=None, type=float, help="Seconds to wait when the outbox is empty.")
+@click.option("--once", is_flag=True, help="Drain everything that is due, then exit.")
+def email_worker(batch_size, interval, once):
+    """Deliver queued emails from the outbox."""
+    click.echo("📬 Email outbox dispatcher started." if not once else "📬 Draining email outbox...")
+    try:
+        EmailOutboxService.run_worker(interval=interval, once=once, batch_size=batch_size, echo=click.echo)
+    except KeyboardInterrupt:
+        pass
+    click.echo("Email outbox dispatcher stopped.")
+
+@email_outbox_cli.command("stats")
+def stats():
+    """Show queue depth and dead-lettered messages."""
+    summary = EmailOutboxService.stats()
+    oldest = summary['oldest_pending_seconds']
+    click.echo(
+        f"pending={summary['pending']} sending={summary['sending']} sent={summary['sent']} dead={summary['dead']}"
+        + (f" oldest_pending={oldest}s" if oldest is not None else "")
+    )
+
+@email_outbox_cli.command("requeue-dead")
+@click.argument("ids", nargs=-1, type=int)
+def requeue_dead(ids):
+    """Retry dead-lettered messages (all of them, or only the given IDs)."""
+    count = EmailOutboxService.requeue_dead(list(ids) or None)
+    click.echo(f"✅ Requeued {count} message(s).")
+
+def register_commands(app):
+    app.cli.add_command(email_worker)
+    app.cli.add_command(email_outbox_cli)
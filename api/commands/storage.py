@@ -0,0 +1,48 @@
+import click
+from flask.cli import AppGroup
+from api.services.storage_gc_service import StorageGCService
+
+storage_cli = AppGroup("storage", help="S3 storage maintenance commands.")
+
+def _size(num_bytes):
+    return f"{num_bytes / (1024 * 1024):.1f} MB"
+
+@storage_cli.command("gc")
+@click.option("--dry-run", is_flag=True, help="Only report orphaned objects; delete nothing.")
+@click.option("--grace-hours", default=None, type=float, help="Keep orphans younger than this (default: STORAGE_GC_GRACE_HOURS or 24).")
+@click.option("--prefix", "prefixes", multiple=True, help="Prefix to sweep (repeatable; default: every prefix the app writes to).")
+@click.option("--batch-size", default=1000, show_default=True, help="Keys per delete_objects call (max 1000).")
+def gc(dry_run, grace_hours, prefixes, batch_size):
+    """Delete S3 objects under the app's prefixes that no database row references."""
+    prefixes = list(prefixes) or StorageGCService.managed_prefixes()
+    click.echo(f"{'🔎 Dry run: scanning' if dry_run else '🧹 Collecting'} {', '.join(prefixes)}")
+    try:
+        stats = StorageGCService.collect(
+            prefixes=prefixes,
+            grace_hours=grace_hours,
+            dry_run=dry_run,
+            batch_size=max(1, batch_size),
+            echo=click.echo,
+        )
+    except Exception as e:
+        click.echo(f"❌ Storage GC stopped: {str(e)} (re-run to resume)")
+        return
+
+    if dry_run:
+        click.echo(
+            f"✅ {stats['orphaned']} orphaned object(s) ({_size(stats['orphaned_bytes'])}) would be deleted; "
+            f"{stats['too_recent']} more are inside the grace period."
+        )
+    else:
+        click.echo(
+            f"✅ Deleted {stats['deleted']} orphaned object(s) ({_size(stats['orphaned_bytes'])}) "
+            f"in {stats['delete_calls']} call(s), {stats['failed']} failed; "
+            f"{stats['too_recent']} kept inside the grace period."
+        )
+    click.echo(
+        f"Listed {stats['listed']} object(s) ({_size(stats['listed_bytes'])}) against {stats['referenced']} reference(s) "
+        f"in {stats['elapsed']:.1f}s ({stats['listed_per_second']:.0f} listed/s, {stats['deleted_per_second']:.0f} deleted/s)."
+    )
+
+def register_commands(app):
+    app.cli.add_command(storage_cli)
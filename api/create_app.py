@@ -2,7 +2,7 @@ from flask import Flask, request, jsonify, make_response
 from flask_cors import CORS
 from .config import Config
 from .extensions import db, migrate, api, ma, jwt
-from .routes import auth_blueprint, user_blueprint, department_blueprint, college_blueprint, subject_blueprint, universityim_blueprint, serviceim_blueprint, collegeincluded_blueprint, im_blueprint, author_blueprint, subject_department_blueprint, imerpimec_blueprint, departmentincluded_blueprint, activitylog_blueprint, requirements_blueprint, im_submission_blueprint, analytics_blueprint
+from .routes import auth_blueprint, user_blueprint, department_blueprint, college_blueprint, subject_blueprint, universityim_blueprint, serviceim_blueprint, collegeincluded_blueprint, im_blueprint, author_blueprint, subject_department_blueprint, imerpimec_blueprint, departmentincluded_blueprint, activitylog_blueprint, requirements_blueprint, im_submission_blueprint, analytics_blueprint, certificate_blueprint, email_blueprint
 
 from .seeds.users import register_commands as register_users
 from .seeds.departments import register_commands as register_departments
@@ -15,6 +15,9 @@ from .seeds.collegesincluded import register_commands as register_collegesinclud
 from .seeds.instructionalmaterials import register_commands as register_instructionalmaterials
 from .seeds.departmentsincluded import register_commands as register_departmentsincluded
 from .seeds.activitylogs import register_commands as register_activitylogs
+from .commands.certificates import register_commands as register_certificates
+from .commands.email import register_commands as register_email
+from .commands.storage import register_commands as register_storage
 
 def create_app():
     app = Flask(__name__)
@@ -53,6 +56,9 @@ def create_app():
     register_departmentsincluded(app)
     register_subject_departments(app)
     register_activitylogs(app)
+    register_certificates(app)
+    register_email(app)
+    register_storage(app)
     
     api.register_blueprint(auth_blueprint)
     api.register_blueprint(user_blueprint)
@@ -70,5 +76,7 @@ def create_app():
     api.register_blueprint(activitylog_blueprint)
     api.register_blueprint(analytics_blueprint)
     api.register_blueprint(requirements_blueprint)
+    api.register_blueprint(certificate_blueprint)
+    api.register_blueprint(email_blueprint)
 
     return app
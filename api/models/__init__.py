@@ -12,4 +12,8 @@ from .imerpimec import IMERPIMEC
 from .departmentsincluded import DepartmentIncluded
 from .activitylog import ActivityLog
 from .im_submissions import IMSubmission
-from .im_certificates import IMCertificate
\ No newline at end of file
+from .im_certificates import IMCertificate
+from .email_outbox import EmailOutbox
+from .notification_ledger import NotificationLedger
+from .pdf_objects import PdfObject
+from .im_certificate_aliases import IMCertificateAlias
\ No newline at end of file
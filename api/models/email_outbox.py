@@ -0,0 +1,32 @@
+from datetime import datetime, UTC
+from api.extensions import db
+
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind = db.Column(db.String(50), nullable=False)  # which EmailService call delivers it
+    payload = db.Column(db.JSON, nullable=False)  # keyword arguments for that call (attachments as S3 keys)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending | sending | sent | dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False)
+    locked_at = db.Column(db.DateTime, nullable=True)  # set while a dispatcher owns the row
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    def __init__(self, kind, payload, next_attempt_at=None):
+        now = datetime.now(UTC).replace(tzinfo=None)
+        self.kind = kind
+        self.payload = payload
+        self.status = 'pending'
+        self.attempts = 0
+        self.next_attempt_at = next_attempt_at or now
+        self.created_at = now
+
+    def __repr__(self):
+        return f'<EmailOutbox id={self.id}, kind={self.kind}, status={self.status}>'
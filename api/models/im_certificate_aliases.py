@@ -0,0 +1,20 @@
+from datetime import datetime, UTC
+from api.extensions import db
+
+class IMCertificateAlias(db.Model):
+    __tablename__ = 'im_certificate_aliases'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    qr_id = db.Column(db.String(50), unique=True, nullable=False)  # QR ID of a merged duplicate certificate
+    certificate_id = db.Column(db.Integer, db.ForeignKey('im_certificates.id', ondelete='CASCADE'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    certificate = db.relationship('IMCertificate', backref='aliases')
+
+    def __init__(self, qr_id, certificate_id):
+        self.qr_id = qr_id
+        self.certificate_id = certificate_id
+        self.created_at = datetime.now(UTC).replace(tzinfo=None)
+
+    def __repr__(self):
+        return f'<IMCertificateAlias {self.qr_id} -> {self.certificate_id}>'
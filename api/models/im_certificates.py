@@ -7,19 +7,30 @@ class IMCertificate(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     qr_id = db.Column(db.String(50), unique=True, nullable=False)
     im_id = db.Column(db.Integer, db.ForeignKey('instructionalmaterials.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    s3_link = db.Column(db.String(500), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    s3_link = db.Column(db.String(500), nullable=False)  # DOCX key (PDF key for raster-layout certificates)
+    pdf_s3_link = db.Column(db.String(500), nullable=True)  # PDF key, NULL when conversion failed
+    thumbnail_key = db.Column(db.String(500), nullable=True)  # PNG preview of page one
     date_issued = db.Column(db.Date, nullable=False)
+    template_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of the template it was rendered from
+    template_source = db.Column(db.String(500), nullable=True)  # S3 key of the default template, or 'upload'
+    input_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of template hash + every value printed on it
     created_at = db.Column(db.DateTime, default=datetime.now(UTC))
 
     instructional_material = db.relationship('InstructionalMaterial', backref='certificates')
     user = db.relationship('User', backref='certificates')
 
-    def __init__(self, qr_id, im_id, user_id, s3_link, date_issued):
+    __table_args__ = (
+        # One certificate per author per IM; concurrent requests lose the insert race
+        db.Index('ix_im_certificates_im_id_user_id', 'im_id', 'user_id', unique=True),
+    )
+
+    def __init__(self, qr_id, im_id, user_id, s3_link, date_issued, pdf_s3_link=None):
         self.qr_id = qr_id
         self.im_id = im_id
         self.user_id = user_id
         self.s3_link = s3_link
+        self.pdf_s3_link = pdf_s3_link
         self.date_issued = date_issued
 
     def __repr__(self):
@@ -15,7 +15,7 @@ class InstructionalMaterial(db.Model):
     version = db.Column(db.String(20), nullable=False)
     s3_link = db.Column(db.String(500), nullable=True)  # Made nullable for assignment workflow
     notes = db.Column(db.Text, nullable=True)
-    due_date = db.Column(db.Date, nullable=True)
+    due_date = db.Column(db.Date, nullable=True, index=True)
     semester = db.Column(db.String(20), nullable=True)  # e.g., "1st semester", "2nd semester"
     published = db.Column(db.Integer, default=0, nullable=False)
     utldo_attempt = db.Column(db.Integer, default=0, nullable=False)
@@ -0,0 +1,26 @@
+from datetime import datetime, UTC
+from api.extensions import db
+
+class NotificationLedger(db.Model):
+    __tablename__ = 'notification_ledger'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    im_id = db.Column(db.Integer, db.ForeignKey('instructionalmaterials.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # deadline_<days remaining> | past_due
+    due_date = db.Column(db.Date, nullable=False)  # the due date the notice was about
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('im_id', 'user_id', 'kind', 'due_date', name='uq_notification_ledger_im_user_kind_due'),
+    )
+
+    def __init__(self, im_id, user_id, kind, due_date):
+        self.im_id = im_id
+        self.user_id = user_id
+        self.kind = kind
+        self.due_date = due_date
+        self.created_at = datetime.now(UTC).replace(tzinfo=None)
+
+    def __repr__(self):
+        return f'<NotificationLedger im_id={self.im_id}, user_id={self.user_id}, kind={self.kind}, due_date={self.due_date}>'
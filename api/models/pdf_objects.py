@@ -0,0 +1,22 @@
+from datetime import datetime, UTC
+from api.extensions import db
+
+class PdfObject(db.Model):
+    __tablename__ = 'pdf_objects'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    sha256 = db.Column(db.String(64), nullable=False, unique=True, index=True)
+    s3_key = db.Column(db.String(500), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    notes = db.Column(db.Text, nullable=True)  # analysis result for this content
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    def __init__(self, sha256, s3_key, size, notes=None):
+        self.sha256 = sha256
+        self.s3_key = s3_key
+        self.size = size
+        self.notes = notes
+        self.created_at = datetime.now(UTC).replace(tzinfo=None)
+
+    def __repr__(self):
+        return f'<PdfObject {self.sha256[:12]}: {self.s3_key}>'
@@ -14,4 +14,6 @@ from .departmentincluded import *
 from .activitylog import *
 from .requirements import *
 from .im_submission import *
-from .analytics import *
\ No newline at end of file
+from .analytics import *
+from .certificate import *
+from .email import *
\ No newline at end of file
@@ -0,0 +1,26 @@
+from flask import request, jsonify
+from flask_smorest import Blueprint
+from api.services.certificate_verification_service import CertificateVerificationService
+
+certificate_blueprint = Blueprint('certificates', __name__, url_prefix="/certificates")
+
+@certificate_blueprint.route('/verify/<string:qr_id>', methods=['GET'])
+def verify_certificate(qr_id):
+    """
+    Public, read-only verification of a scanned certificate QR code.
+    Accepts an optional signed 'token' (embedded in newer QR codes) whose
+    claims are returned after a cheap existence check.
+    """
+    try:
+        entry, source = CertificateVerificationService.verify(qr_id, token=request.args.get('token'))
+    except ValueError as e:
+        return jsonify({'valid': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    if entry is None:
+        return jsonify({'valid': False, 'error': 'Certificate not found'}), 404
+
+    response = jsonify({'valid': True, 'source': source, **entry})
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response, 200
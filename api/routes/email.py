@@ -0,0 +1,28 @@
+import os
+from flask import jsonify
+from flask_smorest import Blueprint
+from api.middleware import jwt_required, roles_required
+from api.services.email_outbox_service import EmailOutboxService
+from api.services.email_service import EmailService
+
+email_blueprint = Blueprint('email', __name__, url_prefix="/email")
+
+@email_blueprint.route('/outbox/stats', methods=['GET'])
+@jwt_required
+@roles_required('Technical Admin')
+def get_outbox_stats():
+    """Queue depth, oldest pending message age and dispatcher counters for the email outbox."""
+    try:
+        return jsonify(EmailOutboxService.stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@email_blueprint.route('/providers', methods=['GET'])
+@jwt_required
+@roles_required('Technical Admin')
+def get_email_providers():
+    """Circuit breaker state of each email provider (for the process serving the request)."""
+    try:
+        return jsonify({'pid': os.getpid(), 'providers': EmailService.provider_status()}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,9 +1,14 @@
-from flask import request, jsonify, Response
+from flask import request, jsonify, Response, current_app
 from flask import send_file, redirect
 from flask_smorest import Blueprint
 from api.services.instructionalmaterial_service import InstructionalMaterialService
-from api.services.email_service import EmailService
-import boto3
+from api.services.email_outbox_service import EmailOutboxService
+from api.services.email_templates import EmailTemplates
+from api.services.deadline_notification_service import DeadlineNotificationService
+from api.services.pdf_upload_service import PdfUploadService
+from api.services.s3_stream_service import S3StreamService
+from api.services.s3_disk_cache import S3DiskCache
+from api.extensions import db
 from api.schemas.instructionalmaterials import InstructionalMaterialSchema
 from sqlalchemy.exc import IntegrityError
 from api.middleware import jwt_required, roles_required
@@ -17,18 +22,30 @@ def upload_pdf():
     """
     Separate endpoint for PDF upload and processing
     Returns object key and analysis notes
+    The PDF is streamed to S3 while the request body is read (see PdfUploadService).
     """
     try:
-        # Validate IM target first (when provided) to avoid orphaned S3 uploads.
-        im_id = request.form.get('im_id') or request.args.get('im_id')
+        form, _, upload = PdfUploadService.receive(request, analyze=InstructionalMaterialService.check_missing_sections)
+        if upload is None:
+            return jsonify({'error': 'PDF file is required'}), 400
+        notes = upload.notes
+        # A duplicate references a shared catalogued object, which must never be cleaned up here
+        object_key = None if upload.duplicate else upload.object_key
+
+        # The body has been consumed by now, so an invalid IM target removes the uploaded object.
+        im_id = form.get('im_id') or request.args.get('im_id')
         im_id_int = None
         if im_id not in (None, ""):
             try:
                 im_id_int = int(im_id)
             except (TypeError, ValueError):
+                if object_key:
+                    PdfUploadService.delete_object(object_key)
                 return jsonify({'error': 'im_id must be a valid integer'}), 400
 
             existing_im = InstructionalMaterialService.get_instructional_material_by_id(im_id_int)
+            if (not existing_im or existing_im.is_deleted) and object_key:
+                PdfUploadService.delete_object(object_key)
             if not existing_im:
                 return jsonify({'error': f'Instructional Material with id {im_id_int} not found'}), 404
             if existing_im.is_deleted:
@@ -36,17 +53,10 @@ def upload_pdf():
                     'error': f'Instructional Material with id {im_id_int} is deleted. Restore it first.'
                 }), 409
 
-        if 'pdf_file' not in request.files:
-            return jsonify({'error': 'PDF file is required'}), 400
-        
-        pdf_file = request.files['pdf_file']
-        
-        object_key, notes, temp_file_path = InstructionalMaterialService.process_pdf_file(pdf_file)
-
         # If caller provided an im_id in the multipart form, persist s3_link and notes.
         if im_id_int is not None:
             validated = {
-                's3_link': object_key,
+                's3_link': upload.object_key,
                 'notes': notes,
                 # preserve existing status/other fields by using partial update
             }
@@ -59,29 +69,104 @@ def upload_pdf():
                     }), 409
                 # Best-effort cleanup if DB row disappears between validation and update.
                 try:
-                    InstructionalMaterialService.delete_pdf_from_s3(object_key)
+                    if object_key:
+                        PdfUploadService.delete_object(object_key)
                 except Exception:
                     pass
                 return jsonify({'error': f'Instructional Material with id {im_id_int} not found'}), 404
 
-        if temp_file_path and os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-
         return jsonify({
-            's3_link': object_key,
+            's3_link': upload.object_key,
             'notes': notes,
-            'filename': pdf_file.filename
+            'filename': upload.filename,
+            'size': upload.size,
+            'sha256': upload.sha256,
+            'duplicate': upload.duplicate
         }), 200
         
     except Exception as e:
         # If upload succeeded but a later step failed, try to remove orphaned object.
         if 'object_key' in locals() and object_key:
             try:
-                InstructionalMaterialService.delete_pdf_from_s3(object_key)
+                db.session.rollback()
+                PdfUploadService.delete_object(object_key)
             except Exception:
                 pass
-        if 'temp_file_path' in locals() and temp_file_path and os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+        return jsonify({'error': str(e)}), 400
+
+@im_blueprint.route('/upload-url', methods=['POST'])
+@jwt_required
+def create_pdf_upload_url():
+    """
+    Presigned POST for uploading an IM's PDF straight from the browser to S3.
+    Body: {"im_id": ..., "filename": "x.pdf"}. POST the file to `url` with `fields`,
+    then call /upload-complete with the returned upload_token. Content that is already stored is
+    deduplicated once the upload has been analysed; a client-supplied hash alone never attaches
+    an existing object, since it proves nothing about holding the file.
+    """
+    try:
+        data = request.json or {}
+        filename = data.get('filename') or ''
+        if not filename.lower().endswith('.pdf'):
+            return jsonify({'error': 'filename must be a .pdf file'}), 400
+        try:
+            im_id = int(data.get('im_id'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'im_id must be a valid integer'}), 400
+
+        im = InstructionalMaterialService.get_instructional_material_by_id(im_id)
+        if not im:
+            return jsonify({'error': f'Instructional Material with id {im_id} not found'}), 404
+        if im.is_deleted:
+            return jsonify({
+                'error': f'Instructional Material with id {im_id} is deleted. Restore it first.'
+            }), 409
+
+        policy = PdfUploadService.create_upload_policy(filename, im_id, request.user_identity)
+        return jsonify(policy), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@im_blueprint.route('/upload-complete', methods=['POST'])
+@jwt_required
+def complete_pdf_upload():
+    """
+    Attach a PDF uploaded via /upload-url to its IM and queue the analysis in the background.
+    Body: {"upload_token": ...}. The IM's notes are filled in once the analysis finishes.
+    """
+    try:
+        data = request.json or {}
+        if not data.get('upload_token'):
+            return jsonify({'error': 'upload_token is required'}), 400
+        try:
+            im_id, object_key, size = PdfUploadService.verify_direct_upload(data['upload_token'], request.user_identity)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        im = InstructionalMaterialService.get_instructional_material_by_id(im_id)
+        if not im or im.is_deleted:
+            PdfUploadService.delete_object(object_key)
+            if not im:
+                return jsonify({'error': f'Instructional Material with id {im_id} not found'}), 404
+            return jsonify({
+                'error': f'Instructional Material with id {im_id} is deleted. Restore it first.'
+            }), 409
+
+        if im.s3_link != object_key:
+            updated = InstructionalMaterialService.update_instructional_material(im_id, {'s3_link': object_key})
+            if not updated:
+                PdfUploadService.delete_object(object_key)
+                return jsonify({'error': f'Instructional Material with id {im_id} not found'}), 404
+
+        PdfUploadService.queue_analysis(
+            current_app._get_current_object(), im_id, object_key, InstructionalMaterialService.check_missing_sections
+        )
+        return jsonify({
+            's3_link': object_key,
+            'size': size,
+            'analysis': 'queued'
+        }), 202
+    except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @im_blueprint.route('/', methods=['POST'])
@@ -112,31 +197,32 @@ def create_instructional_material():
         
         im = InstructionalMaterialService.create_instructional_material(data, s3_link, notes)
 
-        # If this is an assignment, send email notification to all authors
+        # If this is an assignment, queue an email notification for every author
         if is_assignment and author_ids:
             try:
                 # Fetch author emails
                 from api.models.users import User
-                author_emails = []
-                for author_id in author_ids:
-                    user = User.query.get(author_id)
-                    if user and user.email:
-                        author_emails.append(user.email)
+                author_emails = [
+                    user.email
+                    for user in User.query.filter(User.id.in_(author_ids)).all()
+                    if user.email
+                ]
                 
-                # Send notification to all authors
-                if author_emails:
-                    subject_name = "an instructional material"  # You can enhance this with actual subject name
-                    for email in author_emails:
-                        EmailService.send_instructional_material_notification(
-                            receiver_email=email,
-                            filename=f"IM-{im.id}",
-                            status="Assigned to Faculty",
-                            notes="You have been assigned to create an instructional material. Please upload the PDF file.",
-                            action="assigned"
-                        )
+                # Delivered by the email outbox dispatcher; the request never waits on the provider
+                for email in author_emails:
+                    EmailOutboxService.enqueue(
+                        'im_notification',
+                        receiver_email=email,
+                        filename=f"IM-{im.id}",
+                        status="Assigned to Faculty",
+                        notes="You have been assigned to create an instructional material. Please upload the PDF file.",
+                        action="assigned"
+                    )
+                db.session.commit()
             except Exception as email_error:
                 # Log email error but don't fail the request
-                print(f"Failed to send email notification: {email_error}")
+                db.session.rollback()
+                print(f"Failed to queue email notification: {email_error}")
 
         return jsonify({
             'message': f'Instructional Material {im.version} {"assigned" if is_assignment else "created"} successfully',
@@ -155,26 +241,27 @@ def update_instructional_material(im_id):
     """
     try:
         # Check if this is a file upload or JSON update
-        if request.files and 'pdf_file' in request.files:
-            # Handle PDF file upload and processing
-            pdf_file = request.files['pdf_file']
-            if pdf_file.filename != '' and pdf_file.filename.lower().endswith('.pdf'):
-                object_key, notes, temp_file_path = InstructionalMaterialService.process_pdf_file(pdf_file)
-                
-                # Get other form data
-                form_data = request.form.to_dict()
-                validated_data = InstructionalMaterialSchema(partial=True).load(form_data)
-                
-                validated_data['s3_link'] = object_key
-                if notes:
-                    validated_data['notes'] = notes
-                
-                im = InstructionalMaterialService.update_instructional_material(im_id, validated_data)
-                
-                if temp_file_path and os.path.exists(temp_file_path):
-                    os.remove(temp_file_path)
-            else:
+        if request.mimetype == 'multipart/form-data':
+            # Handle PDF file upload and processing (streamed to S3 while the body is read)
+            form, _, upload = PdfUploadService.receive(request, analyze=InstructionalMaterialService.check_missing_sections)
+            if upload is None:
                 return jsonify({'error': 'Valid PDF file is required'}), 400
+            notes = upload.notes
+            # Only a newly stored object is ours to clean up; a duplicate is a shared catalogued one
+            object_key = None if upload.duplicate else upload.object_key
+
+            # Get other form data
+            form_data = form.to_dict()
+            validated_data = InstructionalMaterialSchema(partial=True).load(form_data)
+
+            validated_data['s3_link'] = upload.object_key
+            if notes:
+                validated_data['notes'] = notes
+
+            im = InstructionalMaterialService.update_instructional_material(im_id, validated_data)
+            if not im and object_key:
+                PdfUploadService.delete_object(object_key)
+            object_key = None  # now referenced by the IM (or already removed)
         else:
             data = InstructionalMaterialSchema(partial=True).load(request.json)
             im = InstructionalMaterialService.update_instructional_material(im_id, data)
@@ -198,8 +285,12 @@ def update_instructional_material(im_id):
         }), 200
         
     except Exception as e:
-        if 'temp_file_path' in locals() and temp_file_path and os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+        if 'object_key' in locals() and object_key:
+            try:
+                db.session.rollback()
+                PdfUploadService.delete_object(object_key)
+            except Exception:
+                pass
         return jsonify({'error': str(e)}), 400
 
 @im_blueprint.route('/<int:im_id>', methods=['GET'])
@@ -233,14 +324,16 @@ def get_all_instructional_materials():
 def delete_pdf_from_s3():
     """
     Delete a PDF from S3 using the object key provided in the request body.
+    Uploads are shared between IMs with the same content, so a PDF that an IM
+    still references is kept and 'deleted' is false.
     """
     try:
         data = request.json
         s3_link = data.get('s3_link')
         if not s3_link:
             return jsonify({'error': 's3_link is required'}), 400
-        result = InstructionalMaterialService.delete_pdf_from_s3(s3_link)
-        return jsonify({'success': result}), 200
+        deleted = PdfUploadService.delete_object(s3_link)
+        return jsonify({'success': True, 'deleted': deleted}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400
         
@@ -341,11 +434,22 @@ def download_instructional_material(im_id):
 @im_blueprint.route('/<int:im_id>/pdf', methods=['GET'])
 @jwt_required
 def stream_instructional_material_pdf(im_id):
-    """Return a direct S3 URL redirect or (future) a streamed file for embedding in iframe."""
+    """
+    Return a direct S3 URL redirect, or with ?stream=1 (or IM_PDF_STREAM=true) stream the PDF
+    through the app with Range/If-Range/ETag support so viewers like PDF.js can load it incrementally.
+    """
     try:
         im = InstructionalMaterialService.get_instructional_material_by_id(im_id)
         if not im or im.is_deleted or not im.s3_link:
             return jsonify({'error': 'Instructional Material not found or no PDF available'}), 404
+        stream_arg = request.args.get('stream', os.getenv('IM_PDF_STREAM', 'false')).strip().lower()
+        if stream_arg in ('1', 'true', 'yes', 'on'):
+            # Hot PDFs are served from the local disk cache; very large ones are relayed from S3
+            if S3DiskCache.fits(im.s3_link):
+                return S3DiskCache.send(im.s3_link, download_name=os.path.basename(im.s3_link), mimetype='application/pdf')
+            return S3StreamService.stream_object(
+                im.s3_link, filename=os.path.basename(im.s3_link), content_type='application/pdf'
+            )
         # Build direct S3 https URL
         try:
             url = InstructionalMaterialService.get_s3_url(im.s3_link)
@@ -377,25 +481,16 @@ def generate_certificates(im_id):
     """Generate personalized certificates for all authors of an IM.
     
     Optionally accepts a multipart/form-data request with a 'template_file'
-    (.docx) to use instead of the default S3 template.
+    (.docx, or a .json raster layout) to use instead of the default S3 template.
     """
     try:
         from api.services.certificate_service import CertificateService
-        template_path = None
-        temp_template = None
+        template_bytes = None
         if request.files and 'template_file' in request.files:
             uploaded = request.files['template_file']
             if uploaded.filename:
-                tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.docx')
-                uploaded.save(tmp.name)
-                tmp.close()
-                template_path = tmp.name
-                temp_template = tmp.name
-        try:
-            certificates = CertificateService.generate_certificates(im_id, template_path=template_path)
-        finally:
-            if temp_template and os.path.exists(temp_template):
-                os.remove(temp_template)
+                template_bytes = uploaded.read()
+        certificates = CertificateService.generate_certificates(im_id, template_bytes=template_bytes)
         return jsonify({
             'message': f'Generated {len(certificates)} certificates',
             'certificates': certificates
@@ -413,21 +508,12 @@ def generate_certificate_for_user(im_id, user_id):
     """Generate and send a certificate for a single author (post-publish catch-up)."""
     try:
         from api.services.certificate_service import CertificateService
-        template_path = None
-        temp_template = None
+        template_bytes = None
         if request.files and 'template_file' in request.files:
             uploaded = request.files['template_file']
             if uploaded.filename:
-                tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.docx')
-                uploaded.save(tmp.name)
-                tmp.close()
-                template_path = tmp.name
-                temp_template = tmp.name
-        try:
-            cert = CertificateService.generate_certificate_for_user(im_id, user_id, template_path=template_path)
-        finally:
-            if temp_template and os.path.exists(temp_template):
-                os.remove(temp_template)
+                template_bytes = uploaded.read()
+        cert = CertificateService.generate_certificate_for_user(im_id, user_id, template_bytes=template_bytes)
         return jsonify({'message': 'Certificate generated', 'certificate': cert}), 200
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
@@ -435,6 +521,28 @@ def generate_certificate_for_user(im_id, user_id):
         return jsonify({'error': str(e)}), 500
 
 
+@im_blueprint.route('/<int:im_id>/certificates.zip', methods=['GET'])
+@jwt_required
+@roles_required('PIMEC', 'UTLDO Admin', 'Technical Admin')
+def download_certificates_zip(im_id):
+    """Stream a ZIP of every certificate issued for an IM (built on the fly from S3)."""
+    try:
+        from api.services.certificate_service import CertificateService
+        stream = CertificateService.stream_certificates_zip(im_id)
+        if stream is None:
+            return jsonify({'error': 'No certificates found for this Instructional Material'}), 404
+        return Response(
+            stream,
+            mimetype='application/zip',
+            headers={
+                'Content-Disposition': f'attachment; filename=IM-{im_id}-certificates.zip',
+                'X-Accel-Buffering': 'no',
+            },
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @im_blueprint.route('/certificates/user/<int:user_id>', methods=['GET'])
 @jwt_required
 def get_certificates_for_user(user_id):
@@ -461,39 +569,14 @@ def get_cert_of_appreciation():
         if not bucket_name:
             return jsonify({'error': 'AWS_BUCKET_NAME not configured'}), 500
         
-        # Download file from S3 to a temporary location
-        s3 = boto3.client('s3')
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.docx')
-        temp_file_path = temp_file.name
-        temp_file.close()
-        
-        try:
-            s3.download_file(bucket_name, object_key, temp_file_path)
-            
-            # Send the file to the client
-            response = send_file(
-                temp_file_path,
-                as_attachment=True,
-                download_name='cert-of-appreciation.docx',
-                mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            )
-            
-            # Schedule file deletion after sending
-            @response.call_on_close
-            def cleanup():
-                try:
-                    if os.path.exists(temp_file_path):
-                        os.remove(temp_file_path)
-                except:
-                    pass
-            
-            return response
-            
-        except Exception as download_error:
-            # Clean up temp file on error
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-            raise download_error
+        # Served from the local disk cache (refreshed when the template changes in S3)
+        return S3DiskCache.send(
+            object_key,
+            download_name='cert-of-appreciation.docx',
+            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+            as_attachment=True,
+            bucket_name=bucket_name,
+        )
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -521,8 +604,7 @@ def send_certs_of_appreciation(im_id):
         text_body = request.form.get('text_body')
         html_body = request.form.get('html_body')
 
-        # read bytes
-        file_bytes = uploaded.read()
+        # the upload is streamed to S3 by the outbox, not read into memory here
         filename = uploaded.filename
 
         # fetch IM and derive recipients from its authors
@@ -561,45 +643,16 @@ def send_certs_of_appreciation(im_id):
 
         # If the client didn't supply html_body/text_body, construct polite/formal templates
         if not html_body:
-            authors_html = '<br>'.join([f"<strong>{name}</strong>" for name in author_names]) if author_names else ''
-            html_body = f"""
-            <html>
-            <body style=\"font-family: Arial, sans-serif; color: #222; line-height:1.4;\">
-              <h2 style=\"color:#0b3255;\">Certificate of Appreciation</h2>
-              <p>Congratulations.</p>
-              <p>This certificate is presented in recognition of the exemplary services and significant contributions made
-                 in the preparation and development of instructional materials.</p>
-              <p><strong>Awarded to:</strong><br>
-              {authors_html}
-              </p>
-              <p>We sincerely thank the above individuals for their dedication and commitment to quality teaching and learning.
-                 Their efforts have been instrumental in ensuring high standards in our instructional resources.</p>
-              <br>
-              <p>With appreciation,<br>
-                 The Instructional Materials Committee</p>
-            </body>
-            </html>
-            """
+            html_body = EmailTemplates.render('certificate_of_appreciation.html', author_names=author_names)
 
         if not text_body:
-            authors_text = ', '.join(author_names) if author_names else ''
-            text_body = (
-                f"Certificate of Appreciation\n\n"
-                f"Congratulations.\n\n"
-                f"This certificate is presented in recognition of the contributions made in the preparation and development of instructional materials.\n\n"
-                f"Awarded to:\n{authors_text}\n\n"
-                f"We sincerely thank the above individuals for their dedication and commitment to quality teaching and learning.\n\n"
-                f"With appreciation,\nThe Instructional Materials Committee"
-            )
+            text_body = EmailTemplates.render('certificate_of_appreciation.txt', author_names=author_names)
 
-        # call EmailService helper directly
-        from api.services.email_service import EmailService
-        sent = EmailService.send_file_to_recipients(recipients, file_bytes, filename, subject=subject, html_body=html_body, text_body=text_body)
+        # Queue for the email outbox dispatcher (the file is staged in S3)
+        EmailOutboxService.enqueue_files(recipients, [(uploaded.stream, filename)], subject=subject, html_body=html_body, text_body=text_body)
+        db.session.commit()
 
-        if sent:
-            return jsonify({'success': True, 'recipients': recipients}), 200
-        else:
-            return jsonify({'error': 'Failed to send email to recipients'}), 500
+        return jsonify({'success': True, 'queued': True, 'recipients': recipients}), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -682,10 +735,15 @@ def get_instructional_materials_for_certification():
 def send_deadline_notifications():
     """
     Send deadline notifications to authors for IMs due in 7, 6, 5, 4, 3, 2, or 1 days
+    (and past due notices). Notices already in the notification ledger are skipped.
+    ?digest=true|false overrides DEADLINE_NOTIFICATION_DIGEST (one email per recipient).
     This endpoint is called by Cloud Scheduler and doesn't require authentication
     """
     try:
-        notifications_sent = InstructionalMaterialService.send_deadline_notifications()
+        digest = request.args.get('digest')
+        if digest is not None:
+            digest = digest.lower() in ('1', 'true', 'yes')
+        notifications_sent = DeadlineNotificationService.send_deadline_notifications(digest=digest)
         return jsonify({
             'message': f'Deadline notifications processed successfully',
             'notifications_sent': notifications_sent
@@ -12,32 +12,10 @@ requirements_blueprint = Blueprint('requirements', __name__, url_prefix="/requir
 def download_recommendation_letter():
     """
     Download the recommendation letter PDF from S3
-    Returns the PDF file for download
+    Returns the PDF file for download (served from the local disk cache)
     """
     try:
-        file_path = RequirementsService.download_requirements_pdf()
-        
-        if not os.path.exists(file_path):
-            return jsonify({'error': 'Requirements file not found'}), 404
-        
-        # Send the file and clean up after
-        def remove_file(response):
-            try:
-                os.remove(file_path)
-            except:
-                pass
-            return response
-        
-        response = send_file(
-            file_path,
-            as_attachment=True,
-            download_name='recommendation-letter.pdf',
-            mimetype='application/pdf'
-        )
-        
-        response.call_on_close(lambda: os.remove(file_path) if os.path.exists(file_path) else None)
-        
-        return response
+        return RequirementsService.send_requirements_pdf()
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -0,0 +1,332 @@
+import os
+import json
+import time
+import threading
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy import and_, exists, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from api.extensions import db
+from api.models.authors import Author
+from api.models.im_certificates import IMCertificate
+from api.models.instructionalmaterials import InstructionalMaterial
+from api.models.universityims import UniversityIM
+from api.models.serviceims import ServiceIM
+from api.models.users import User
+from api.services.certificate_service import CertificateService
+from api.services.certificate_verification_service import CertificateVerificationService
+from api.services.email_outbox_service import EmailOutboxService
+from api.services.s3_client import get_s3_client
+
+
+class CertificateBatchService:
+    """Bulk certificate issuance for many IMs at once (e.g. end of semester).
+
+    Rendering, conversion and uploads run on a bounded worker pool; database
+    writes stay on the calling thread. Each batch is committed together with
+    its outbox emails, so a crashed run can be resumed by running it again.
+
+    The same machinery re-renders certificates whose template has changed
+    (see rerender_stale).
+    """
+
+    @staticmethod
+    def find_pending_authors(semester=None, college_id=None):
+        """Return (im_id, user_id) pairs of published IMs whose authors lack a certificate."""
+        has_certificate = exists().where(and_(
+            IMCertificate.im_id == Author.im_id,
+            IMCertificate.user_id == Author.user_id,
+        ))
+        query = (
+            db.session.query(Author.im_id, Author.user_id)
+            .join(InstructionalMaterial, InstructionalMaterial.id == Author.im_id)
+            .filter(
+                InstructionalMaterial.is_deleted == False,
+                or_(InstructionalMaterial.published == 1, InstructionalMaterial.status == 'Published'),
+                ~has_certificate,
+            )
+        )
+        if semester:
+            query = query.filter(func.lower(InstructionalMaterial.semester) == semester.strip().lower())
+        if college_id:
+            query = (
+                query
+                .outerjoin(UniversityIM, UniversityIM.id == InstructionalMaterial.university_im_id)
+                .outerjoin(ServiceIM, ServiceIM.id == InstructionalMaterial.service_im_id)
+                .filter(or_(UniversityIM.college_id == college_id, ServiceIM.college_id == college_id))
+            )
+        return [(im_id, user_id) for im_id, user_id in query.order_by(Author.im_id, Author.user_id).all()]
+
+    @staticmethod
+    def issue(pending, workers=4, batch_size=20, template_bytes=None, echo=print):
+        """Issue certificates for the given (im_id, user_id) pairs.
+
+        Certificate emails are queued in the outbox in the same commit as their
+        batch, so an interrupted run loses nothing and can simply be re-run
+        (find_pending_authors skips certificates that were committed).
+        Returns a stats dict (issued, failed, queued, render_seconds, elapsed, per_second).
+        """
+        started = time.monotonic()
+        stats = {'issued': 0, 'failed': 0, 'queued': 0, 'render_seconds': 0.0}
+
+        template_source = CertificateService._template_source(template_bytes)
+        if template_bytes is None:
+            template_bytes = CertificateService._download_template()
+        template_hash = CertificateService._template_hash(template_bytes)
+        s3 = get_s3_client()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            im_fields_cache = {}
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                jobs = CertificateBatchService._create_batch_rows(batch, im_fields_cache, template_hash, template_source)
+
+                futures = {
+                    executor.submit(
+                        CertificateBatchService._render_and_upload,
+                        template_bytes, job['fields'], job['cert'].qr_id, job['cert'].date_issued, s3,
+                    ): job
+                    for job in jobs
+                }
+                issued = 0
+                for future in as_completed(futures):
+                    job = futures[future]
+                    cert = job['cert']
+                    try:
+                        docx_key, pdf_key, thumbnail_key, seconds = future.result()
+                    except Exception as e:
+                        echo(f"  ❌ IM {cert.im_id} / user {cert.user_id}: {str(e)}")
+                        db.session.delete(cert)
+                        stats['failed'] += 1
+                        continue
+                    cert.s3_link = docx_key
+                    cert.pdf_s3_link = pdf_key
+                    cert.thumbnail_key = thumbnail_key
+                    stats['render_seconds'] += seconds
+                    EmailOutboxService.enqueue('certificate', qr_id=cert.qr_id)
+                    issued += 1
+
+                db.session.commit()
+                stats['issued'] += issued
+                stats['queued'] += issued
+
+                done = min(start + batch_size, len(pending))
+                elapsed = time.monotonic() - started
+                echo(f"  {done}/{len(pending)} processed, {stats['issued']} issued, "
+                     f"{stats['failed']} failed ({stats['issued'] / elapsed:.2f} certs/s)")
+
+        stats['elapsed'] = time.monotonic() - started
+        stats['per_second'] = stats['issued'] / stats['elapsed'] if stats['elapsed'] else 0.0
+        return stats
+
+    @staticmethod
+    def count_stale(template_hash, include_legacy=False):
+        """Number of default-template certificates not rendered from the template with this hash."""
+        return CertificateBatchService._stale_query(template_hash, include_legacy).count()
+
+    @staticmethod
+    def rerender_stale(checkpoint_path, workers=4, batch_size=20, max_per_second=None, max_conversions=None,
+                       template_bytes=None, include_legacy=False, echo=print):
+        """Re-render, in place, every default-template certificate whose template_hash differs from the current template.
+
+        Certificates keep their QR ID and issue date; files are overwritten at
+        the same S3 keys and authors are not re-emailed. Certificates issued
+        from an uploaded template_file are never touched. Legacy rows that
+        predate template_source could have come from either, so they are only
+        swept with include_legacy (and then count as stale if they have no
+        template hash either). Rows are swept in ID order and the last
+        processed ID is checkpointed per batch, so an interrupted run resumes
+        where it stopped (rows that already failed are not retried until the
+        checkpoint is deleted or the template changes again).
+
+        max_per_second caps certificate uploads across all workers and
+        max_conversions caps concurrent renders (LibreOffice processes).
+        Returns a stats dict (rerendered, failed, elapsed, per_second).
+        """
+        started = time.monotonic()
+        template_source = CertificateService._template_source(template_bytes)
+        if template_bytes is None:
+            template_bytes = CertificateService._download_template()
+        template_hash = CertificateService._template_hash(template_bytes)
+
+        checkpoint = CertificateBatchService._load_checkpoint(checkpoint_path, {})
+        if checkpoint.get('template_hash') != template_hash:
+            checkpoint = {'template_hash': template_hash, 'last_id': 0}
+        total = CertificateBatchService._stale_query(template_hash, include_legacy).filter(
+            IMCertificate.id > checkpoint['last_id']
+        ).count()
+        echo(f"{total} stale certificate(s) to re-render"
+             + (f" (resuming after ID {checkpoint['last_id']})" if checkpoint['last_id'] else "") + ".")
+
+        stats = {'rerendered': 0, 'failed': 0}
+        limiter = _RateLimiter(max_per_second)
+        conversion_slots = threading.BoundedSemaphore(max_conversions or workers)
+        s3 = get_s3_client()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                batch = (
+                    CertificateBatchService._stale_query(template_hash, include_legacy)
+                    .filter(IMCertificate.id > checkpoint['last_id'])
+                    .options(joinedload(IMCertificate.user), joinedload(IMCertificate.instructional_material))
+                    .order_by(IMCertificate.id.asc())
+                    .limit(batch_size)
+                    .all()
+                )
+                if not batch:
+                    break
+
+                futures = {}
+                im_fields_cache = {}
+                for cert in batch:
+                    if cert.im_id not in im_fields_cache:
+                        im_fields_cache[cert.im_id] = CertificateService._build_im_fields(cert.instructional_material)
+                    fields = CertificateService._build_certificate_fields(
+                        im_fields_cache[cert.im_id], cert.user, cert.date_issued
+                    )
+                    future = executor.submit(
+                        CertificateBatchService._rerender_one,
+                        template_bytes, fields, cert.qr_id, cert.date_issued, bool(cert.pdf_s3_link),
+                        s3, limiter, conversion_slots,
+                    )
+                    futures[future] = (cert, fields)
+
+                for future in as_completed(futures):
+                    cert, fields = futures[future]
+                    try:
+                        docx_key, pdf_key, thumbnail_key = future.result()
+                    except Exception as e:
+                        echo(f"  ❌ {cert.qr_id}: {str(e)}")
+                        stats['failed'] += 1
+                        continue
+                    cert.s3_link = docx_key
+                    cert.pdf_s3_link = pdf_key
+                    cert.thumbnail_key = thumbnail_key
+                    cert.template_hash = template_hash
+                    cert.template_source = template_source
+                    cert.input_hash = CertificateService._certificate_input_hash(template_hash, cert.user_id, fields)
+                    stats['rerendered'] += 1
+
+                db.session.commit()
+                for cert in batch:
+                    CertificateVerificationService.invalidate(cert.qr_id)
+                checkpoint['last_id'] = batch[-1].id
+                CertificateBatchService._save_checkpoint(checkpoint_path, checkpoint)
+
+                elapsed = time.monotonic() - started
+                done = stats['rerendered'] + stats['failed']
+                echo(f"  {done}/{total} processed, {stats['rerendered']} re-rendered, "
+                     f"{stats['failed']} failed ({stats['rerendered'] / elapsed:.2f} certs/s)")
+
+        stats['elapsed'] = time.monotonic() - started
+        stats['per_second'] = stats['rerendered'] / stats['elapsed'] if stats['elapsed'] else 0.0
+        if not stats['failed'] and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        return stats
+
+    ################################################################
+    #                    HELPER FUNCTIONS                          #
+    ################################################################
+    @staticmethod
+    def _stale_query(template_hash, include_legacy=False):
+        from_default = and_(
+            IMCertificate.template_source.isnot(None),
+            IMCertificate.template_source != CertificateService.UPLOADED_TEMPLATE_SOURCE,
+        )
+        if include_legacy:
+            from_default = or_(from_default, IMCertificate.template_source.is_(None))
+        return IMCertificate.query.filter(from_default, or_(
+            IMCertificate.template_hash.is_(None),
+            IMCertificate.template_hash != template_hash,
+        ))
+
+    @staticmethod
+    def _rerender_one(template_bytes, fields, qr_id, issued_on, had_pdf, s3, limiter, conversion_slots):
+        """Worker: re-render one certificate and overwrite its files (no DB access).
+
+        Nothing is uploaded if a certificate that had a PDF would lose it, so a
+        broken converter never replaces good files with a DOCX-only certificate.
+        """
+        with conversion_slots:
+            docx_bytes, pdf_bytes = CertificateService._render_certificate(template_bytes, fields, qr_id, issued_on)
+        if had_pdf and not pdf_bytes:
+            raise RuntimeError("PDF conversion failed; existing files kept")
+        limiter.wait()
+        return CertificateService._upload_certificate_files(qr_id, docx_bytes, pdf_bytes, s3=s3)
+
+    @staticmethod
+    def _create_batch_rows(batch, im_fields_cache, template_hash, template_source):
+        """Insert (flush, not commit) one IMCertificate per pair so every job has its QR ID.
+
+        Pairs that already have a certificate are skipped.
+        """
+        jobs = []
+        for im_id, user_id in batch:
+            if im_id not in im_fields_cache:
+                im_fields_cache[im_id] = CertificateService._build_im_fields(db.session.get(InstructionalMaterial, im_id))
+            user = db.session.get(User, user_id)
+            if not user:
+                continue
+            fields = CertificateService._build_certificate_fields(im_fields_cache[im_id], user, date.today())
+            cert = IMCertificate(qr_id=f"CERT-TEMP-{im_id}-{user_id}", im_id=im_id, user_id=user_id,
+                                 s3_link="", date_issued=date.today())
+            cert.template_hash = template_hash
+            cert.template_source = template_source
+            cert.input_hash = CertificateService._certificate_input_hash(template_hash, user_id, fields)
+            try:
+                with db.session.begin_nested():
+                    db.session.add(cert)
+                    db.session.flush()
+            except IntegrityError:
+                # Issued by someone else since find_pending_authors ran
+                continue
+            jobs.append({'cert': cert, 'fields': fields})
+        for job in jobs:
+            job['cert'].qr_id = f"CERT-{job['cert'].id}"
+        db.session.flush()
+        return jobs
+
+    @staticmethod
+    def _render_and_upload(template_bytes, fields, qr_id, issued_on, s3):
+        """Worker: render, convert and upload one certificate (no DB access)."""
+        started = time.monotonic()
+        docx_bytes, pdf_bytes = CertificateService._render_certificate(template_bytes, fields, qr_id, issued_on)
+        docx_key, pdf_key, thumbnail_key = CertificateService._upload_certificate_files(
+            qr_id, docx_bytes, pdf_bytes, s3=s3
+        )
+        return docx_key, pdf_key, thumbnail_key, time.monotonic() - started
+
+    @staticmethod
+    def _load_checkpoint(path, default):
+        if path and os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        return default
+
+    @staticmethod
+    def _save_checkpoint(path, checkpoint):
+        """Write the checkpoint atomically so a crash never leaves a torn file."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
+
+
+class _RateLimiter:
+    """Spaces wait() returns at least 1/rate seconds apart across threads; no-op without a rate."""
+
+    def __init__(self, rate):
+        self._interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
@@ -0,0 +1,204 @@
+import os
+import json
+import threading
+import time
+import qrcode
+from io import BytesIO
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+from api.services.s3_client import get_s3_client
+
+
+class CertificateRasterRenderer:
+    """Fixed-layout certificate renderer: background image + JSON layout -> PDF.
+
+    A layout template is a JSON document instead of a DOCX, e.g.::
+
+        {
+          "background": "requirements/cert-background.png",
+          "dpi": 150,
+          "fields": [
+            {"text": "{author_rank_and_name}", "x": 1754, "y": 1130,
+             "font": "DejaVuSerif-Bold.ttf", "size": 96, "color": "#1a1a1a",
+             "anchor": "mm", "max_width": 2600}
+          ],
+          "qr": {"x": 3000, "y": 2000, "size": 360}
+        }
+
+    Coordinates are pixels on the background image. "text" is a str.format
+    pattern over the certificate fields; unknown placeholders render empty.
+    Rendering is pure Pillow, so there is no subprocess and no DOCX step.
+
+    Layouts can be uploaded by users, so "background" must be an S3 key under
+    CERTIFICATE_BACKGROUND_PREFIX, or a file inside CERTIFICATE_ASSET_DIR
+    (local files are refused when that is not set). The decoded background
+    is cached per key and ETag; the ETag is rechecked with a HEAD at most
+    every BACKGROUND_REVALIDATE_SECONDS, so a replaced background is picked up.
+    """
+    DEFAULT_DPI = 150
+    DEFAULT_FONT_SIZE = 48
+    BACKGROUND_PREFIX = os.getenv('CERTIFICATE_BACKGROUND_PREFIX', 'requirements/')
+    ASSET_DIR = os.getenv('CERTIFICATE_ASSET_DIR')
+    BACKGROUND_REVALIDATE_SECONDS = float(os.getenv('CERTIFICATE_BACKGROUND_REVALIDATE_SECONDS', 30))
+
+    _backgrounds = {}  # background -> (version, image, checked_at)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def parse_layout(template_bytes):
+        """Return the layout dict if the template is a raster layout spec, else None."""
+        if not template_bytes or template_bytes.lstrip()[:1] != b'{':
+            return None
+        try:
+            layout = json.loads(template_bytes)
+        except ValueError:
+            return None
+        if not isinstance(layout, dict) or 'background' not in layout:
+            return None
+        return layout
+
+    @staticmethod
+    def background_version(background):
+        """Version (S3 ETag, or mtime and size of a local file) of the layout's background.
+
+        Part of the template hash, so replacing the background marks
+        certificates rendered from it as stale. Raises ValueError if the
+        background is not an allowed location.
+        """
+        version, _ = CertificateRasterRenderer._load_background(background)
+        return version
+
+    @staticmethod
+    def render(layout, fields, qr_payload=None):
+        """Render one certificate and return the PDF bytes."""
+        _, background = CertificateRasterRenderer._load_background(layout['background'])
+        page = background.copy()
+        draw = ImageDraw.Draw(page)
+        values = _LayoutFields(fields)
+
+        for spec in layout.get('fields', []):
+            try:
+                text = str(spec.get('text', '')).format_map(values)
+            except (ValueError, IndexError, AttributeError) as e:
+                raise ValueError(f"Invalid text pattern in certificate layout: {spec.get('text')!r}") from e
+            if not text:
+                continue
+            size = int(spec.get('size', CertificateRasterRenderer.DEFAULT_FONT_SIZE))
+            font = CertificateRasterRenderer._load_font(spec.get('font'), size)
+            max_width = spec.get('max_width')
+            # Shrink long names/titles until they fit their box
+            while max_width and size > 8 and draw.textlength(text, font=font) > max_width:
+                size = int(size * 0.92)
+                font = CertificateRasterRenderer._load_font(spec.get('font'), size)
+            draw.text(
+                (spec['x'], spec['y']),
+                text,
+                font=font,
+                fill=spec.get('color', '#000000'),
+                anchor=spec.get('anchor', 'la'),
+            )
+
+        qr_spec = layout.get('qr')
+        if qr_spec and qr_payload:
+            qr_img = CertificateRasterRenderer._qr_image(qr_payload, int(qr_spec.get('size', 300)))
+            page.paste(qr_img, (int(qr_spec['x']), int(qr_spec['y'])))
+
+        pdf_buffer = BytesIO()
+        page.save(pdf_buffer, format='PDF', resolution=float(layout.get('dpi', CertificateRasterRenderer.DEFAULT_DPI)))
+        return pdf_buffer.getvalue()
+
+    ################################################################
+    #                    HELPER FUNCTIONS                          #
+    ################################################################
+    @staticmethod
+    def _load_background(background):
+        """(version, decoded image) of the background, decoded once per version per process."""
+        source, location = CertificateRasterRenderer._resolve_background(background)
+        now = time.monotonic()
+        with CertificateRasterRenderer._lock:
+            cached = CertificateRasterRenderer._backgrounds.get(background)
+        if cached is not None and now - cached[2] < CertificateRasterRenderer.BACKGROUND_REVALIDATE_SECONDS:
+            return cached[0], cached[1]
+
+        if source == 'file':
+            stat = os.stat(location)
+            version = f"{stat.st_mtime_ns}-{stat.st_size}"
+            if cached is None or cached[0] != version:
+                with open(location, 'rb') as f:
+                    data = f.read()
+        else:
+            s3 = get_s3_client()
+            bucket_name = os.getenv('AWS_BUCKET_NAME')
+            version = s3.head_object(Bucket=bucket_name, Key=location)['ETag'] if cached is not None else None
+            if cached is None or cached[0] != version:
+                obj = s3.get_object(Bucket=bucket_name, Key=location)
+                version = obj['ETag']
+                data = obj['Body'].read()
+
+        if cached is not None and cached[0] == version:
+            image = cached[1]
+        else:
+            image = Image.open(BytesIO(data)).convert('RGB')
+            image.load()
+        with CertificateRasterRenderer._lock:
+            CertificateRasterRenderer._backgrounds[background] = (version, image, now)
+        return version, image
+
+    @staticmethod
+    def _resolve_background(background):
+        """('s3', key) or ('file', path) for a layout's background; ValueError if it is not allowed."""
+        if not isinstance(background, str) or not background:
+            raise ValueError("Certificate layout background must be a non-empty string")
+
+        asset_dir = CertificateRasterRenderer.ASSET_DIR
+        if asset_dir:
+            root = os.path.realpath(asset_dir)
+            path = os.path.realpath(os.path.join(root, background))
+            if path.startswith(root + os.sep) and os.path.isfile(path):
+                return 'file', path
+
+        prefix = CertificateRasterRenderer.BACKGROUND_PREFIX
+        key = background.lstrip('/')
+        parts = key.split('/')
+        if prefix and key.startswith(prefix) and '..' not in parts and '.' not in parts:
+            return 's3', key
+        raise ValueError(f"Certificate background '{background}' is not under '{prefix}'")
+
+    @staticmethod
+    def _qr_image(payload, size):
+        """QR code as a size x size image.
+
+        Builds the module matrix with a fixed mask (skipping qrcode's 8-way mask
+        search, which dominates render time) and scales it up in one resize
+        instead of drawing each module as a rectangle.
+        """
+        qr = qrcode.QRCode(border=2, mask_pattern=0)
+        qr.add_data(payload)
+        qr.make(fit=True)
+        matrix = qr.get_matrix()
+        modules = len(matrix)
+        pixels = bytes(0 if cell else 255 for row in matrix for cell in row)
+        return Image.frombytes('L', (modules, modules), pixels).resize((size, size), Image.NEAREST)
+
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def _load_font(font, size):
+        """TrueType font by file name or path (CERTIFICATE_FONT_DIR is searched first)."""
+        if font:
+            font_dir = os.getenv('CERTIFICATE_FONT_DIR')
+            candidates = [os.path.join(font_dir, font)] if font_dir else []
+            candidates.append(font)
+            for candidate in candidates:
+                try:
+                    return ImageFont.truetype(candidate, size)
+                except OSError:
+                    continue
+            print(f"Certificate font '{font}' not found, using default font")
+        return ImageFont.load_default(size)
+
+
+class _LayoutFields(dict):
+    """Certificate fields for format_map; placeholders the layout invents render as ''."""
+
+    def __missing__(self, key):
+        return ''
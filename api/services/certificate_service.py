@@ -1,39 +1,77 @@
 import os
 import json
-import subprocess
+import atexit
 import shutil
+import subprocess
 import qrcode
+import pypdfium2 as pdfium
 import tempfile
-import boto3
+import threading
 import re
+import hashlib
+import zipfile
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from io import BytesIO
+from botocore.exceptions import ClientError
 from docx import Document
 from docx.shared import Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 from api.extensions import db
 from api.models.im_certificates import IMCertificate
 from api.models.instructionalmaterials import InstructionalMaterial
 from api.models.authors import Author
 from api.models.users import User
+from api.models.universityims import UniversityIM
+from api.models.serviceims import ServiceIM
 from api.services.email_service import EmailService
+from api.services.email_templates import EmailTemplates
+from api.services.email_outbox_service import EmailOutboxService
+from api.services.certificate_verification_service import CertificateVerificationService
+from api.services.certificate_raster_renderer import CertificateRasterRenderer
+from api.services.s3_client import get_s3_client
 
 class CertificateService:
-    TEMPLATE_S3_KEY = 'requirements/cert-of-appreciation.docx'
+    # Point at a .json layout to use the raster renderer instead of the DOCX template
+    TEMPLATE_S3_KEY = os.getenv('CERTIFICATE_TEMPLATE_S3_KEY', 'requirements/cert-of-appreciation.docx')
+    # template_source of certificates rendered from a template_file uploaded with the request
+    UPLOADED_TEMPLATE_SOURCE = 'upload'
     GENERATED_CERTIFICATES_PREFIX = 'generated-certificates'
     QR_PLACEHOLDER = '[QR CODE SPACE]'
     QR_INLINE_WIDTH_INCHES = 1.5
     QR_FLOATING_WIDTH_INCHES = 1.35
+    DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    PDF_CONTENT_TYPE = 'application/pdf'
+
+    THUMBNAIL_WIDTH = int(os.getenv('CERTIFICATE_THUMBNAIL_WIDTH', 480))
+    ZIP_PREFETCH = int(os.getenv('CERTIFICATE_ZIP_PREFETCH', 4))
+    # Reusable LibreOffice user profiles; also the cap on concurrent LibreOffice conversions
+    LIBREOFFICE_PROFILES = int(os.getenv('CERTIFICATE_LIBREOFFICE_PROFILES', 4))
+
+    _profiles_idle = []
+    _profiles_created = []
+    _profiles_pid = None
+    _profiles_cond = threading.Condition()
+    _template_cache = {}
 
     @staticmethod
-    def generate_certificates(im_id, template_path=None):
+    def generate_certificates(im_id, template_bytes=None):
         """Generate certificates for all authors of an IM.
+
+        Idempotent: an author whose existing certificate was rendered from the
+        same template and the same printed values gets that certificate back
+        without re-rendering, re-uploading or re-emailing. If any input
+        changed, the certificate is re-rendered in place under its QR ID.
         
         Args:
             im_id: The instructional material ID.
-            template_path: Optional path to a custom DOCX template. If not
+            template_bytes: Optional contents of a custom DOCX template. If not
                 provided the default template is downloaded from S3.
         """
         im = InstructionalMaterial.query.get(im_id)
@@ -46,39 +84,37 @@ class CertificateService:
             raise ValueError("No authors found for this IM")
         
         # Get IM details
-        college_name, course_code, course_title, program_name = CertificateService._get_im_details(im)
-        semester = im.semester or "N/A"
-        academic_year = CertificateService._format_academic_year(im.validity)
-        date_issued = date.today().strftime("%B %d, %Y")
+        im_fields = CertificateService._build_im_fields(im)
         
         # Download template from S3 only if a custom one wasn't supplied
-        owns_template = template_path is None
-        if owns_template:
-            template_path = CertificateService._download_template()
+        template_source = CertificateService._template_source(template_bytes)
+        if template_bytes is None:
+            template_bytes = CertificateService._download_template()
+        template_hash = CertificateService._template_hash(template_bytes)
+        
+        # One lookup for every existing certificate of this IM
+        existing_by_user = {}
+        for cert in IMCertificate.query.filter_by(im_id=im_id).order_by(IMCertificate.id.asc()).all():
+            existing_by_user.setdefault(cert.user_id, cert)
         
         certificates = []
-        try:
-            for author in authors:
-                user = User.query.get(author.user_id)
-                if not user:
-                    continue
-                
-                # Generate certificate
-                cert_data = CertificateService._generate_certificate(
-                    template_path, user, college_name, course_code, course_title,
-                    program_name, semester, academic_year, date_issued, im_id, im.validity
-                )
-                
-                certificates.append(cert_data)
-        finally:
-            # Cleanup template only if we downloaded it
-            if owns_template and os.path.exists(template_path):
-                os.remove(template_path)
+        for author in authors:
+            user = User.query.get(author.user_id)
+            if not user:
+                continue
+            
+            # Generate certificate
+            cert_data = CertificateService._generate_certificate(
+                template_bytes, template_hash, user, im_fields,
+                existing=existing_by_user.get(user.id), template_source=template_source,
+            )
+            
+            certificates.append(cert_data)
         
         return certificates
     
     @staticmethod
-    def generate_certificate_for_user(im_id, user_id, template_path=None):
+    def generate_certificate_for_user(im_id, user_id, template_bytes=None):
         """Generate and send a certificate for a single author only.
         
         Useful for post-publish catch-up when an author was missed.
@@ -91,44 +127,65 @@ class CertificateService:
         if not user:
             raise ValueError("User not found")
         
-        college_name, course_code, course_title, program_name = CertificateService._get_im_details(im)
-        semester = im.semester or "N/A"
-        academic_year = CertificateService._format_academic_year(im.validity)
-        date_issued = date.today().strftime("%B %d, %Y")
+        im_fields = CertificateService._build_im_fields(im)
         
-        owns_template = template_path is None
-        if owns_template:
-            template_path = CertificateService._download_template()
+        template_source = CertificateService._template_source(template_bytes)
+        if template_bytes is None:
+            template_bytes = CertificateService._download_template()
         
-        try:
-            cert_data = CertificateService._generate_certificate(
-                template_path, user, college_name, course_code, course_title,
-                program_name, semester, academic_year, date_issued, im_id, im.validity
-            )
-        finally:
-            if owns_template and os.path.exists(template_path):
-                os.remove(template_path)
+        existing = (
+            IMCertificate.query
+            .filter_by(im_id=im_id, user_id=user_id)
+            .order_by(IMCertificate.id.asc())
+            .first()
+        )
+        cert_data = CertificateService._generate_certificate(
+            template_bytes, CertificateService._template_hash(template_bytes), user, im_fields,
+            existing=existing, template_source=template_source,
+        )
         
         return cert_data
 
     @staticmethod
     def get_certificates_for_user(user_id):
-        """Return all certificates issued to a user, enriched with IM details."""
-        from api.models.im_certificates import IMCertificate
-        from api.models.instructionalmaterials import InstructionalMaterial
-        
-        certs = IMCertificate.query.filter_by(user_id=user_id).order_by(IMCertificate.date_issued.desc()).all()
+        """Return all certificates issued to a user, enriched with IM details.
+
+        IMs and their subject/college/program are eager-loaded with the
+        certificates in a single query, and links are presigned locally from
+        the keys persisted at generation time (no S3 round trips).
+        """
+        im_details = joinedload(IMCertificate.instructional_material)
+        certs = (
+            IMCertificate.query
+            .filter_by(user_id=user_id)
+            .options(
+                im_details.joinedload(InstructionalMaterial.university_im).options(
+                    joinedload(UniversityIM.college),
+                    joinedload(UniversityIM.subject),
+                    joinedload(UniversityIM.department),
+                ),
+                im_details.joinedload(InstructionalMaterial.service_im).options(
+                    joinedload(ServiceIM.college),
+                    joinedload(ServiceIM.subject),
+                ),
+            )
+            .order_by(IMCertificate.date_issued.desc())
+            .all()
+        )
+
+        s3 = get_s3_client()
         result = []
         for cert in certs:
-            im = InstructionalMaterial.query.get(cert.im_id)
+            im = cert.instructional_material
             college_name, course_code, course_title, _ = CertificateService._get_im_details(im) if im else ('N/A', 'N/A', 'N/A', 'N/A')
             result.append({
                 'id': cert.id,
                 'qr_id': cert.qr_id,
                 'im_id': cert.im_id,
                 'user_id': cert.user_id,
-                's3_link': CertificateService._try_presign_pdf(cert.qr_id),
-                's3_link_docx': CertificateService._resolve_docx_link(cert.qr_id),
+                's3_link': CertificateService._presign_key(cert.pdf_s3_link, s3=s3),
+                's3_link_docx': CertificateService._presign_key(cert.s3_link, s3=s3),
+                'thumbnail_url': CertificateService._presign_key(cert.thumbnail_key, s3=s3),
                 'date_issued': cert.date_issued.isoformat() if cert.date_issued else None,
                 'created_at': cert.created_at.isoformat() if cert.created_at else None,
                 'subject_code': course_code,
@@ -137,6 +194,101 @@ class CertificateService:
             })
         return result
 
+    @staticmethod
+    def backfill_thumbnails(batch_size=50):
+        """Create thumbnails for certificates that have a PDF but no preview yet.
+
+        Returns (checked, created).
+        """
+        bucket_name = os.getenv('AWS_BUCKET_NAME')
+        s3 = get_s3_client()
+        checked = created = 0
+        last_id = 0
+        while True:
+            batch = (
+                IMCertificate.query
+                .filter(
+                    IMCertificate.thumbnail_key.is_(None),
+                    IMCertificate.pdf_s3_link.isnot(None),
+                    IMCertificate.id > last_id,
+                )
+                .order_by(IMCertificate.id.asc())
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            for cert in batch:
+                checked += 1
+                try:
+                    pdf_buffer = BytesIO()
+                    s3.download_fileobj(bucket_name, cert.pdf_s3_link, pdf_buffer)
+                    cert.thumbnail_key = CertificateService._upload_thumbnail(cert.qr_id, pdf_buffer.getvalue(), s3=s3)
+                except ClientError as e:
+                    print(f"Could not load {cert.pdf_s3_link}: {str(e)}")
+                if cert.thumbnail_key:
+                    created += 1
+            last_id = batch[-1].id
+            db.session.commit()
+        return checked, created
+
+    @staticmethod
+    def stream_certificates_zip(im_id, prefetch=None):
+        """Return a generator of ZIP bytes with every certificate file of an IM, or None if it has none.
+
+        The archive is built on the fly: S3 objects are fetched by a small worker
+        pool at most `prefetch` objects ahead of the writer, each is written as a
+        stored (uncompressed, PDFs/DOCX are already compressed) entry, and the
+        bytes are yielded as soon as they are produced. Memory is bounded by the
+        prefetch window, not by the number of certificates.
+        """
+        certs = (
+            IMCertificate.query
+            .filter_by(im_id=im_id)
+            .options(joinedload(IMCertificate.user))
+            .order_by(IMCertificate.id.asc())
+            .all()
+        )
+        entries = []
+        for cert in certs:
+            base_name = re.sub(r'[^A-Za-z0-9._-]+', '_', f"{cert.qr_id}_{CertificateService._build_author_name(cert.user)}")
+            if cert.pdf_s3_link:
+                entries.append((f"{base_name}.pdf", cert.pdf_s3_link))
+            if cert.s3_link and cert.s3_link != cert.pdf_s3_link:
+                entries.append((f"{base_name}.docx", cert.s3_link))
+        if not entries:
+            return None
+        prefetch = prefetch or CertificateService.ZIP_PREFETCH
+        return CertificateService._zip_stream(entries, prefetch)
+
+    @staticmethod
+    def sync_pdf_links(batch_size=100):
+        """Backfill pdf_s3_link for certificates issued before it was persisted.
+
+        Checks S3 once per legacy certificate; returns (checked, found).
+        """
+        checked = found = 0
+        last_id = 0
+        while True:
+            batch = (
+                IMCertificate.query
+                .filter(IMCertificate.pdf_s3_link.is_(None), IMCertificate.id > last_id)
+                .order_by(IMCertificate.id.asc())
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            for cert in batch:
+                checked += 1
+                key = f"{CertificateService.GENERATED_CERTIFICATES_PREFIX}/{cert.qr_id}.pdf"
+                if CertificateService._key_exists_in_s3(key):
+                    cert.pdf_s3_link = key
+                    found += 1
+            last_id = batch[-1].id
+            db.session.commit()
+        return checked, found
+
     @staticmethod
     def _get_im_details(im):
         """Extract college, course, and program details from IM"""
@@ -168,197 +320,336 @@ class CertificateService:
     
     @staticmethod
     def _download_template():
-        """Download certificate template from S3"""
+        """Download certificate template from S3 and return its bytes.
+
+        The last copy is kept in-process and revalidated by ETag, so repeated
+        runs only pay for a 304 instead of a full download.
+        """
         bucket_name = os.getenv('AWS_BUCKET_NAME')
         s3_key = CertificateService.TEMPLATE_S3_KEY
         
-        s3 = boto3.client('s3')
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.docx')
-        temp_file.close()
-        
-        s3.download_file(bucket_name, s3_key, temp_file.name)
-        return temp_file.name
+        s3 = get_s3_client()
+        cached = CertificateService._template_cache.get(s3_key)
+        params = {'Bucket': bucket_name, 'Key': s3_key}
+        if cached:
+            params['IfNoneMatch'] = cached[0]
+        try:
+            response = s3.get_object(**params)
+        except ClientError as e:
+            if cached and e.response.get('Error', {}).get('Code') in ('304', 'NotModified'):
+                return cached[1]
+            raise
+        template_bytes = response['Body'].read()
+        CertificateService._template_cache[s3_key] = (response.get('ETag'), template_bytes)
+        return template_bytes
     
     @staticmethod
-    def _generate_certificate(template_path, user, college_name, course_code, course_title,
-                             program_name, semester, academic_year, date_issued, im_id, validity):
-        """Generate a single certificate for a user"""
-        # Load template
-        doc = Document(template_path)
+    def _build_im_fields(im):
+        """Collect the IM-level values that appear on every author's certificate."""
+        college_name, course_code, course_title, program_name = CertificateService._get_im_details(im)
+        semester = im.semester or "N/A"
+        return {
+            'im_id': im.id,
+            'college_name': college_name,
+            'course_code': course_code,
+            'course_title': course_title,
+            'program_name': program_name,
+            'semester': semester,
+            'semester_label': CertificateService._format_semester_label(semester),
+            'academic_year': CertificateService._format_academic_year(im.validity),
+            'validity_duration': CertificateService._format_validity_duration(im.validity),
+            'course_code_and_title': f"{course_code}: {course_title}",
+        }
 
+    @staticmethod
+    def _build_certificate_fields(im_fields, user, issued_on):
+        """Extend IM-level fields with the author-specific values for one certificate."""
         author_name = CertificateService._build_author_name(user)
         author_rank = user.rank or ""
-        author_rank_and_name = f"{author_rank} {author_name}".strip()
-        semester_label = CertificateService._format_semester_label(semester)
-        validity_duration = CertificateService._format_validity_duration(validity)
-        course_code_and_title = f"{course_code}: {course_title}"
+        return {
+            **im_fields,
+            'author_name': author_name,
+            'author_rank': author_rank,
+            'author_rank_and_name': f"{author_rank} {author_name}".strip(),
+            'date_issued': issued_on.strftime("%B %d, %Y"),
+        }
+
+    @staticmethod
+    def _template_source(template_bytes):
+        """What to record as a certificate's template_source: the default template's key, or 'upload'."""
+        if template_bytes is None:
+            return CertificateService.TEMPLATE_S3_KEY
+        return CertificateService.UPLOADED_TEMPLATE_SOURCE
+
+    @staticmethod
+    def _template_hash(template_bytes):
+        """SHA-256 of the template; for a raster layout, of the layout plus its background's version."""
+        digest = hashlib.sha256(template_bytes)
+        layout = CertificateRasterRenderer.parse_layout(template_bytes)
+        if layout is not None:
+            digest.update(CertificateRasterRenderer.background_version(layout['background']).encode('utf-8'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _certificate_input_hash(template_hash, user_id, fields):
+        """Hash everything that determines a certificate's content.
+
+        The issue date is excluded: a re-render keeps the original date, so it
+        never makes an otherwise unchanged certificate look stale.
+        """
+        printed = {k: v for k, v in fields.items() if k != 'date_issued'}
+        payload = json.dumps(
+            {'template': template_hash, 'user_id': user_id, 'fields': printed},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _generate_certificate(template_bytes, template_hash, user, im_fields, existing=None, template_source=None):
+        """Generate a single certificate for a user, reusing `existing` when its inputs match.
+
+        Legacy certificates without an input hash are treated as current; the
+        re-render sweep is what refreshes those.
+        """
+        issued_on = existing.date_issued if existing is not None else date.today()
+        fields = CertificateService._build_certificate_fields(im_fields, user, issued_on)
+        input_hash = CertificateService._certificate_input_hash(template_hash, user.id, fields)
+
+        if existing is not None and existing.s3_link and existing.input_hash in (None, input_hash):
+            s3 = get_s3_client()
+            return {
+                'qr_id': existing.qr_id,
+                'user_id': user.id,
+                'author_name': fields['author_name'],
+                's3_link': CertificateService._presign_key(existing.pdf_s3_link, s3=s3),
+                's3_link_docx': CertificateService._presign_key(existing.s3_link, s3=s3),
+                'reused': True,
+            }
+
+        cert = existing
+        if cert is None:
+            # Create certificate record to get ID
+            cert = IMCertificate(
+                qr_id=f"CERT-TEMP-{im_fields['im_id']}-{user.id}",
+                im_id=im_fields['im_id'],
+                user_id=user.id,
+                s3_link="",
+                date_issued=issued_on
+            )
+            try:
+                with db.session.begin_nested():
+                    db.session.add(cert)
+                    db.session.flush()
+            except IntegrityError:
+                # A concurrent request issued it first (the unique index waits for
+                # its commit), so hand back that certificate instead of a second one
+                winner = IMCertificate.query.filter_by(im_id=im_fields['im_id'], user_id=user.id).first()
+                if winner is None:
+                    raise
+                return CertificateService._generate_certificate(
+                    template_bytes, template_hash, user, im_fields, existing=winner, template_source=template_source
+                )
+            
+            # Update QR ID with actual ID
+            cert.qr_id = f"CERT-{cert.id}"
+
+        docx_bytes, pdf_bytes = CertificateService._render_certificate(
+            template_bytes, fields, cert.qr_id, cert.date_issued
+        )
+        docx_key, pdf_key, thumbnail_key = CertificateService._upload_certificate_files(
+            cert.qr_id, docx_bytes, pdf_bytes
+        )
+
+        # Persist the keys that exist so listings never have to probe S3
+        cert.s3_link = docx_key
+        cert.pdf_s3_link = pdf_key
+        cert.thumbnail_key = thumbnail_key
+        cert.template_hash = template_hash
+        cert.template_source = template_source
+        cert.input_hash = input_hash
+        EmailOutboxService.enqueue('certificate', qr_id=cert.qr_id)
+        db.session.commit()
+        CertificateVerificationService.invalidate(cert.qr_id)
+
+        s3 = get_s3_client()
+        return {
+            'qr_id': cert.qr_id,
+            'user_id': user.id,
+            'author_name': fields['author_name'],
+            's3_link': CertificateService._presign_key(pdf_key, s3=s3),    # PDF presigned URL, or None if conversion failed
+            's3_link_docx': CertificateService._presign_key(docx_key, s3=s3),  # DOCX presigned URL (the PDF for raster layouts)
+            'reused': False,
+        }
+
+    @staticmethod
+    def _render_certificate(template_bytes, fields, qr_id, issued_on):
+        """Render one certificate to (docx_bytes, pdf_bytes); pdf_bytes is None if conversion failed.
+
+        A JSON layout template takes the raster fast path and yields (None, pdf_bytes).
+        Touches neither the database nor S3 (apart from the cached raster background),
+        so it is safe to call from worker threads.
+        """
+        layout = CertificateRasterRenderer.parse_layout(template_bytes)
+        if layout is not None:
+            qr_payload = CertificateService._build_qr_payload(fields, qr_id, issued_on)
+            return None, CertificateRasterRenderer.render(layout, fields, qr_payload)
+
+        # Load template (a fresh stream per certificate; Document mutates in place)
+        doc = Document(BytesIO(template_bytes))
 
         replacements, regex_replacements = CertificateService._build_replacement_maps(
-            college_name=college_name,
-            course_code=course_code,
-            course_title=course_title,
-            author_rank=author_rank,
-            author_name=author_name,
-            author_rank_and_name=author_rank_and_name,
-            program_name=program_name,
-            semester_label=semester_label,
-            academic_year=academic_year,
-            date_issued=date_issued,
-            course_code_and_title=course_code_and_title,
-            validity_duration=validity_duration,
+            college_name=fields['college_name'],
+            course_code=fields['course_code'],
+            course_title=fields['course_title'],
+            author_rank=fields['author_rank'],
+            author_name=fields['author_name'],
+            author_rank_and_name=fields['author_rank_and_name'],
+            program_name=fields['program_name'],
+            semester_label=fields['semester_label'],
+            academic_year=fields['academic_year'],
+            date_issued=fields['date_issued'],
+            course_code_and_title=fields['course_code_and_title'],
+            validity_duration=fields['validity_duration'],
         )
 
         CertificateService._apply_template_replacements(
             doc,
             replacements=replacements,
             regex_replacements=regex_replacements,
-            semester_label=semester_label,
-            academic_year=academic_year,
-            date_issued=date_issued,
-            validity_duration=validity_duration,
+            semester_label=fields['semester_label'],
+            academic_year=fields['academic_year'],
+            date_issued=fields['date_issued'],
+            validity_duration=fields['validity_duration'],
         )
-        
-        # Create certificate record to get ID
-        cert = IMCertificate(
-            qr_id=f"CERT-TEMP",
-            im_id=im_id,
-            user_id=user.id,
-            s3_link="",
-            date_issued=date.today()
+
+        qr_img = CertificateService._generate_qr_code(
+            CertificateService._build_qr_payload(fields, qr_id, issued_on)
         )
-        db.session.add(cert)
-        db.session.flush()
-        
-        # Update QR ID with actual ID
-        cert.qr_id = f"CERT-{cert.id}"
-        
-        # Generate QR code
-        qr_data = {
-            "qr_id": cert.qr_id,
-            "author_name": author_name,
-            "im_id": im_id,
-            "date_issued": date_issued
-        }
-        qr_img = CertificateService._generate_qr_code(json.dumps(qr_data))
         
         # Add QR code to document (bottom right)
         CertificateService._add_qr_to_document(doc, qr_img)
         
-        # Save DOCX to temp file
-        temp_output = tempfile.NamedTemporaryFile(delete=False, suffix='.docx')
-        doc.save(temp_output.name)
-        temp_output.close()
+        # Keep the rendered DOCX in memory
+        docx_buffer = BytesIO()
+        doc.save(docx_buffer)
+        docx_bytes = docx_buffer.getvalue()
 
         # Convert DOCX → PDF (best-effort; won't crash if unavailable)
-        pdf_path = CertificateService._convert_docx_to_pdf(temp_output.name)
+        pdf_bytes = CertificateService._convert_docx_to_pdf(docx_bytes)
+        return docx_bytes, pdf_bytes
 
-        # Upload DOCX to S3
-        docx_key = f"{CertificateService.GENERATED_CERTIFICATES_PREFIX}/{cert.qr_id}.docx"
-        docx_s3_link = CertificateService._upload_to_s3(temp_output.name, docx_key)
+    @staticmethod
+    def _build_qr_payload(fields, qr_id, issued_on):
+        """QR JSON; the signed token lets /certificates/verify answer with only an existence check."""
+        qr_data = {
+            "qr_id": qr_id,
+            "author_name": fields['author_name'],
+            "im_id": fields['im_id'],
+            "date_issued": fields['date_issued']
+        }
+        token = CertificateVerificationService.build_token(
+            qr_id, fields['author_name'], fields['course_code_and_title'], issued_on.isoformat()
+        )
+        if token:
+            qr_data["token"] = token
+        return json.dumps(qr_data)
 
-        # Upload PDF to S3 if conversion succeeded
-        pdf_s3_link = None
-        if pdf_path:
-            pdf_key = f"{CertificateService.GENERATED_CERTIFICATES_PREFIX}/{cert.qr_id}.pdf"
-            pdf_s3_link = CertificateService._upload_to_s3(pdf_path, pdf_key)
+    @staticmethod
+    def _upload_certificate_files(qr_id, docx_bytes, pdf_bytes, s3=None):
+        """Upload a rendered certificate and return (docx_key, pdf_key, thumbnail_key).
 
-        # Persist the DOCX key as the stable s3_link (PDF can be re-derived from qr_id)
-        cert.s3_link = docx_key
-        db.session.commit()
+        pdf_key and thumbnail_key are None without a PDF. Raster certificates have
+        no DOCX, so the PDF key is returned in both positions (s3_link is not nullable).
+        """
+        docx_key = None
+        if docx_bytes:
+            docx_key = f"{CertificateService.GENERATED_CERTIFICATES_PREFIX}/{qr_id}.docx"
+            CertificateService._upload_to_s3(docx_bytes, docx_key, CertificateService.DOCX_CONTENT_TYPE, s3=s3)
+
+        pdf_key = None
+        if pdf_bytes:
+            pdf_key = f"{CertificateService.GENERATED_CERTIFICATES_PREFIX}/{qr_id}.pdf"
+            CertificateService._upload_to_s3(pdf_bytes, pdf_key, CertificateService.PDF_CONTENT_TYPE, s3=s3)
+        thumbnail_key = CertificateService._upload_thumbnail(qr_id, pdf_bytes, s3=s3)
+        return docx_key or pdf_key, pdf_key, thumbnail_key
 
-        # Email: one message with DOCX always attached; PDF too if available
+    @staticmethod
+    def _upload_thumbnail(qr_id, pdf_bytes, s3=None):
+        """Render and upload the page-one preview; returns its key, or None if there is none."""
+        png_bytes = CertificateService._render_thumbnail(pdf_bytes) if pdf_bytes else None
+        if not png_bytes:
+            return None
+        thumbnail_key = f"{CertificateService.GENERATED_CERTIFICATES_PREFIX}/{qr_id}.thumb.png"
+        CertificateService._upload_to_s3(png_bytes, thumbnail_key, 'image/png', s3=s3)
+        return thumbnail_key
+
+    @staticmethod
+    def _render_thumbnail(pdf_bytes):
+        """Rasterize page one of a PDF to a THUMBNAIL_WIDTH-wide PNG; None on failure."""
+        try:
+            pdf = pdfium.PdfDocument(pdf_bytes)
+            try:
+                page = pdf[0]
+                bitmap = page.render(scale=CertificateService.THUMBNAIL_WIDTH / page.get_width())
+                png_buffer = BytesIO()
+                bitmap.to_pil().save(png_buffer, format='PNG')
+                return png_buffer.getvalue()
+            finally:
+                pdf.close()
+        except Exception as e:
+            print(f"Certificate thumbnail failed: {str(e)}")
+            return None
+
+    @staticmethod
+    def _certificate_email_args(qr_id):
+        """Arguments for _send_certificate_email, with the files as S3 keys (used by the email outbox)."""
+        cert = IMCertificate.query.filter_by(qr_id=qr_id).first()
+        if cert is None:
+            raise LookupError(f"Certificate {qr_id} no longer exists")
+        fields = CertificateService._build_certificate_fields(
+            CertificateService._build_im_fields(cert.instructional_material), cert.user, cert.date_issued
+        )
+        return {
+            'receiver_email': cert.user.email,
+            'qr_id': cert.qr_id,
+            'fields': fields,
+            # Raster certificates store the PDF key in both columns
+            'docx_key': cert.s3_link if cert.s3_link != cert.pdf_s3_link else None,
+            'pdf_key': cert.pdf_s3_link,
+        }
+
+    @staticmethod
+    def _send_certificate_email(receiver_email, qr_id, fields, docx_bytes, pdf_bytes):
+        """Email one certificate: DOCX (if any) and PDF (if available) are attached."""
         today = date.today()
         try:
             valid_until = today.replace(year=today.year + 5).strftime("%B %d, %Y")
         except ValueError:
             valid_until = date(today.year + 5, 2, 28).strftime("%B %d, %Y")
 
-        email_subject = f"Certificate of Appreciation \u2014 {course_code} ({academic_year})"
-        email_body = f"""
-<p>Dear {author_name},</p>
-
-<p>On behalf of the institution, we are pleased to present you with a
-<strong>Certificate of Appreciation</strong> in recognition of your valuable contribution
-in developing an instructional material. The details of your certificate are as follows:</p>
-
-<table style="border-collapse:collapse;font-size:14px;margin:12px 0;">
-  <tr>
-    <td style="padding:5px 20px 5px 0;font-weight:bold;white-space:nowrap;color:#555;">Certificate ID</td>
-    <td style="padding:5px 0;">{cert.qr_id}</td>
-  </tr>
-  <tr>
-    <td style="padding:5px 20px 5px 0;font-weight:bold;white-space:nowrap;color:#555;">Subject Code</td>
-    <td style="padding:5px 0;">{course_code}</td>
-  </tr>
-  <tr>
-    <td style="padding:5px 20px 5px 0;font-weight:bold;white-space:nowrap;color:#555;">Subject Title</td>
-    <td style="padding:5px 0;">{course_title}</td>
-  </tr>
-  <tr>
-    <td style="padding:5px 20px 5px 0;font-weight:bold;white-space:nowrap;color:#555;">Program</td>
-    <td style="padding:5px 0;">{program_name}</td>
-  </tr>
-  <tr>
-    <td style="padding:5px 20px 5px 0;font-weight:bold;white-space:nowrap;color:#555;">College</td>
-    <td style="padding:5px 0;">{college_name}</td>
-  </tr>
-  <tr>
-    <td style="padding:5px 20px 5px 0;font-weight:bold;white-space:nowrap;color:#555;">Semester</td>
-    <td style="padding:5px 0;">{semester}</td>
-  </tr>
-  <tr>
-    <td style="padding:5px 20px 5px 0;font-weight:bold;white-space:nowrap;color:#555;">Academic Year</td>
-    <td style="padding:5px 0;">{academic_year}</td>
-  </tr>
-  <tr>
-    <td style="padding:5px 20px 5px 0;font-weight:bold;white-space:nowrap;color:#555;">Date Issued</td>
-    <td style="padding:5px 0;">{date_issued}</td>
-  </tr>
-  <tr>
-    <td style="padding:5px 20px 5px 0;font-weight:bold;white-space:nowrap;color:#555;">Valid Until</td>
-    <td style="padding:5px 0;">{valid_until}</td>
-  </tr>
-</table>
-
-<p>Your certificate is attached to this email in DOCX and PDF formats.
-Please retain a copy for your personal records. A QR code is embedded in the
-certificate for quick verification.</p>
-
-<p>We truly appreciate your dedication and efforts in enhancing the quality of
-instruction. Your work reflects a deep commitment to academic excellence and to
-the growth of your students.</p>
-
-<p>Congratulations, and thank you.</p>
-
-<p>Sincerely,<br>
-<strong>Instructional Materials Management System (IMMS)</strong></p>
-"""
-        attachments = [(open(temp_output.name, 'rb').read(), f"{cert.qr_id}.docx")]
-        if pdf_path and os.path.exists(pdf_path):
-            attachments.append((open(pdf_path, 'rb').read(), f"{cert.qr_id}.pdf"))
-        EmailService.send_files_to_recipients(
-            user.email,
+        email_subject = f"Certificate of Appreciation \u2014 {fields['course_code']} ({fields['academic_year']})"
+        email_body = EmailTemplates.render(
+            'certificate.html',
+            qr_id=qr_id,
+            valid_until=valid_until,
+            **{key: str(fields[key]) for key in (
+                'author_name', 'course_code', 'course_title', 'program_name',
+                'college_name', 'semester', 'academic_year', 'date_issued',
+            )},
+        )
+        attachments = []
+        if docx_bytes:
+            attachments.append((docx_bytes, f"{qr_id}.docx"))
+        if pdf_bytes:
+            attachments.append((pdf_bytes, f"{qr_id}.pdf"))
+        return EmailService.send_files_to_recipients(
+            receiver_email,
             attachments,
             subject=email_subject,
             html_body=email_body,
         )
 
-        # Cleanup temp files
-        os.remove(temp_output.name)
-        if pdf_path:
-            try:
-                shutil.rmtree(os.path.dirname(pdf_path), ignore_errors=True)
-            except Exception:
-                pass
-
-        return {
-            'qr_id': cert.qr_id,
-            'user_id': user.id,
-            'author_name': author_name,
-            's3_link': pdf_s3_link,           # PDF presigned URL, or None if conversion failed
-            's3_link_docx': docx_s3_link,     # DOCX presigned URL, always present
-        }
-
     @staticmethod
     def _build_author_name(user):
         """Build full display name for certificate text."""
@@ -817,87 +1108,182 @@ the growth of your students.</p>
         return anchor
     
     @staticmethod
-    def _upload_to_s3(file_path, s3_key):
-        """Upload a file to S3 and return a presigned URL valid for 7 days."""
+    def _zip_stream(entries, prefetch):
+        """Yield a ZIP of (arcname, s3_key) entries, fetching objects concurrently in order."""
         bucket_name = os.getenv('AWS_BUCKET_NAME')
-        s3 = boto3.client('s3')
-        s3.upload_file(file_path, bucket_name, s3_key)
-        presigned_url = s3.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': bucket_name, 'Key': s3_key},
-            ExpiresIn=604800  # 7 days
-        )
-        return presigned_url
+        s3 = get_s3_client()
+
+        def fetch(key):
+            try:
+                return s3.get_object(Bucket=bucket_name, Key=key)['Body'].read()
+            except ClientError as e:
+                print(f"Skipping {key} in certificate ZIP: {str(e)}")
+                return None
+
+        sink = _ZipSink()
+        with ThreadPoolExecutor(max_workers=prefetch) as executor:
+            with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+                pending = deque()
+                remaining = iter(entries)
+                for arcname, key in remaining:
+                    pending.append((arcname, executor.submit(fetch, key)))
+                    if len(pending) >= prefetch:
+                        break
+                while pending:
+                    arcname, future = pending.popleft()
+                    next_entry = next(remaining, None)
+                    if next_entry is not None:
+                        pending.append((next_entry[0], executor.submit(fetch, next_entry[1])))
+                    data = future.result()
+                    if data is None:
+                        continue
+                    with archive.open(arcname, 'w', force_zip64=True) as member:
+                        member.write(data)
+                    del data
+                    yield sink.drain()
+            # Central directory is written on close
+            yield sink.drain()
 
     @staticmethod
-    def _convert_docx_to_pdf(docx_path):
-        """Convert a DOCX file to PDF.
+    def _upload_to_s3(data, s3_key, content_type=None, s3=None):
+        """Upload in-memory bytes to S3."""
+        bucket_name = os.getenv('AWS_BUCKET_NAME')
+        s3 = s3 or get_s3_client()
+        extra_args = {'ContentType': content_type} if content_type else None
+        s3.upload_fileobj(BytesIO(data), bucket_name, s3_key, ExtraArgs=extra_args)
+
+    @staticmethod
+    def _convert_docx_to_pdf(docx_bytes):
+        """Convert in-memory DOCX bytes to PDF bytes.
         Tries docx2pdf first (uses Word on Windows, LibreOffice on Linux/macOS),
         then falls back to a raw LibreOffice subprocess.
-        Returns the path to the generated PDF, or None if both methods fail.
+        Both converters only work on files, so the DOCX is written to a scratch
+        directory (CERTIFICATE_SCRATCH_DIR, e.g. /dev/shm, or the system temp dir)
+        that is removed as soon as the PDF has been read back.
+        Returns the PDF bytes, or None if both methods fail.
         """
-        out_dir = tempfile.mkdtemp()
-        base = os.path.splitext(os.path.basename(docx_path))[0]
-        pdf_path = os.path.join(out_dir, base + '.pdf')
-
-        # --- Method 1: docx2pdf (cross-platform) ---
-        try:
-            import pythoncom  # type: ignore
-            from docx2pdf import convert as d2p_convert  # type: ignore
-            pythoncom.CoInitialize()
+        scratch_root = os.getenv('CERTIFICATE_SCRATCH_DIR') or None
+        with tempfile.TemporaryDirectory(dir=scratch_root) as out_dir:
+            docx_path = os.path.join(out_dir, 'certificate.docx')
+            pdf_path = os.path.join(out_dir, 'certificate.pdf')
+            with open(docx_path, 'wb') as f:
+                f.write(docx_bytes)
+
+            # --- Method 1: docx2pdf (cross-platform) ---
             try:
-                d2p_convert(docx_path, pdf_path)
-            finally:
-                pythoncom.CoUninitialize()
-            if os.path.exists(pdf_path):
-                return pdf_path
-        except Exception as e:
-            print(f"[cert] docx2pdf failed ({e}), trying LibreOffice…")
+                import pythoncom  # type: ignore
+                from docx2pdf import convert as d2p_convert  # type: ignore
+                pythoncom.CoInitialize()
+                try:
+                    d2p_convert(docx_path, pdf_path)
+                finally:
+                    pythoncom.CoUninitialize()
+                if os.path.exists(pdf_path):
+                    with open(pdf_path, 'rb') as f:
+                        return f.read()
+            except Exception as e:
+                print(f"[cert] docx2pdf failed ({e}), trying LibreOffice…")
+
+            # --- Method 2: LibreOffice headless subprocess ---
+            try:
+                with CertificateService._libreoffice_profile(scratch_root) as profile_arg:
+                    subprocess.run(
+                        [
+                            'libreoffice', '--headless',
+                            profile_arg,
+                            '--convert-to', 'pdf',
+                            '--outdir', out_dir,
+                            docx_path,
+                        ],
+                        check=True,
+                        capture_output=True,
+                        timeout=120,
+                    )
+                if os.path.exists(pdf_path):
+                    with open(pdf_path, 'rb') as f:
+                        return f.read()
+            except Exception as e:
+                print(f"[cert] LibreOffice fallback also failed ({e})")
 
-        # --- Method 2: LibreOffice headless subprocess ---
+        return None  # caller must handle gracefully
+
+    @staticmethod
+    @contextmanager
+    def _libreoffice_profile(scratch_root):
+        """Borrow one of at most LIBREOFFICE_PROFILES LibreOffice user profiles for a conversion.
+
+        Parallel conversions need separate profiles so they don't block on (or
+        corrupt) the single default one. The profiles are shared by slot rather
+        than created per thread, so the number of directories stays bounded, and
+        they are removed at exit (remove_libreoffice_profiles). A conversion waits
+        for a free profile once every slot is in use.
+        """
+        cond = CertificateService._profiles_cond
+        with cond:
+            if CertificateService._profiles_pid != os.getpid():
+                # Forked worker: the parent's profiles belong to the parent
+                CertificateService._profiles_idle = []
+                CertificateService._profiles_created = []
+                CertificateService._profiles_pid = os.getpid()
+            while (not CertificateService._profiles_idle
+                   and len(CertificateService._profiles_created) >= max(1, CertificateService.LIBREOFFICE_PROFILES)):
+                cond.wait()
+            if CertificateService._profiles_idle:
+                profile_dir = CertificateService._profiles_idle.pop()
+            else:
+                slot = len(CertificateService._profiles_created)
+                profile_dir = tempfile.mkdtemp(prefix=f'lo-profile-{slot}-', dir=scratch_root)
+                CertificateService._profiles_created.append(profile_dir)
         try:
-            subprocess.run(
-                [
-                    'libreoffice', '--headless',
-                    '--convert-to', 'pdf',
-                    '--outdir', out_dir,
-                    docx_path,
-                ],
-                check=True,
-                capture_output=True,
-                timeout=120,
-            )
-            lo_pdf = os.path.join(out_dir, base + '.pdf')
-            if os.path.exists(lo_pdf):
-                return lo_pdf
-        except Exception as e:
-            print(f"[cert] LibreOffice fallback also failed ({e})")
+            yield f"-env:UserInstallation=file://{profile_dir}"
+        finally:
+            with cond:
+                if profile_dir in CertificateService._profiles_created:
+                    CertificateService._profiles_idle.append(profile_dir)
+                    cond.notify()
+                else:
+                    shutil.rmtree(profile_dir, ignore_errors=True)
 
-        shutil.rmtree(out_dir, ignore_errors=True)
-        return None  # caller must handle gracefully
+    @staticmethod
+    def remove_libreoffice_profiles():
+        """Delete this process's LibreOffice profiles (registered with atexit)."""
+        with CertificateService._profiles_cond:
+            if CertificateService._profiles_pid != os.getpid():
+                return
+            profiles = CertificateService._profiles_created
+            CertificateService._profiles_created = []
+            CertificateService._profiles_idle = []
+        for profile_dir in profiles:
+            shutil.rmtree(profile_dir, ignore_errors=True)
 
     @staticmethod
     def _key_exists_in_s3(key):
         """Return True if the given S3 key exists in the bucket."""
         bucket_name = os.getenv('AWS_BUCKET_NAME')
         try:
-            boto3.client('s3').head_object(Bucket=bucket_name, Key=key)
+            get_s3_client().head_object(Bucket=bucket_name, Key=key)
             return True
         except Exception:
             return False
 
     @staticmethod
-    def _try_presign_pdf(qr_id):
-        """Return a presigned URL for the PDF of this cert, or None if it doesn't exist yet."""
-        key = f"{CertificateService.GENERATED_CERTIFICATES_PREFIX}/{qr_id}.pdf"
-        if not CertificateService._key_exists_in_s3(key):
+    def _presign_key(key, s3=None, expires_in=604800):
+        """Presign a stored S3 key locally (no network call). Returns None for empty keys;
+        legacy rows that stored a full URL are returned as-is."""
+        if not key:
             return None
+        if key.startswith('http://') or key.startswith('https://'):
+            return key
         bucket_name = os.getenv('AWS_BUCKET_NAME')
-        return boto3.client('s3').generate_presigned_url(
-            'get_object',
-            Params={'Bucket': bucket_name, 'Key': key},
-            ExpiresIn=604800
-        )
+        try:
+            s3 = s3 or get_s3_client()
+            return s3.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': bucket_name, 'Key': key},
+                ExpiresIn=expires_in
+            )
+        except Exception:
+            return None
 
     @staticmethod
     def _resolve_s3_link(raw_link):
@@ -915,7 +1301,7 @@ the growth of your students.</p>
         if key.endswith('.docx'):
             key = key[:-5] + '.pdf'
         try:
-            s3 = boto3.client('s3')
+            s3 = get_s3_client()
             return s3.generate_presigned_url(
                 'get_object',
                 Params={'Bucket': bucket_name, 'Key': key},
@@ -924,17 +1310,24 @@ the growth of your students.</p>
         except Exception:
             return raw_link
 
-    @staticmethod
-    def _resolve_docx_link(qr_id):
-        """Generate a fresh presigned URL for the DOCX of a given cert (by qr_id)."""
-        bucket_name = os.getenv('AWS_BUCKET_NAME')
-        key = f"{CertificateService.GENERATED_CERTIFICATES_PREFIX}/{qr_id}.docx"
-        try:
-            s3 = boto3.client('s3')
-            return s3.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': bucket_name, 'Key': key},
-                ExpiresIn=604800
-            )
-        except Exception:
-            return None
+
+class _ZipSink:
+    """Write-only, non-seekable file object that buffers what zipfile writes until drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+atexit.register(CertificateService.remove_libreoffice_profiles)
@@ -0,0 +1,225 @@
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import aliased
+from api.extensions import db
+from api.models.im_certificates import IMCertificate
+from api.models.im_certificate_aliases import IMCertificateAlias
+from api.models.instructionalmaterials import InstructionalMaterial
+from api.models.universityims import UniversityIM
+from api.models.serviceims import ServiceIM
+from api.models.subjects import Subject
+from api.models.users import User
+
+
+class CertificateVerificationService:
+    """Read-only certificate verification for QR scans.
+
+    Lookups are answered from a process-local LRU of compact entries
+    (qr_id -> holder name, IM subject, date issued). Misses cost one narrow
+    query on the unique qr_id index. QR codes issued with a signed token are
+    answered from the token's claims; a token younger than TOKEN_MAX_AGE_SECONDS
+    only costs an existence check on a cache miss, so a deleted certificate
+    stops verifying. Older tokens (and tokens without an issued-at claim) fall
+    back to the full lookup.
+
+    The cache is per process: invalidate() only clears the calling worker, and
+    other workers keep serving their entry for up to CACHE_TTL_SECONDS.
+    """
+    CACHE_SIZE = int(os.getenv('CERT_VERIFY_CACHE_SIZE', 4096))
+    CACHE_TTL_SECONDS = int(os.getenv('CERT_VERIFY_CACHE_TTL', 3600))
+    TOKEN_MAX_AGE_SECONDS = int(os.getenv('CERT_VERIFY_TOKEN_MAX_AGE', 365 * 24 * 3600))
+
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def verify(qr_id, token=None):
+        """Verify a certificate by QR ID.
+
+        Returns (entry, source) where entry is a dict with holder_name, subject
+        and date_issued, or (None, None) if the certificate does not exist
+        (including one whose signed token is still valid). Raises ValueError
+        if a token is supplied but is invalid or belongs to another certificate.
+        """
+        if token:
+            claims = CertificateVerificationService.decode_token(token)
+            if claims is None:
+                raise ValueError("Invalid certificate signature")
+            if claims.get('q') != qr_id:
+                raise ValueError("Signature does not match this certificate")
+            issued_at = claims.get('i')
+            if isinstance(issued_at, int) and time.time() - issued_at <= CertificateVerificationService.TOKEN_MAX_AGE_SECONDS:
+                exists = (
+                    CertificateVerificationService._cache_get(qr_id) is not None
+                    or CertificateVerificationService._exists(qr_id)
+                )
+                if not exists:
+                    return None, None
+                return {
+                    'qr_id': qr_id,
+                    'holder_name': claims.get('n'),
+                    'subject': claims.get('s'),
+                    'date_issued': claims.get('d'),
+                }, 'signature'
+
+        entry = CertificateVerificationService._cache_get(qr_id)
+        if entry is not None:
+            return CertificateVerificationService._to_dict(qr_id, entry), 'cache'
+
+        entry = CertificateVerificationService._load_entry(qr_id)
+        if entry is None:
+            return None, None
+        CertificateVerificationService._cache_put(qr_id, entry)
+        return CertificateVerificationService._to_dict(qr_id, entry), 'database'
+
+    @staticmethod
+    def invalidate(qr_id):
+        """Drop a cached entry, e.g. after a certificate is re-issued.
+
+        Only this process's cache is cleared; other workers pick up the change
+        once their entry's CACHE_TTL_SECONDS have passed.
+        """
+        with CertificateVerificationService._lock:
+            CertificateVerificationService._cache.pop(qr_id, None)
+
+    @staticmethod
+    def build_token(qr_id, holder_name, subject, date_issued):
+        """Return a signed token ("<payload>.<signature>") for embedding in a QR code,
+        or None if no signing secret is configured."""
+        secret = CertificateVerificationService._signing_key()
+        if secret is None:
+            return None
+        claims = {'q': qr_id, 'n': holder_name, 's': subject, 'd': date_issued, 'i': int(time.time())}
+        payload = CertificateVerificationService._b64encode(
+            json.dumps(claims, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        )
+        signature = hmac.new(secret, payload.encode('ascii'), hashlib.sha256).digest()
+        return f"{payload}.{CertificateVerificationService._b64encode(signature)}"
+
+    @staticmethod
+    def decode_token(token):
+        """Return the claims of a correctly signed token, or None."""
+        secret = CertificateVerificationService._signing_key()
+        if secret is None or not token or token.count('.') != 1:
+            return None
+        payload, signature = token.split('.')
+        expected = hmac.new(secret, payload.encode('ascii', 'ignore'), hashlib.sha256).digest()
+        try:
+            if not hmac.compare_digest(expected, CertificateVerificationService._b64decode(signature)):
+                return None
+            return json.loads(CertificateVerificationService._b64decode(payload))
+        except (ValueError, TypeError):
+            return None
+
+    ################################################################
+    #                    HELPER FUNCTIONS                          #
+    ################################################################
+    @staticmethod
+    def _matches_qr_id(qr_id):
+        """Filter for the certificate with this QR ID; QR IDs of duplicates merged into it stay verifiable."""
+        return or_(
+            IMCertificate.qr_id == qr_id,
+            IMCertificate.id.in_(select(IMCertificateAlias.certificate_id).where(IMCertificateAlias.qr_id == qr_id)),
+        )
+
+    @staticmethod
+    def _exists(qr_id):
+        """Whether a certificate (or a duplicate merged into one) has this QR ID."""
+        return db.session.query(
+            IMCertificate.query.filter(CertificateVerificationService._matches_qr_id(qr_id)).exists()
+        ).scalar()
+
+    @staticmethod
+    def _load_entry(qr_id):
+        """Fetch the compact index entry for one certificate in a single query."""
+        uni_subject = aliased(Subject)
+        svc_subject = aliased(Subject)
+        row = (
+            db.session.query(
+                User.first_name,
+                User.middle_name,
+                User.last_name,
+                func.coalesce(uni_subject.code, svc_subject.code),
+                func.coalesce(uni_subject.name, svc_subject.name),
+                IMCertificate.date_issued,
+            )
+            .select_from(IMCertificate)
+            .join(User, User.id == IMCertificate.user_id)
+            .join(InstructionalMaterial, InstructionalMaterial.id == IMCertificate.im_id)
+            .outerjoin(UniversityIM, UniversityIM.id == InstructionalMaterial.university_im_id)
+            .outerjoin(uni_subject, uni_subject.id == UniversityIM.subject_id)
+            .outerjoin(ServiceIM, ServiceIM.id == InstructionalMaterial.service_im_id)
+            .outerjoin(svc_subject, svc_subject.id == ServiceIM.subject_id)
+            .filter(CertificateVerificationService._matches_qr_id(qr_id))
+            .first()
+        )
+        if row is None:
+            return None
+
+        first_name, middle_name, last_name, code, name, date_issued = row
+        holder_name = " ".join(p for p in (first_name, middle_name, last_name) if p)
+        subject = f"{code}: {name}" if code and name else (code or name or "N/A")
+        return (
+            holder_name,
+            subject,
+            date_issued.isoformat() if date_issued else None,
+            time.monotonic() + CertificateVerificationService.CACHE_TTL_SECONDS,
+        )
+
+    @staticmethod
+    def _cache_get(qr_id):
+        with CertificateVerificationService._lock:
+            entry = CertificateVerificationService._cache.get(qr_id)
+            if entry is None:
+                return None
+            if entry[3] < time.monotonic():
+                del CertificateVerificationService._cache[qr_id]
+                return None
+            CertificateVerificationService._cache.move_to_end(qr_id)
+            return entry
+
+    @staticmethod
+    def _cache_put(qr_id, entry):
+        with CertificateVerificationService._lock:
+            cache = CertificateVerificationService._cache
+            cache[qr_id] = entry
+            cache.move_to_end(qr_id)
+            while len(cache) > CertificateVerificationService.CACHE_SIZE:
+                cache.popitem(last=False)
+
+    @staticmethod
+    def _to_dict(qr_id, entry):
+        holder_name, subject, date_issued, _expires_at = entry
+        return {
+            'qr_id': qr_id,
+            'holder_name': holder_name,
+            'subject': subject,
+            'date_issued': date_issued,
+        }
+
+    @staticmethod
+    def _signing_key():
+        """CERTIFICATE_QR_SECRET, or a key derived from JWT_SECRET_KEY so tokens are
+        never signed with the JWT key itself. None disables signing."""
+        secret = os.getenv('CERTIFICATE_QR_SECRET')
+        if secret:
+            return secret.encode('utf-8')
+        jwt_secret = os.getenv('JWT_SECRET_KEY')
+        if jwt_secret:
+            return hmac.new(jwt_secret.encode('utf-8'), b'certificate-qr', hashlib.sha256).digest()
+        return None
+
+    @staticmethod
+    def _b64encode(data):
+        return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+    @staticmethod
+    def _b64decode(text):
+        return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
@@ -0,0 +1,180 @@
+import os
+import time
+import threading
+from collections import deque
+from datetime import datetime, UTC
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open."""
+
+    def __init__(self, name, retry_in=None):
+        self.name = name
+        self.retry_in = retry_in
+        message = f"{name} circuit is open"
+        if retry_in is not None:
+            message += f" (next probe in {retry_in:.0f}s)"
+        super().__init__(message)
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker for an outbound provider.
+
+    closed:    calls pass; outcomes are kept in a sliding window of the last
+               `window` calls, and once at least `min_calls` are recorded a
+               failure rate >= `failure_rate` opens the breaker.
+    open:      calls are refused (allow() is False) for `cooldown` seconds.
+    half_open: up to `half_open_probes` calls are let through; a success
+               closes the breaker, a failure re-opens it for another cooldown.
+
+    Callers must report every allowed call with record_success() or
+    record_failure().
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_rate=0.5, min_calls=5, window=20, cooldown=60, half_open_probes=1):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.half_open_probes = half_open_probes
+
+        self._state = CircuitBreaker.CLOSED
+        self._outcomes = deque(maxlen=window)  # True = failure
+        self._opened_at = None
+        self._probes = 0
+        self._last_error = None
+        self._last_failure_at = None
+        self._times_opened = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go to the provider now (claims a probe slot when half-open)."""
+        with self._lock:
+            if self._state == CircuitBreaker.OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False
+                self._state = CircuitBreaker.HALF_OPEN
+                self._probes = 0
+            if self._state == CircuitBreaker.HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    return False
+                self._probes += 1
+            return True
+
+    def is_available(self):
+        """Like allow() but without side effects: False only while open and cooling down."""
+        with self._lock:
+            if self._state == CircuitBreaker.OPEN:
+                return time.monotonic() - self._opened_at >= self.cooldown
+            if self._state == CircuitBreaker.HALF_OPEN:
+                return self._probes < self.half_open_probes
+            return True
+
+    def retry_in(self):
+        """Seconds until the next probe is allowed (0 unless open)."""
+        with self._lock:
+            if self._state != CircuitBreaker.OPEN:
+                return 0
+            return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            if self._state == CircuitBreaker.HALF_OPEN:
+                self._close()
+            else:
+                self._outcomes.append(False)
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self._last_error = str(error) if error is not None else None
+            self._last_failure_at = datetime.now(UTC).replace(tzinfo=None)
+            if self._state == CircuitBreaker.HALF_OPEN:
+                self._open()
+                return
+            if self._state == CircuitBreaker.OPEN:
+                return
+            self._outcomes.append(True)
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and sum(self._outcomes) / calls >= self.failure_rate:
+                self._open()
+
+    def reset(self):
+        with self._lock:
+            self._close()
+
+    def status(self):
+        with self._lock:
+            calls = len(self._outcomes)
+            failures = sum(self._outcomes)
+            retry_in = 0
+            if self._state == CircuitBreaker.OPEN:
+                retry_in = max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+            return {
+                'name': self.name,
+                'state': self._state,
+                'window_calls': calls,
+                'window_failures': failures,
+                'failure_rate': round(failures / calls, 3) if calls else 0.0,
+                'retry_in_seconds': round(retry_in, 1),
+                'times_opened': self._times_opened,
+                'last_error': self._last_error,
+                'last_failure_at': self._last_failure_at.isoformat() if self._last_failure_at else None,
+            }
+
+    ################################################################
+    #                    HELPER FUNCTIONS                          #
+    ################################################################
+    def _open(self):
+        if self._state != CircuitBreaker.OPEN:
+            print(f"Circuit '{self.name}' opened: {self._last_error}")
+        self._state = CircuitBreaker.OPEN
+        self._opened_at = time.monotonic()
+        self._times_opened += 1
+
+    def _close(self):
+        if self._state != CircuitBreaker.CLOSED:
+            print(f"Circuit '{self.name}' closed")
+        self._state = CircuitBreaker.CLOSED
+        self._outcomes.clear()
+        self._opened_at = None
+        self._probes = 0
+
+
+_email_breakers = {}
+_email_breakers_pid = None
+_email_breakers_lock = threading.Lock()
+
+
+def get_email_breaker(name):
+    """Return this process's breaker for an email provider ('brevo' or 'smtp').
+
+    Settings come from EMAIL_BREAKER_<NAME>_<SETTING>, falling back to
+    EMAIL_BREAKER_<SETTING>: FAILURE_RATE, MIN_CALLS, WINDOW, COOLDOWN and
+    HALF_OPEN_PROBES. State is per process and starts closed after a fork.
+    """
+    global _email_breakers, _email_breakers_pid
+    with _email_breakers_lock:
+        if _email_breakers_pid != os.getpid():
+            _email_breakers = {}
+            _email_breakers_pid = os.getpid()
+        breaker = _email_breakers.get(name)
+        if breaker is None:
+            def setting(key, default):
+                return os.getenv(f'EMAIL_BREAKER_{name.upper()}_{key}', os.getenv(f'EMAIL_BREAKER_{key}', default))
+
+            breaker = CircuitBreaker(
+                name,
+                failure_rate=float(setting('FAILURE_RATE', 0.5)),
+                min_calls=int(setting('MIN_CALLS', 5)),
+                window=int(setting('WINDOW', 20)),
+                cooldown=float(setting('COOLDOWN', 60)),
+                half_open_probes=int(setting('HALF_OPEN_PROBES', 1)),
+            )
+            _email_breakers[name] = breaker
+        return breaker
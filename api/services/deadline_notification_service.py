@@ -0,0 +1,158 @@
+import os
+from datetime import date, timedelta
+from sqlalchemy import and_, case, exists, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from api.extensions import db
+from api.models.instructionalmaterials import InstructionalMaterial
+from api.models.authors import Author
+from api.models.users import User
+from api.models.subjects import Subject
+from api.models.universityims import UniversityIM
+from api.models.serviceims import ServiceIM
+from api.models.notification_ledger import NotificationLedger
+from api.services.email_outbox_service import EmailOutboxService
+
+
+class DeadlineNotificationService:
+    """Deadline reminders (1..REMINDER_DAYS days before the due date) and past-due notices.
+
+    One query finds every (IM, author) pair that is owed a notice today and
+    has no matching notification_ledger row. Each notice is recorded in the
+    ledger and queued in the email outbox in the same commit. Repeated or
+    overlapping scheduler runs therefore never queue the same notice twice:
+    a countdown reminder goes out once per remaining-days value, and a
+    past-due notice once per due date.
+
+    In digest mode (DEADLINE_NOTIFICATION_DIGEST, or digest=True) all of a
+    recipient's notices from one run go out as a single email, so volume is
+    one email per recipient per run instead of one per IM and author.
+    """
+    REMINDER_DAYS = int(os.getenv('DEADLINE_REMINDER_DAYS', 7))
+    DIGEST_MODE = os.getenv('DEADLINE_NOTIFICATION_DIGEST', 'false').lower() in ('1', 'true', 'yes')
+    INACTIVE_STATUSES = ('Certified', 'Published')
+
+    @staticmethod
+    def send_deadline_notifications(today=None, digest=None):
+        """Queue every notice that is due and not yet in the ledger. Returns how many emails were queued."""
+        today = today or date.today()
+        digest = DeadlineNotificationService.DIGEST_MODE if digest is None else digest
+        for attempt in (1, 2):
+            try:
+                return DeadlineNotificationService._queue_pending(today, digest)
+            except IntegrityError:
+                # An overlapping run recorded some of the same notices first; rescan without them
+                db.session.rollback()
+                if attempt == 2:
+                    raise
+
+    @staticmethod
+    def pending_notifications(today=None):
+        """Notices owed today, as dicts ordered by recipient, due date and IM."""
+        today = today or date.today()
+        kind = DeadlineNotificationService._kind_expression(today)
+        university_subject = aliased(Subject)
+        service_subject = aliased(Subject)
+
+        already_sent = exists().where(and_(
+            NotificationLedger.im_id == InstructionalMaterial.id,
+            NotificationLedger.user_id == User.id,
+            NotificationLedger.due_date == InstructionalMaterial.due_date,
+            NotificationLedger.kind == kind,
+        ))
+        rows = (
+            db.session.query(
+                InstructionalMaterial.id,
+                InstructionalMaterial.due_date,
+                User.id,
+                User.email,
+                func.coalesce(university_subject.name, service_subject.name),
+                kind,
+            )
+            .join(Author, Author.im_id == InstructionalMaterial.id)
+            .join(User, User.id == Author.user_id)
+            .outerjoin(UniversityIM, UniversityIM.id == InstructionalMaterial.university_im_id)
+            .outerjoin(university_subject, university_subject.id == UniversityIM.subject_id)
+            .outerjoin(ServiceIM, ServiceIM.id == InstructionalMaterial.service_im_id)
+            .outerjoin(service_subject, service_subject.id == ServiceIM.subject_id)
+            .filter(
+                InstructionalMaterial.due_date.isnot(None),
+                InstructionalMaterial.due_date <= today + timedelta(days=DeadlineNotificationService.REMINDER_DAYS),
+                InstructionalMaterial.due_date != today,
+                InstructionalMaterial.is_deleted == False,
+                ~InstructionalMaterial.status.in_(DeadlineNotificationService.INACTIVE_STATUSES),
+                User.is_deleted == False,
+                # No address to send to; left out of the ledger so they are picked up once one is added
+                User.email.isnot(None),
+                User.email != '',
+                ~already_sent,
+            )
+            .order_by(User.id, InstructionalMaterial.due_date, InstructionalMaterial.id)
+            .all()
+        )
+        return [
+            {
+                'im_id': im_id,
+                'due_date': due_date,
+                'user_id': user_id,
+                'email': email,
+                'subject_name': subject_name,
+                'kind': row_kind,
+                'days_remaining': (due_date - today).days,
+            }
+            for im_id, due_date, user_id, email, subject_name, row_kind in rows
+        ]
+
+    ################################################################
+    #                    HELPER FUNCTIONS                          #
+    ################################################################
+    @staticmethod
+    def _queue_pending(today, digest):
+        pending = DeadlineNotificationService.pending_notifications(today)
+        for notice in pending:
+            db.session.add(NotificationLedger(notice['im_id'], notice['user_id'], notice['kind'], notice['due_date']))
+
+        if digest:
+            by_recipient = {}
+            for notice in pending:
+                by_recipient.setdefault(notice['email'], []).append({
+                    'im_id': notice['im_id'],
+                    'due_date': str(notice['due_date']),
+                    'subject_name': notice['subject_name'],
+                    'kind': notice['kind'],
+                    'days_remaining': notice['days_remaining'],
+                })
+            for email, items in by_recipient.items():
+                EmailOutboxService.enqueue('deadline_digest', receiver_email=email, items=items)
+            db.session.commit()
+            return len(by_recipient)
+
+        for notice in pending:
+            if notice['kind'] == 'past_due':
+                EmailOutboxService.enqueue(
+                    'past_due',
+                    receiver_email=notice['email'],
+                    im_id=notice['im_id'],
+                    due_date=str(notice['due_date']),
+                    subject_name=notice['subject_name'],
+                )
+            else:
+                EmailOutboxService.enqueue(
+                    'deadline',
+                    receiver_email=notice['email'],
+                    im_id=notice['im_id'],
+                    days_remaining=notice['days_remaining'],
+                    due_date=str(notice['due_date']),
+                    subject_name=notice['subject_name'],
+                )
+        db.session.commit()
+        return len(pending)
+
+    @staticmethod
+    def _kind_expression(today):
+        """SQL CASE giving the ledger kind for an IM's due date: deadline_<days> or past_due."""
+        reminders = {
+            today + timedelta(days=days): f'deadline_{days}'
+            for days in range(1, DeadlineNotificationService.REMINDER_DAYS + 1)
+        }
+        return case(reminders, value=InstructionalMaterial.due_date, else_='past_due')
@@ -0,0 +1,175 @@
+import os
+import uuid
+import base64
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+from email.header import Header
+from email.utils import formatdate, make_msgid, encode_rfc2231
+from dotenv import load_dotenv
+from api.services.s3_client import get_s3_client
+
+load_dotenv()
+
+# Attachments larger than this are sent to Brevo as a presigned S3 URL instead of inline base64
+ATTACHMENT_URL_THRESHOLD = int(os.getenv('EMAIL_ATTACHMENT_URL_THRESHOLD', 4 * 1024 * 1024))
+ATTACHMENT_URL_EXPIRES = int(os.getenv('EMAIL_ATTACHMENT_URL_EXPIRES', 86400))
+# Upper bound on base64 text kept for reuse across sends of the same attachment
+BASE64_CACHE_BYTES = int(os.getenv('EMAIL_BASE64_CACHE_BYTES', 64 * 1024 * 1024))
+# Raw bytes per read when streaming; a multiple of 57 so every base64 line is exactly 76 chars
+STREAM_CHUNK_SIZE = 57 * 1024
+
+_base64_cache = OrderedDict()
+_base64_cache_size = 0
+_base64_cache_lock = threading.Lock()
+
+
+class EmailAttachment:
+    """One email attachment, held either in memory or as an object in S3.
+
+    S3-backed attachments are never loaded whole: Brevo gets a presigned URL
+    once they exceed ATTACHMENT_URL_THRESHOLD, and the SMTP path streams them
+    from S3 straight into the DATA command. Inline base64 is cached (by S3
+    key, or by content hash) so the same file sent to several recipient
+    batches is encoded once.
+    """
+
+    def __init__(self, filename, data=None, s3_key=None, size=None, bucket_name=None):
+        if data is None and not s3_key:
+            raise ValueError("attachment needs data or an s3_key")
+        self.filename = filename
+        self.data = data
+        self.s3_key = s3_key
+        self.bucket_name = bucket_name or os.getenv('AWS_BUCKET_NAME')
+        self._size = len(data) if data is not None else size
+
+    @staticmethod
+    def coerce(item):
+        """Accept an EmailAttachment or a (file_bytes, filename) tuple."""
+        if isinstance(item, EmailAttachment):
+            return item
+        file_bytes, filename = item
+        return EmailAttachment(filename, data=file_bytes)
+
+    @property
+    def size(self):
+        if self._size is None:
+            head = get_s3_client().head_object(Bucket=self.bucket_name, Key=self.s3_key)
+            self._size = head['ContentLength']
+        return self._size
+
+    @property
+    def content_type(self):
+        return mimetypes.guess_type(self.filename)[0] or 'application/octet-stream'
+
+    def brevo_payload(self):
+        """Brevo `attachment` entry: a presigned URL for large S3 objects, else cached base64 content."""
+        if self.s3_key and self.size > ATTACHMENT_URL_THRESHOLD:
+            url = get_s3_client().generate_presigned_url(
+                'get_object',
+                Params={'Bucket': self.bucket_name, 'Key': self.s3_key},
+                ExpiresIn=ATTACHMENT_URL_EXPIRES,
+            )
+            return {'url': url, 'name': self.filename}
+        return {'content': self.base64_content(), 'name': self.filename}
+
+    def base64_content(self):
+        cache_key = f"s3:{self.s3_key}" if self.data is None else f"sha256:{hashlib.sha256(self.data).hexdigest()}"
+        with _base64_cache_lock:
+            cached = _base64_cache.get(cache_key)
+            if cached is not None:
+                _base64_cache.move_to_end(cache_key)
+                return cached
+        encoded = base64.b64encode(self.data if self.data is not None else b''.join(self.iter_bytes())).decode('ascii')
+        _cache_base64(cache_key, encoded)
+        return encoded
+
+    def iter_bytes(self):
+        """Raw content in STREAM_CHUNK_SIZE pieces (read from S3 as it goes)."""
+        if self.data is not None:
+            view = memoryview(self.data)
+            for start in range(0, len(view), STREAM_CHUNK_SIZE):
+                yield bytes(view[start:start + STREAM_CHUNK_SIZE])
+            return
+        body = get_s3_client().get_object(Bucket=self.bucket_name, Key=self.s3_key)['Body']
+        pending = b''
+        for chunk in body.iter_chunks(STREAM_CHUNK_SIZE):
+            pending += chunk
+            if len(pending) >= STREAM_CHUNK_SIZE:
+                cut = len(pending) - len(pending) % STREAM_CHUNK_SIZE
+                yield pending[:cut]
+                pending = pending[cut:]
+        if pending:
+            yield pending
+
+    def iter_base64_lines(self):
+        """Content as CRLF-terminated 76-character base64 lines, in chunks."""
+        for chunk in self.iter_bytes():
+            yield _base64_lines(chunk)
+
+
+def iter_mime_message(sender_email, recipients, subject, attachments, html_body=None, text_body=None):
+    """Yield a multipart/mixed message as CRLF-terminated byte chunks, attachments streamed.
+
+    The result is only ever as large in memory as one chunk, whatever the
+    attachment sizes, and is suitable for SMTPConnectionPool.send_stream.
+    """
+    boundary = f"=_{uuid.uuid4().hex}"
+    headers = [
+        f"From: {sender_email}",
+        f"To: {', '.join(recipients)}",
+        f"Subject: {Header(subject, 'utf-8').encode()}",
+        f"Date: {formatdate(localtime=True)}",
+        f"Message-ID: {make_msgid()}",
+        "MIME-Version: 1.0",
+        f'Content-Type: multipart/mixed; boundary="{boundary}"',
+    ]
+    yield ("\r\n".join(headers) + "\r\n\r\n").encode('utf-8')
+
+    body, subtype = (html_body, 'html') if html_body else (text_body, 'plain')
+    if body:
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Type: text/{subtype}; charset="utf-8"\r\n'
+            "Content-Transfer-Encoding: base64\r\n\r\n"
+        ).encode('ascii')
+        yield _base64_lines(body.encode('utf-8'))
+
+    for attachment in attachments:
+        filename = attachment.filename
+        if filename.isascii():
+            disposition = f'attachment; filename="{filename}"'
+        else:
+            disposition = f"attachment; filename*={encode_rfc2231(filename, 'utf-8')}"
+        yield (
+            f"--{boundary}\r\n"
+            f"Content-Type: {attachment.content_type}\r\n"
+            "Content-Transfer-Encoding: base64\r\n"
+            f"Content-Disposition: {disposition}\r\n\r\n"
+        ).encode('utf-8')
+        yield from attachment.iter_base64_lines()
+
+    yield f"--{boundary}--\r\n".encode('ascii')
+
+
+################################################################
+#                    HELPER FUNCTIONS                          #
+################################################################
+def _base64_lines(data):
+    encoded = base64.b64encode(data)
+    return b''.join(encoded[i:i + 76] + b'\r\n' for i in range(0, len(encoded), 76))
+
+
+def _cache_base64(cache_key, encoded):
+    global _base64_cache_size
+    if len(encoded) > BASE64_CACHE_BYTES:
+        return
+    with _base64_cache_lock:
+        if cache_key in _base64_cache:
+            return
+        _base64_cache[cache_key] = encoded
+        _base64_cache_size += len(encoded)
+        while _base64_cache_size > BASE64_CACHE_BYTES:
+            _, evicted = _base64_cache.popitem(last=False)
+            _base64_cache_size -= len(evicted)
@@ -0,0 +1,353 @@
+import os
+import time
+import uuid
+import random
+import threading
+from io import BytesIO
+from datetime import datetime, timedelta, UTC
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func
+from api.extensions import db
+from api.models.email_outbox import EmailOutbox
+from api.services.email_service import EmailService
+from api.services.email_attachments import EmailAttachment
+from api.services.s3_client import get_s3_client
+
+
+class EmailOutboxService:
+    """Transactional outbox for every email the API sends.
+
+    Request handlers only insert EmailOutbox rows, in the same session (and so
+    the same commit) as the change that triggers the email; they never wait on
+    Brevo or SMTP. A dispatcher (`flask email-worker`, or the thread each web
+    worker starts when EMAIL_OUTBOX_WORKER=thread) claims due rows in batches,
+    delivers them concurrently, and retries failures with exponential backoff
+    until MAX_ATTEMPTS, after which the row is dead-lettered for inspection.
+    Errors that no retry can fix (PERMANENT_ERRORS: a missing record, no
+    valid recipient, an unconfigured sender) dead-letter on the first failure.
+    Delivery is at-least-once: a row claimed by a dispatcher that died is
+    reclaimed after LOCK_TIMEOUT_SECONDS.
+    """
+    BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 50))
+    CONCURRENCY = int(os.getenv('EMAIL_OUTBOX_CONCURRENCY', 4))
+    MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 8))
+    BACKOFF_BASE_SECONDS = float(os.getenv('EMAIL_OUTBOX_BACKOFF_BASE', 30))
+    BACKOFF_MAX_SECONDS = float(os.getenv('EMAIL_OUTBOX_BACKOFF_MAX', 3600))
+    LOCK_TIMEOUT_SECONDS = int(os.getenv('EMAIL_OUTBOX_LOCK_TIMEOUT', 600))
+    POLL_INTERVAL_SECONDS = float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', 5))
+    ATTACHMENT_PREFIX = 'email-attachments'
+    BATCHABLE_KINDS = ('im_notification', 'deadline', 'past_due')
+    PERMANENT_ERRORS = (LookupError, ValueError)
+
+    _metrics = {'sent': 0, 'retried': 0, 'dead': 0, 'batches': 0, 'last_batch_at': None, 'last_batch_seconds': 0.0}
+    _metrics_lock = threading.Lock()
+    _worker_thread = None
+
+    @staticmethod
+    def enqueue(kind, **payload):
+        """Add an email to the current session; it is sent only once the caller commits."""
+        if kind not in EmailOutboxService._senders():
+            raise ValueError(f"Unknown email kind: {kind}")
+        message = EmailOutbox(kind=kind, payload=payload)
+        db.session.add(message)
+        return message
+
+    @staticmethod
+    def enqueue_files(receiver_email, attachments, subject=None, html_body=None, text_body=None):
+        """Queue an attachment email; files are staged in S3 so the row stays small.
+
+        attachments: list of (file_bytes_or_fileobj, filename) tuples. File
+        objects (e.g. an upload's stream) are copied to S3 without being read
+        into memory. Staged files are not deleted on delivery: Brevo may fetch
+        a presigned attachment URL later, so `flask storage gc` removes them
+        once that URL has expired.
+        """
+        bucket_name = os.getenv('AWS_BUCKET_NAME')
+        s3 = get_s3_client()
+        staged = []
+        batch_id = uuid.uuid4().hex
+        for source, filename in attachments:
+            key = f"{EmailOutboxService.ATTACHMENT_PREFIX}/{batch_id}/{os.path.basename(filename)}"
+            if isinstance(source, (bytes, bytearray)):
+                size = len(source)
+                source = BytesIO(source)
+            else:
+                start = source.tell()
+                size = source.seek(0, os.SEEK_END) - start
+                source.seek(start)
+            s3.upload_fileobj(source, bucket_name, key)
+            staged.append({'s3_key': key, 'filename': filename, 'size': size})
+        return EmailOutboxService.enqueue(
+            'files',
+            receiver_email=receiver_email,
+            attachments=staged,
+            subject=subject,
+            html_body=html_body,
+            text_body=text_body,
+        )
+
+    @staticmethod
+    def dispatch_batch(batch_size=None):
+        """Claim and deliver one batch of due messages. Returns counts for the batch."""
+        started = time.monotonic()
+        if not EmailService.any_provider_available():
+            # Every provider's breaker is open: leave the queue alone instead of burning attempts
+            return {'claimed': 0, 'sent': 0, 'retried': 0, 'dead': 0, 'deferred': True}
+        claimed = EmailOutboxService._claim(batch_size or EmailOutboxService.BATCH_SIZE)
+        result = {'claimed': len(claimed), 'sent': 0, 'retried': 0, 'dead': 0}
+        if not claimed:
+            return result
+
+        # Resolve everything that needs the database here; workers only talk to S3 and the providers.
+        # Notifications of the same kind go out together as one Brevo batch request.
+        errors = {}
+        units = []
+        batches = {}
+        for message in claimed:
+            try:
+                sender, kwargs = EmailOutboxService._prepare(message)
+            except Exception as e:
+                errors[message.id] = e
+                continue
+            if message.kind in EmailOutboxService.BATCHABLE_KINDS:
+                batches.setdefault(message.kind, []).append((message, kwargs))
+            else:
+                units.append(('single', sender, [(message, kwargs)]))
+        units.extend(('batch', kind, items) for kind, items in batches.items())
+
+        def deliver(unit):
+            mode, target, items = unit
+            try:
+                if mode == 'batch':
+                    sent = EmailService.send_batch(target, [kwargs for _, kwargs in items])
+                else:
+                    sent = [target(**EmailOutboxService._load_attachments(items[0][1]))]
+            except Exception as e:
+                return [(message.id, e) for message, _ in items]
+            return [
+                (message.id, None if ok else RuntimeError("provider rejected the message"))
+                for (message, _), ok in zip(items, sent)
+            ]
+
+        workers = max(1, min(EmailOutboxService.CONCURRENCY, len(units) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for outcome in executor.map(deliver, units):
+                errors.update(outcome)
+
+        now = EmailOutboxService._utcnow()
+        for message in claimed:
+            error = errors.get(message.id)
+            message.locked_at = None
+            message.attempts += 1
+            if error is None:
+                message.status = 'sent'
+                message.sent_at = now
+                message.last_error = None
+                result['sent'] += 1
+            elif isinstance(error, EmailOutboxService.PERMANENT_ERRORS) or message.attempts >= EmailOutboxService.MAX_ATTEMPTS:
+                message.status = 'dead'
+                message.last_error = str(error)
+                result['dead'] += 1
+                print(f"Email outbox message {message.id} ({message.kind}) dead-lettered: {str(error)}")
+            else:
+                message.status = 'pending'
+                message.last_error = str(error)
+                message.next_attempt_at = now + timedelta(seconds=EmailOutboxService._backoff(message.attempts))
+                result['retried'] += 1
+        db.session.commit()
+
+        with EmailOutboxService._metrics_lock:
+            metrics = EmailOutboxService._metrics
+            metrics['sent'] += result['sent']
+            metrics['retried'] += result['retried']
+            metrics['dead'] += result['dead']
+            metrics['batches'] += 1
+            metrics['last_batch_at'] = now.isoformat()
+            metrics['last_batch_seconds'] = round(time.monotonic() - started, 3)
+        return result
+
+    @staticmethod
+    def run_worker(interval=None, once=False, batch_size=None, echo=print, stop_event=None):
+        """Drain the outbox until stopped; full batches are followed immediately by the next one."""
+        interval = EmailOutboxService.POLL_INTERVAL_SECONDS if interval is None else interval
+        while stop_event is None or not stop_event.is_set():
+            try:
+                result = EmailOutboxService.dispatch_batch(batch_size)
+            except Exception as e:
+                db.session.rollback()
+                echo(f"Email outbox dispatch failed: {str(e)}")
+                result = {'claimed': 0}
+            finally:
+                db.session.remove()
+            if result['claimed']:
+                echo(f"Email outbox: {result['sent']} sent, {result['retried']} to retry, {result['dead']} dead-lettered")
+            if once and not result['claimed']:
+                return
+            if not result['claimed'] or result['claimed'] < (batch_size or EmailOutboxService.BATCH_SIZE):
+                if stop_event is not None:
+                    stop_event.wait(interval)
+                elif not once:
+                    time.sleep(interval)
+
+    @staticmethod
+    def start_background_worker(app):
+        """Start the in-process dispatcher thread (one per process)."""
+        if EmailOutboxService._worker_thread is not None and EmailOutboxService._worker_thread.is_alive():
+            return EmailOutboxService._worker_thread
+
+        def loop():
+            with app.app_context():
+                EmailOutboxService.run_worker(echo=print)
+
+        thread = threading.Thread(target=loop, name='email-outbox-dispatcher', daemon=True)
+        thread.start()
+        EmailOutboxService._worker_thread = thread
+        return thread
+
+    @staticmethod
+    def stats():
+        """Queue depth by status, age of the oldest due message and this process's dispatch counters."""
+        counts = dict(db.session.query(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all())
+        oldest_pending = (
+            db.session.query(func.min(EmailOutbox.created_at))
+            .filter(EmailOutbox.status.in_(('pending', 'sending')))
+            .scalar()
+        )
+        with EmailOutboxService._metrics_lock:
+            metrics = dict(EmailOutboxService._metrics)
+        return {
+            'pending': counts.get('pending', 0),
+            'sending': counts.get('sending', 0),
+            'sent': counts.get('sent', 0),
+            'dead': counts.get('dead', 0),
+            'oldest_pending_seconds': (
+                round((EmailOutboxService._utcnow() - oldest_pending).total_seconds()) if oldest_pending else None
+            ),
+            'dispatcher': metrics,
+        }
+
+    @staticmethod
+    def requeue_dead(ids=None):
+        """Give dead-lettered messages a fresh set of attempts. Returns how many were requeued."""
+        query = EmailOutbox.query.filter_by(status='dead')
+        if ids:
+            query = query.filter(EmailOutbox.id.in_(ids))
+        count = query.update(
+            {'status': 'pending', 'attempts': 0, 'next_attempt_at': EmailOutboxService._utcnow()},
+            synchronize_session=False,
+        )
+        db.session.commit()
+        return count
+
+    ################################################################
+    #                    HELPER FUNCTIONS                          #
+    ################################################################
+    @staticmethod
+    def _senders():
+        from api.services.certificate_service import CertificateService
+        return {
+            'im_notification': EmailService.send_instructional_material_notification,
+            'deadline': EmailService.send_deadline_notification,
+            'past_due': EmailService.send_past_due_notification,
+            'deadline_digest': EmailService.send_deadline_digest,
+            'files': EmailService.send_files_to_recipients,
+            'certificate': CertificateService._send_certificate_email,
+        }
+
+    @staticmethod
+    def _claim(batch_size):
+        """Mark a batch of due rows as 'sending' and commit, so other dispatchers skip them.
+
+        Each row is taken with a conditional UPDATE that only matches while it
+        is still due, and only rows whose UPDATE hit are returned. Row locks
+        (skip_locked) just keep dispatchers from contending where the database
+        has them; SQLite ignores them, and the rowcount check alone makes two
+        dispatchers never claim the same row.
+        """
+        now = EmailOutboxService._utcnow()
+        stale_before = now - timedelta(seconds=EmailOutboxService.LOCK_TIMEOUT_SECONDS)
+        due = db.or_(
+            db.and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+            db.and_(EmailOutbox.status == 'sending', EmailOutbox.locked_at < stale_before),
+        )
+        candidate_ids = [
+            message_id for (message_id,) in (
+                db.session.query(EmailOutbox.id)
+                .filter(due)
+                .order_by(EmailOutbox.next_attempt_at.asc(), EmailOutbox.id.asc())
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+        ]
+        claimed_ids = []
+        for message_id in candidate_ids:
+            updated = (
+                EmailOutbox.query
+                .filter(EmailOutbox.id == message_id, due)
+                .update({'status': 'sending', 'locked_at': now}, synchronize_session=False)
+            )
+            if updated == 1:
+                claimed_ids.append(message_id)
+        db.session.commit()
+        if not claimed_ids:
+            return []
+        return (
+            EmailOutbox.query
+            .filter(EmailOutbox.id.in_(claimed_ids))
+            .order_by(EmailOutbox.next_attempt_at.asc(), EmailOutbox.id.asc())
+            .all()
+        )
+
+    @staticmethod
+    def _prepare(message):
+        """Return (sender, kwargs) for a message, resolving anything that lives in the database."""
+        sender = EmailOutboxService._senders()[message.kind]
+        kwargs = dict(message.payload)
+        if message.kind == 'certificate':
+            from api.services.certificate_service import CertificateService
+            kwargs = CertificateService._certificate_email_args(kwargs['qr_id'])
+        return sender, kwargs
+
+    @staticmethod
+    def _load_attachments(kwargs):
+        """Resolve S3 attachment references (runs on a worker thread).
+
+        Staged 'files' attachments become S3-backed EmailAttachments, which are
+        linked or streamed rather than downloaded; certificate files are small
+        and are downloaded.
+        """
+        needs_download = [key for key in ('attachments', 'docx_key', 'pdf_key') if key in kwargs]
+        if not needs_download:
+            return kwargs
+        bucket_name = os.getenv('AWS_BUCKET_NAME')
+        s3 = get_s3_client()
+
+        def download(key):
+            if not key:
+                return None
+            buffer = BytesIO()
+            s3.download_fileobj(bucket_name, key, buffer)
+            return buffer.getvalue()
+
+        kwargs = dict(kwargs)
+        if 'attachments' in kwargs:
+            kwargs['attachments'] = [
+                EmailAttachment(a['filename'], s3_key=a['s3_key'], size=a.get('size'), bucket_name=bucket_name)
+                for a in kwargs['attachments']
+            ]
+        if 'docx_key' in kwargs:
+            kwargs['docx_bytes'] = download(kwargs.pop('docx_key'))
+        if 'pdf_key' in kwargs:
+            kwargs['pdf_bytes'] = download(kwargs.pop('pdf_key'))
+        return kwargs
+
+    @staticmethod
+    def _backoff(attempts):
+        """Exponential backoff with jitter, capped at BACKOFF_MAX_SECONDS."""
+        delay = min(EmailOutboxService.BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)), EmailOutboxService.BACKOFF_MAX_SECONDS)
+        return delay * random.uniform(0.8, 1.2)
+
+    @staticmethod
+    def _utcnow():
+        return datetime.now(UTC).replace(tzinfo=None)
@@ -1,17 +1,269 @@
 import os
-import base64
-import boto3
 import smtplib
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from botocore.exceptions import ClientError
 from dotenv import load_dotenv
-from email.mime.application import MIMEApplication
+from api.services.smtp_pool import get_smtp_pool
+from api.services.circuit_breaker import CircuitOpenError, get_email_breaker
+from api.services.email_templates import EmailTemplates
+from api.services.email_attachments import EmailAttachment, iter_mime_message
 
 load_dotenv()
 
+BREVO_API_URL = os.getenv('BREVO_API_URL', 'https://api.brevo.com/v3').rstrip('/')
+BREVO_CONNECT_TIMEOUT = float(os.getenv('BREVO_CONNECT_TIMEOUT', 5))
+BREVO_READ_TIMEOUT = float(os.getenv('BREVO_READ_TIMEOUT', 30))
+BREVO_POOL_SIZE = int(os.getenv('BREVO_POOL_SIZE', 10))
+BREVO_MAX_RETRIES = int(os.getenv('BREVO_MAX_RETRIES', 3))
+BREVO_BATCH_SIZE = int(os.getenv('BREVO_BATCH_SIZE', 50))
+
+# Responses that count against the Brevo breaker; other 4xx are about the message, not the provider
+BREVO_FAILURE_STATUSES = frozenset({401, 403, 429, 500, 502, 503, 504})
+# SMTP errors that mean the server (not the message) is the problem
+SMTP_PROVIDER_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    smtplib.SMTPHeloError,
+    smtplib.SMTPAuthenticationError,
+)
+# "Service not available": the server is shutting the session down, whatever command it answered
+SMTP_SERVICE_UNAVAILABLE = 421
+
+
+def _is_smtp_provider_error(error):
+    """Whether an SMTP failure counts against the breaker.
+
+    Every smtplib exception is an OSError, so refused senders, recipients and
+    data would look like socket errors; only plain socket errors (timeouts,
+    resets, DNS) and the connection-level SMTP errors above count.
+    """
+    if isinstance(error, SMTP_PROVIDER_ERRORS):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == SMTP_SERVICE_UNAVAILABLE
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class _BrevoRetry(Retry):
+    """Retry policy for the Brevo session.
+
+    A POST that got a 5xx may already have been accepted, so it is not
+    resent here; the email outbox owns those retries. A 429 means Brevo
+    refused the request, so it is safe to resend for any method.
+    """
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method and method.upper() == 'POST':
+            return status_code == 429
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+_brevo_session = None
+_brevo_session_pid = None
+_brevo_session_lock = threading.Lock()
+
+
+def get_brevo_session():
+    """Return the process-wide keep-alive session for the Brevo API.
+
+    Connections are pooled and reused across emails. Connection failures and
+    429s are retried with exponential backoff (honouring Retry-After), as are
+    5xx responses to GETs. Read timeouts and 5xx responses to POSTs are not,
+    since Brevo may already have accepted the message. The session is rebuilt
+    after a fork so worker processes never share sockets.
+    """
+    global _brevo_session, _brevo_session_pid
+    if _brevo_session is None or _brevo_session_pid != os.getpid():
+        with _brevo_session_lock:
+            if _brevo_session is None or _brevo_session_pid != os.getpid():
+                retry = _BrevoRetry(
+                    total=BREVO_MAX_RETRIES,
+                    connect=BREVO_MAX_RETRIES,
+                    read=0,
+                    status=BREVO_MAX_RETRIES,
+                    backoff_factor=0.5,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset({'GET'}),
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=BREVO_POOL_SIZE, max_retries=retry)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update({'Accept': 'application/json', 'Content-Type': 'application/json'})
+                _brevo_session = session
+                _brevo_session_pid = os.getpid()
+    return _brevo_session
+
+
 class EmailService:
+    @staticmethod
+    def _brevo_post(brevo_api_key, payload, path='/smtp/email'):
+        """POST a JSON payload to the Brevo API over the shared session.
+
+        Raises CircuitOpenError without touching the network while the Brevo
+        breaker is open, so callers drop straight through to SMTP.
+        """
+        breaker = get_email_breaker('brevo')
+        if not breaker.allow():
+            raise CircuitOpenError('brevo', breaker.retry_in())
+        try:
+            response = get_brevo_session().post(
+                f"{BREVO_API_URL}{path}",
+                headers={'api-key': brevo_api_key},
+                json=payload,
+                timeout=(BREVO_CONNECT_TIMEOUT, BREVO_READ_TIMEOUT),
+            )
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+        if response.status_code in BREVO_FAILURE_STATUSES:
+            breaker.record_failure(f"HTTP {response.status_code}")
+        else:
+            breaker.record_success()
+        return response
+
+    @staticmethod
+    def _smtp_send(sender_email, recipients, message):
+        """Send through the pooled SMTP sessions, guarded by the SMTP breaker.
+
+        `message` is the full message text, or a callable returning byte chunks to stream.
+        """
+        breaker = get_email_breaker('smtp')
+        if not breaker.allow():
+            raise CircuitOpenError('smtp', breaker.retry_in())
+        try:
+            if callable(message):
+                get_smtp_pool().send_stream(sender_email, recipients, message)
+            else:
+                get_smtp_pool().send(sender_email, recipients, message)
+        except Exception as e:
+            if _is_smtp_provider_error(e):
+                breaker.record_failure(e)
+            else:
+                # Refused sender/recipients/data: the server is up
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        return True
+
+    @staticmethod
+    def provider_status():
+        """Configuration and breaker state of each provider, in the order they are tried."""
+        configured = {
+            'brevo': bool(os.getenv('BREVO_API_KEY')),
+            'smtp': all([os.getenv('SMTP_SERVER'), os.getenv('SMTP_USERNAME'), os.getenv('SMTP_PASSWORD')]),
+        }
+        return [
+            {**get_email_breaker(name).status(), 'configured': configured[name]}
+            for name in ('brevo', 'smtp')
+        ]
+
+    @staticmethod
+    def any_provider_available():
+        """False when every configured provider's breaker is open (nothing can be sent right now)."""
+        providers = [p for p in EmailService.provider_status() if p['configured']]
+        return not providers or any(get_email_breaker(p['name']).is_available() for p in providers)
+
+    @staticmethod
+    def send_batch(kind, messages):
+        """Send many notifications of one kind with as few Brevo requests as possible.
+
+        kind: 'im_notification', 'deadline' or 'past_due'.
+        messages: list of keyword-argument dicts for the matching send_* method.
+        Messages share one Brevo template and are sent BREVO_BATCH_SIZE at a time
+        as `messageVersions` (one personalized version per message). A chunk
+        that Brevo rejects falls back to sending each of its messages on its own
+        (including the SMTP fallback). Returns a list of booleans aligned with
+        `messages`.
+        """
+        single_send = {
+            'im_notification': EmailService.send_instructional_material_notification,
+            'deadline': EmailService.send_deadline_notification,
+            'past_due': EmailService.send_past_due_notification,
+        }[kind]
+        sender_email = os.getenv('EMAIL_SENDER')
+        brevo_api_key = os.getenv('BREVO_API_KEY')
+        if not sender_email or not brevo_api_key or len(messages) < 2:
+            return [bool(single_send(**message)) for message in messages]
+
+        results = [False] * len(messages)
+        for start in range(0, len(messages), BREVO_BATCH_SIZE):
+            chunk = list(range(start, min(start + BREVO_BATCH_SIZE, len(messages))))
+            versions = []
+            for index in chunk:
+                try:
+                    versions.append(EmailService._batch_version(kind, **messages[index]))
+                except ValueError:
+                    versions.append(None)
+            sendable = [(index, version) for index, version in zip(chunk, versions) if version]
+            try:
+                if not sendable:
+                    raise ValueError("no valid recipients in chunk")
+                response = EmailService._brevo_post(brevo_api_key, {
+                    'sender': {'email': sender_email},
+                    'subject': sendable[0][1]['subject'],
+                    'htmlContent': EmailTemplates.brevo_template(f"{kind}.html", sendable[0][1]['params']),
+                    'messageVersions': [version for _, version in sendable],
+                })
+                if response.status_code != 201:
+                    raise Exception(f"Brevo API error: {response.text}")
+                for index, _ in sendable:
+                    results[index] = True
+            except Exception as e:
+                print(f"Brevo batch send of {len(chunk)} {kind} email(s) failed: {str(e)}. Sending individually...")
+                for index in chunk:
+                    results[index] = bool(single_send(**messages[index]))
+        return results
+
+    @staticmethod
+    def _batch_version(kind, receiver_email, **kwargs):
+        """One Brevo messageVersion (recipients, subject, template params) for a send_* call."""
+        if isinstance(receiver_email, str):
+            recipients = [e.strip() for e in receiver_email.split(",") if e.strip()]
+        else:
+            recipients = [e.strip() for e in receiver_email or [] if e and e.strip()]
+        if not recipients:
+            raise ValueError("no valid recipient emails provided")
+
+        subject, params = EmailService._notification_content(kind, **kwargs)
+        return {'to': [{'email': email} for email in recipients], 'subject': subject, 'params': params}
+
+    @staticmethod
+    def _notification_content(kind, **kwargs):
+        """Subject and template context for an im_notification/deadline/past_due email.
+
+        The context keys double as Brevo params for batch sends, so the body
+        template ('<kind>.html') is the same either way.
+        """
+        if kind == 'im_notification':
+            action = kwargs.get('action', 'created')
+            subject = f"Instructional Material {action.capitalize()}: {kwargs['filename']}"
+            context = {
+                'filename': str(kwargs['filename']),
+                'status': str(kwargs['status']),
+                'notes': kwargs.get('notes') or 'No additional notes',
+                'action': action,
+            }
+        else:
+            subject_name = kwargs.get('subject_name')
+            context = {
+                'im_id': kwargs['im_id'],
+                'due_date': str(kwargs['due_date']),
+                'subject_label': f"({subject_name})" if subject_name else '',
+            }
+            if kind == 'deadline':
+                subject = f"Deadline Reminder: Instructional Material Due in {kwargs['days_remaining']} Day(s)"
+                context['days_remaining'] = kwargs['days_remaining']
+            else:
+                subject = "PAST DUE: Instructional Material Overdue"
+        return subject, context
+
     @staticmethod
     def send_instructional_material_notification(receiver_email, filename, status, notes, action="created"):
         """
@@ -41,32 +293,15 @@ class EmailService:
             if not sender_email or not brevo_api_key:
                 raise ValueError("EMAIL_SENDER or BREVO_API_KEY not configured")
 
-            subject = f"Instructional Material {action.capitalize()}: {filename}"
-            
-            html_body = f"""
-            <html>
-            <body>
-                <h2>Instructional Material Notification</h2>
-                <p>Your instructional material has been {action} successfully.</p>
-                <table border="0" cellpadding="5">
-                    <tr><td><strong>Instructional Material ID:</strong></td><td>{filename}</td></tr>
-                    <tr><td><strong>Status:</strong></td><td>{status}</td></tr>
-                    <tr><td><strong>Notes:</strong></td><td>{notes or 'No additional notes'}</td></tr>
-                </table>
-                <br>
-                <p>Thank you for using our instructional materials system.</p>
-            </body>
-            </html>
-            """
+            subject, context = EmailService._notification_content(
+                'im_notification', filename=filename, status=status, notes=notes, action=action
+            )
+            html_body = EmailTemplates.render('im_notification.html', **context)
             
             # Send email using Brevo
-            response = requests.post(
-                'https://api.brevo.com/v3/smtp/email',
-                headers={
-                    'api-key': brevo_api_key,
-                    'Content-Type': 'application/json'
-                },
-                json={
+            response = EmailService._brevo_post(
+                brevo_api_key,
+                {
                     'sender': {'email': sender_email},
                     'to': [{'email': email} for email in recipients],
                     'subject': subject,
@@ -97,7 +332,6 @@ class EmailService:
         try:
             sender_email = os.getenv('EMAIL_SENDER')
             smtp_server = os.getenv('SMTP_SERVER')
-            smtp_port = int(os.getenv('SMTP_PORT', 587))
             smtp_username = os.getenv('SMTP_USERNAME')
             smtp_password = os.getenv('SMTP_PASSWORD')
             
@@ -105,23 +339,10 @@ class EmailService:
                 print("Gmail SMTP not configured")
                 return False
             
-            subject = f"Instructional Material {action.capitalize()}: {filename}"
-            
-            html = f"""
-            <html>
-            <body>
-                <h2>Instructional Material Notification</h2>
-                <p>Your instructional material has been {action} successfully.</p>
-                <table border="0" cellpadding="5">
-                    <tr><td><strong>Filename:</strong></td><td>{filename}</td></tr>
-                    <tr><td><strong>Status:</strong></td><td>{status}</td></tr>
-                    <tr><td><strong>Notes:</strong></td><td>{notes or 'No additional notes'}</td></tr>
-                </table>
-                <br>
-                <p>Thank you for using our instructional materials system.</p>
-            </body>
-            </html>
-            """
+            subject, context = EmailService._notification_content(
+                'im_notification', filename=filename, status=status, notes=notes, action=action
+            )
+            html = EmailTemplates.render('im_notification.html', **context)
             
             msg = MIMEMultipart('alternative')
             msg['Subject'] = subject
@@ -131,11 +352,8 @@ class EmailService:
             
             msg.attach(MIMEText(html, 'html'))
             
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()
-                server.login(smtp_username, smtp_password)
-                # sendmail accepts a list of recipients
-                server.sendmail(sender_email, recipients, msg.as_string())
+            # Reuses a pooled, already-authenticated session when one is available
+            EmailService._smtp_send(sender_email, recipients, msg.as_string())
             
             print("Email sent successfully via Gmail SMTP")
             return True
@@ -173,27 +391,15 @@ class EmailService:
             if not sender_email or not brevo_api_key:
                 raise ValueError("EMAIL_SENDER or BREVO_API_KEY not configured")
 
-            subject = f"Deadline Reminder: Instructional Material Due in {days_remaining} Day(s)"
-            
-            html_body = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif;">
-                <h3 style="color:#d32f2f;">Deadline Reminder</h3>
-                <p><strong>IM-{im_id}</strong> {f'({subject_name})' if subject_name else ''} is due in <strong>{days_remaining} day(s)</strong></p>
-                <p>Due Date: {due_date}</p>
-                <p>Submit before deadline to avoid delays.</p>
-            </body>
-            </html>
-            """
+            subject, context = EmailService._notification_content(
+                'deadline', im_id=im_id, days_remaining=days_remaining, due_date=due_date, subject_name=subject_name
+            )
+            html_body = EmailTemplates.render('deadline.html', **context)
             
             # Send email using Brevo
-            response = requests.post(
-                'https://api.brevo.com/v3/smtp/email',
-                headers={
-                    'api-key': brevo_api_key,
-                    'Content-Type': 'application/json'
-                },
-                json={
+            response = EmailService._brevo_post(
+                brevo_api_key,
+                {
                     'sender': {'email': sender_email},
                     'to': [{'email': email} for email in recipients],
                     'subject': subject,
@@ -223,7 +429,6 @@ class EmailService:
         try:
             sender_email = os.getenv('EMAIL_SENDER')
             smtp_server = os.getenv('SMTP_SERVER')
-            smtp_port = int(os.getenv('SMTP_PORT', 587))
             smtp_username = os.getenv('SMTP_USERNAME')
             smtp_password = os.getenv('SMTP_PASSWORD')
             
@@ -231,23 +436,10 @@ class EmailService:
                 print("Gmail SMTP not configured")
                 return False
             
-            subject = f"Deadline Reminder: Instructional Material Due in {days_remaining} Day(s)"
-            
-            html = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; color: #222; line-height:1.4;">
-                <h2 style="color:#d32f2f;">⚠️ Deadline Reminder</h2>
-                <p>This is a friendly reminder that your instructional material is due soon.</p>
-                <div style="background-color: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; border-radius: 5px; margin: 15px 0;">
-                    <p><strong>Instructional Material ID:</strong> IM-{im_id}</p>
-                    {f'<p><strong>Subject:</strong> {subject_name}</p>' if subject_name else ''}
-                    <p><strong>Due Date:</strong> {due_date}</p>
-                    <p><strong>Days Remaining:</strong> <span style="color: #d32f2f; font-weight: bold;">{days_remaining} day(s)</span></p>
-                </div>
-                <p>Please ensure you submit your instructional material before the deadline.</p>
-            </body>
-            </html>
-            """
+            subject, context = EmailService._notification_content(
+                'deadline', im_id=im_id, days_remaining=days_remaining, due_date=due_date, subject_name=subject_name
+            )
+            html = EmailTemplates.render('deadline.html', **context)
             
             msg = MIMEMultipart('alternative')
             msg['Subject'] = subject
@@ -256,10 +448,8 @@ class EmailService:
             
             msg.attach(MIMEText(html, 'html'))
             
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()
-                server.login(smtp_username, smtp_password)
-                server.sendmail(sender_email, recipients, msg.as_string())
+            # Reuses a pooled, already-authenticated session when one is available
+            EmailService._smtp_send(sender_email, recipients, msg.as_string())
             
             return True
             
@@ -267,6 +457,72 @@ class EmailService:
             print(f"Gmail SMTP deadline notification failed: {str(e)}")
             return False
 
+    @staticmethod
+    def send_deadline_digest(receiver_email, items):
+        """
+        Send one email listing all of a recipient's due-soon and past due instructional materials
+
+        Args:
+            receiver_email: Email address of the recipient
+            items: list of dicts with im_id, due_date, subject_name, kind
+                   ('past_due' or 'deadline_<n>') and days_remaining
+        """
+        if isinstance(receiver_email, str):
+            recipients = [e.strip() for e in receiver_email.split(",") if e.strip()]
+        elif isinstance(receiver_email, (list, tuple)):
+            recipients = [e.strip() for e in receiver_email if e and e.strip()]
+        else:
+            raise ValueError("receiver_email must be a string or list/tuple of emails")
+        if not recipients:
+            raise ValueError("no valid recipient emails provided")
+
+        sender_email = os.getenv('EMAIL_SENDER')
+        brevo_api_key = os.getenv('BREVO_API_KEY')
+
+        past_due = [item for item in items if item['kind'] == 'past_due']
+        due_soon = sorted((item for item in items if item['kind'] != 'past_due'), key=lambda item: item['days_remaining'])
+        if past_due:
+            subject = f"PAST DUE: {len(past_due)} Instructional Material(s) Overdue"
+            if due_soon:
+                subject += f", {len(due_soon)} Due Soon"
+        else:
+            subject = f"Deadline Reminder: {len(due_soon)} Instructional Material(s) Due Soon"
+        html_body = EmailTemplates.render('deadline_digest.html', past_due=past_due, due_soon=due_soon)
+
+        if sender_email and brevo_api_key:
+            try:
+                response = EmailService._brevo_post(
+                    brevo_api_key,
+                    {
+                        'sender': {'email': sender_email},
+                        'to': [{'email': email} for email in recipients],
+                        'subject': subject,
+                        'htmlContent': html_body
+                    }
+                )
+                if response.status_code == 201:
+                    return True
+                print(f"Brevo deadline digest failed: {response.text}. Trying Gmail SMTP fallback...")
+            except Exception as e:
+                print(f"Brevo deadline digest failed: {str(e)}. Trying Gmail SMTP fallback...")
+
+        try:
+            if not all([os.getenv('SMTP_SERVER'), os.getenv('SMTP_USERNAME'), os.getenv('SMTP_PASSWORD')]):
+                print("Gmail SMTP not configured")
+                return False
+
+            msg = MIMEMultipart('alternative')
+            msg['Subject'] = subject
+            msg['From'] = sender_email
+            msg['To'] = ", ".join(recipients)
+            msg.attach(MIMEText(html_body, 'html'))
+
+            EmailService._smtp_send(sender_email, recipients, msg.as_string())
+            return True
+        except Exception as e:
+            print(f"Gmail SMTP deadline digest failed: {str(e)}")
+            return False
+
     @staticmethod
     def send_file_to_recipients(receiver_email, file_bytes, filename, subject=None, html_body=None, text_body=None):
         """Send a single-attachment email. Wraps send_files_to_recipients."""
@@ -283,7 +539,8 @@ class EmailService:
         """Send an email with one or more file attachments. Tries Brevo first, falls back to SMTP.
 
         receiver_email: string CSV or list/tuple of addresses
-        attachments: list of (file_bytes, filename) tuples
+        attachments: list of (file_bytes, filename) tuples or EmailAttachment objects
+                     (S3-backed attachments are linked or streamed, never loaded whole)
         subject: email subject (optional)
         html_body / text_body: optional bodies
         """
@@ -302,29 +559,22 @@ class EmailService:
         if not sender_email:
             raise ValueError("EMAIL_SENDER not configured")
 
-        first_filename = attachments[0][1] if attachments else "file"
+        attachments = [EmailAttachment.coerce(item) for item in attachments]
+        first_filename = attachments[0].filename if attachments else "file"
         subj = subject or f"File from Instructional Materials: {first_filename}"
         html_content = html_body or "<p>Please find the attached file(s).</p>"
 
         # Try Brevo with attachments
         if brevo_api_key:
             try:
-                brevo_attachments = [
-                    {'content': base64.b64encode(fb).decode('utf-8'), 'name': fn}
-                    for fb, fn in attachments
-                ]
-                response = requests.post(
-                    'https://api.brevo.com/v3/smtp/email',
-                    headers={
-                        'api-key': brevo_api_key,
-                        'Content-Type': 'application/json'
-                    },
-                    json={
+                response = EmailService._brevo_post(
+                    brevo_api_key,
+                    {
                         'sender': {'email': sender_email},
                         'to': [{'email': email} for email in recipients],
                         'subject': subj,
                         'htmlContent': html_content,
-                        'attachment': brevo_attachments
+                        'attachment': [attachment.brevo_payload() for attachment in attachments]
                     }
                 )
                 if response.status_code == 201:
@@ -337,32 +587,18 @@ class EmailService:
         # SMTP fallback
         try:
             smtp_server = os.getenv('SMTP_SERVER')
-            smtp_port = int(os.getenv('SMTP_PORT', 587))
             smtp_username = os.getenv('SMTP_USERNAME')
             smtp_password = os.getenv('SMTP_PASSWORD')
             if not all([smtp_server, smtp_username, smtp_password]):
                 print("SMTP not configured for attachment fallback")
                 return False
 
-            msg = MIMEMultipart('mixed')
-            msg['Subject'] = subj
-            msg['From'] = sender_email
-            msg['To'] = ", ".join(recipients)
-
-            if html_body:
-                msg.attach(MIMEText(html_body, 'html'))
-            elif text_body:
-                msg.attach(MIMEText(text_body, 'plain'))
-
-            for file_bytes, filename in attachments:
-                part = MIMEApplication(file_bytes)
-                part.add_header('Content-Disposition', 'attachment', filename=filename)
-                msg.attach(part)
-
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()
-                server.login(smtp_username, smtp_password)
-                server.sendmail(sender_email, recipients, msg.as_string())
+            # Attachments are base64-encoded into the DATA command as they are read
+            EmailService._smtp_send(
+                sender_email,
+                recipients,
+                lambda: iter_mime_message(sender_email, recipients, subj, attachments, html_body, text_body),
+            )
             return True
         except Exception as e:
             print(f"SMTP send for attachment failed: {str(e)}")
@@ -396,27 +632,15 @@ class EmailService:
             if not sender_email or not brevo_api_key:
                 raise ValueError("EMAIL_SENDER or BREVO_API_KEY not configured")
 
-            subject = f"PAST DUE: Instructional Material Overdue"
-            
-            html_body = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif;">
-                <h3 style="color:#d32f2f;">⚠️ PAST DUE NOTICE</h3>
-                <p><strong>IM-{im_id}</strong> {f'({subject_name})' if subject_name else ''} is <strong style="color:#d32f2f;">PAST DUE</strong></p>
-                <p>Original Due Date: {due_date}</p>
-                <p>Please submit immediately to avoid further delays.</p>
-            </body>
-            </html>
-            """
+            subject, context = EmailService._notification_content(
+                'past_due', im_id=im_id, due_date=due_date, subject_name=subject_name
+            )
+            html_body = EmailTemplates.render('past_due.html', **context)
             
             # Send email using Brevo
-            response = requests.post(
-                'https://api.brevo.com/v3/smtp/email',
-                headers={
-                    'api-key': brevo_api_key,
-                    'Content-Type': 'application/json'
-                },
-                json={
+            response = EmailService._brevo_post(
+                brevo_api_key,
+                {
                     'sender': {'email': sender_email},
                     'to': [{'email': email} for email in recipients],
                     'subject': subject,
@@ -446,7 +670,6 @@ class EmailService:
         try:
             sender_email = os.getenv('EMAIL_SENDER')
             smtp_server = os.getenv('SMTP_SERVER')
-            smtp_port = int(os.getenv('SMTP_PORT', 587))
             smtp_username = os.getenv('SMTP_USERNAME')
             smtp_password = os.getenv('SMTP_PASSWORD')
             
@@ -454,24 +677,10 @@ class EmailService:
                 print("Gmail SMTP not configured")
                 return False
             
-            subject = f"PAST DUE: Instructional Material Overdue"
-            
-            html = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; color: #222; line-height:1.4;">
-                <h2 style="color:#d32f2f;">🚨 PAST DUE NOTICE</h2>
-                <p>This is an urgent notice that your instructional material is overdue.</p>
-                <div style="background-color: #ffebee; border: 1px solid #f44336; padding: 15px; border-radius: 5px; margin: 15px 0;">
-                    <p><strong>Instructional Material ID:</strong> IM-{im_id}</p>
-                    {f'<p><strong>Subject:</strong> {subject_name}</p>' if subject_name else ''}
-                    <p><strong>Original Due Date:</strong> {due_date}</p>
-                    <p><strong>Status:</strong> <span style="color: #d32f2f; font-weight: bold;">PAST DUE</span></p>
-                </div>
-                <p>Please submit your instructional material immediately to avoid further delays.</p>
-                <p>Best regards,<br>Instructional Materials Management System</p>
-            </body>
-            </html>
-            """
+            subject, context = EmailService._notification_content(
+                'past_due', im_id=im_id, due_date=due_date, subject_name=subject_name
+            )
+            html = EmailTemplates.render('past_due.html', **context)
             
             msg = MIMEMultipart('alternative')
             msg['Subject'] = subject
@@ -480,10 +689,8 @@ class EmailService:
             
             msg.attach(MIMEText(html, 'html'))
             
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()
-                server.login(smtp_username, smtp_password)
-                server.sendmail(sender_email, recipients, msg.as_string())
+            # Reuses a pooled, already-authenticated session when one is available
+            EmailService._smtp_send(sender_email, recipients, msg.as_string())
             
             return True
             
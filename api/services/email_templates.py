@@ -0,0 +1,65 @@
+import os
+import json
+from functools import lru_cache
+from dotenv import load_dotenv
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, select_autoescape
+from markupsafe import Markup
+
+load_dotenv()
+
+EMAIL_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates', 'email')
+EMAIL_TEMPLATE_CACHE_DIR = os.getenv('EMAIL_TEMPLATE_CACHE_DIR')  # None -> per-user temp directory
+EMAIL_RENDER_CACHE_SIZE = int(os.getenv('EMAIL_RENDER_CACHE_SIZE', 512))
+
+# Templates are compiled once per process (and the bytecode is shared between
+# processes through the cache directory); auto_reload is off because the
+# templates only change on deploy.
+_environment = Environment(
+    loader=FileSystemLoader(EMAIL_TEMPLATE_DIR),
+    bytecode_cache=FileSystemBytecodeCache(EMAIL_TEMPLATE_CACHE_DIR),
+    autoescape=select_autoescape(['html']),
+    auto_reload=False,
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+
+class EmailTemplates:
+    """Jinja2 email bodies under api/templates/email.
+
+    `render` memoizes on (template, context), so the same body sent to many
+    recipients (or retried by the outbox) is rendered once per process.
+    Context values must be JSON-serializable; dates should be passed as text.
+    """
+
+    @staticmethod
+    def render(template_name, **context):
+        """Render a template with keyword context, reusing cached output for identical contexts."""
+        key = json.dumps(context, sort_keys=True, separators=(',', ':'))
+        return EmailTemplates._render_cached(template_name, key)
+
+    @staticmethod
+    def brevo_template(template_name, param_names):
+        """Render a template with every variable left as a Brevo `{{ params.<name> }}` placeholder.
+
+        Used for messageVersions batches, where Brevo fills in each recipient's values.
+        """
+        return EmailTemplates._brevo_template_cached(template_name, tuple(sorted(param_names)))
+
+    @staticmethod
+    def cache_info():
+        return EmailTemplates._render_cached.cache_info()
+
+    ################################################################
+    #                    HELPER FUNCTIONS                          #
+    ################################################################
+    @staticmethod
+    @lru_cache(maxsize=EMAIL_RENDER_CACHE_SIZE)
+    def _render_cached(template_name, context_key):
+        return _environment.get_template(template_name).render(**json.loads(context_key))
+
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _brevo_template_cached(template_name, param_names):
+        placeholders = {name: Markup(f'{{{{ params.{name} }}}}') for name in param_names}
+        return _environment.get_template(template_name).render(**placeholders)
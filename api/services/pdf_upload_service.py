@@ -0,0 +1,490 @@
+import os
+import json
+import uuid
+import queue
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from sqlalchemy.exc import IntegrityError
+from werkzeug.formparser import parse_form_data, default_stream_factory
+from werkzeug.utils import secure_filename
+from dotenv import load_dotenv
+from api.extensions import db
+from api.models.instructionalmaterials import InstructionalMaterial
+from api.models.pdf_objects import PdfObject
+from api.services.s3_client import get_s3_client
+
+load_dotenv()
+
+_analysis_executor = None
+_analysis_executor_pid = None
+_analysis_executor_lock = threading.Lock()
+
+
+class PdfUpload:
+    """Outcome of one streamed PDF upload.
+
+    duplicate is True when the content was already catalogued: object_key
+    is then the existing, shared object and must not be deleted by the caller.
+    """
+
+    def __init__(self, object_key, filename, size, sha256, notes=None, duplicate=False):
+        self.object_key = object_key
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+        self.notes = notes
+        self.duplicate = duplicate
+
+
+class PdfUploadService:
+    """Single-pass PDF upload: multipart/form-data request body -> S3.
+
+    The request body is parsed incrementally and the PDF part never lands
+    in a werkzeug spool file. Each chunk is teed to:
+      - a concurrent S3 multipart upload (TransferConfig, parallel parts),
+        fed through a bounded in-memory pipe;
+      - a SHA-256 hasher;
+      - an analysis copy on local disk, kept only up to ANALYSIS_MAX_BYTES.
+    So peak memory is roughly PART_SIZE * (MAX_CONCURRENCY + 1), and peak
+    disk is ANALYSIS_MAX_BYTES, however large the upload is.
+
+    Browsers can also skip the app servers entirely: create_upload_policy
+    issues a presigned POST, verify_direct_upload checks the result, and
+    queue_analysis runs the analysis off the request thread.
+
+    Uploads are content-addressed through the pdf_objects catalog (SHA-256
+    -> S3 key and analysis notes). A re-upload of a catalogued file reuses
+    the existing object and notes: its own copy is dropped and it is not
+    analysed again.
+    """
+    S3_PREFIX = os.getenv('IM_PDF_S3_PREFIX', 'instructional-materials')
+    MAX_UPLOAD_BYTES = int(os.getenv('PDF_UPLOAD_MAX_BYTES', 500 * 1024 * 1024))
+    PART_SIZE = int(os.getenv('PDF_UPLOAD_PART_SIZE', 8 * 1024 * 1024))
+    MAX_CONCURRENCY = int(os.getenv('PDF_UPLOAD_CONCURRENCY', 4))
+    ANALYSIS_MAX_BYTES = int(os.getenv('PDF_ANALYSIS_MAX_BYTES', 50 * 1024 * 1024))
+    UPLOAD_URL_EXPIRES = int(os.getenv('PDF_UPLOAD_URL_EXPIRES', 900))
+    ANALYSIS_WORKERS = int(os.getenv('PDF_ANALYSIS_WORKERS', 2))
+
+    @staticmethod
+    def receive(request, analyze=None):
+        """Parse a multipart request, streaming its PDF part to S3.
+
+        analyze: optional callable(pdf_path) run on the local analysis copy
+        while the last parts finish uploading; its result becomes `notes`.
+        Returns (form, files, upload), where upload is a PdfUpload, or None
+        if the request had no .pdf file part. On any error the S3 upload is
+        aborted.
+
+        Content already in the catalog comes back as a duplicate (existing
+        object, stored notes, analyze not called). A client that sends the
+        hash up front (X-Content-SHA256 header or ?sha256=) also skips the
+        S3 upload for a known file; the body is still hashed to check it.
+        """
+        declared = (request.headers.get('X-Content-SHA256') or request.args.get('sha256') or '').strip().lower()
+        known = PdfUploadService.find_catalogued(declared) if declared else None
+        sinks = []
+
+        def stream_factory(total_content_length, content_type, filename, content_length=None):
+            if not sinks and filename and filename.lower().endswith('.pdf'):
+                sink = _PdfUploadSink(filename, upload=known is None)
+                sinks.append(sink)
+                return sink
+            return default_stream_factory(total_content_length, content_type, filename, content_length)
+
+        try:
+            _, form, files = parse_form_data(
+                request.environ,
+                stream_factory=stream_factory,
+                max_content_length=PdfUploadService.MAX_UPLOAD_BYTES,
+                max_form_memory_size=request.max_form_memory_size,
+                silent=False,
+            )
+            if not sinks:
+                return form, files, None
+            sink = sinks[0]
+            sink.close()
+            sha256 = sink.hasher.hexdigest()
+
+            if known is not None:
+                if sha256 != declared:
+                    raise ValueError("sha256 does not match the uploaded file")
+                return form, files, PdfUpload(known.s3_key, sink.filename, sink.size, sha256, known.notes, duplicate=True)
+
+            existing = PdfUploadService.find_catalogued(sha256)
+            if existing is None:
+                notes = None
+                if analyze is not None:
+                    if sink.analysis_path:
+                        notes = PdfUploadService._format_notes(analyze(sink.analysis_path))
+                    else:
+                        print(f"Skipping analysis of {sink.filename}: larger than {PdfUploadService.ANALYSIS_MAX_BYTES} bytes")
+                sink.wait()
+                # None unless an identical upload was catalogued first while this one was in flight
+                existing = PdfUploadService._catalogue(sha256, sink.object_key, sink.size, notes)
+                if existing is None:
+                    return form, files, PdfUpload(sink.object_key, sink.filename, sink.size, sha256, notes)
+
+            sink.abort(ValueError("duplicate of a catalogued PDF"))
+            return form, files, PdfUpload(existing.s3_key, sink.filename, sink.size, sha256, existing.notes, duplicate=True)
+        except Exception as e:
+            for sink in sinks:
+                sink.abort(e)
+            raise
+        finally:
+            for sink in sinks:
+                sink.remove_analysis_copy()
+
+    @staticmethod
+    def find_catalogued(sha256):
+        """Catalog entry (PdfObject) for this content hash, or None.
+
+        The object is checked with a HEAD, and an entry whose object has been
+        deleted is dropped.
+        """
+        entry = PdfObject.query.filter_by(sha256=sha256).first()
+        if entry is None:
+            return None
+        try:
+            get_s3_client().head_object(Bucket=os.getenv('AWS_BUCKET_NAME'), Key=entry.s3_key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                db.session.delete(entry)
+                db.session.commit()
+            else:
+                print(f"Error checking catalogued PDF {entry.s3_key}: {str(e)}")
+            return None
+        return entry
+
+    @staticmethod
+    def delete_object(object_key):
+        """Delete an IM PDF and its catalog entry, unless an IM still references it.
+
+        Catalogued objects are shared by every IM that uploaded the same
+        content, so the key is only deleted once no IM row (soft-deleted ones
+        included) points at it. The catalog entry is dropped before the
+        object, and the references are checked again afterwards, so an upload
+        that deduplicated onto it in the meantime keeps it. Returns True if
+        the object was deleted; a still-referenced one is left in place.
+        """
+        if PdfUploadService._is_referenced(object_key):
+            return False
+        PdfObject.query.filter_by(s3_key=object_key).delete(synchronize_session=False)
+        db.session.commit()
+        if PdfUploadService._is_referenced(object_key):
+            return False
+        get_s3_client().delete_object(Bucket=os.getenv('AWS_BUCKET_NAME'), Key=object_key)
+        return True
+
+    @staticmethod
+    def create_upload_policy(filename, im_id, user_identity=None):
+        """Presigned POST letting a browser upload one PDF straight to S3.
+
+        The policy pins the object key, requires Content-Type application/pdf
+        and caps the size at MAX_UPLOAD_BYTES. The returned upload_token binds
+        the key to the IM and is what complete_direct_upload accepts, so a
+        client can only attach objects it was issued.
+        """
+        object_key = f"{PdfUploadService.S3_PREFIX}/{uuid.uuid4().hex}/{secure_filename(filename) or 'document.pdf'}"
+        post = get_s3_client().generate_presigned_post(
+            Bucket=os.getenv('AWS_BUCKET_NAME'),
+            Key=object_key,
+            Fields={'Content-Type': 'application/pdf'},
+            Conditions=[
+                {'Content-Type': 'application/pdf'},
+                ['content-length-range', 1, PdfUploadService.MAX_UPLOAD_BYTES],
+            ],
+            ExpiresIn=PdfUploadService.UPLOAD_URL_EXPIRES,
+        )
+        token = PdfUploadService._serializer().dumps({'key': object_key, 'im_id': im_id, 'sub': user_identity})
+        return {
+            'url': post['url'],
+            'fields': post['fields'],
+            'object_key': object_key,
+            'upload_token': token,
+            'max_bytes': PdfUploadService.MAX_UPLOAD_BYTES,
+            'expires_in': PdfUploadService.UPLOAD_URL_EXPIRES,
+        }
+
+    @staticmethod
+    def verify_direct_upload(upload_token, user_identity=None):
+        """Check a finished browser upload. Returns (im_id, object_key, size).
+
+        Raises ValueError if the token is invalid or expired, was issued to
+        another user, or the object is missing, too large or not a PDF. An
+        object that fails the content checks is deleted.
+        """
+        try:
+            claims = PdfUploadService._serializer().loads(
+                upload_token,
+                # The browser has UPLOAD_URL_EXPIRES to start the upload; allow the same again to finish it
+                max_age=PdfUploadService.UPLOAD_URL_EXPIRES * 2,
+            )
+        except BadSignature:
+            raise ValueError("Invalid or expired upload token")
+        if claims.get('sub') is not None and str(claims['sub']) != str(user_identity):
+            raise ValueError("Upload token was issued to another user")
+
+        s3 = get_s3_client()
+        bucket_name = os.getenv('AWS_BUCKET_NAME')
+        object_key = claims['key']
+        try:
+            head = s3.head_object(Bucket=bucket_name, Key=object_key)
+        except Exception:
+            raise ValueError("Uploaded object not found; upload the file before completing")
+
+        size = head['ContentLength']
+        magic = s3.get_object(Bucket=bucket_name, Key=object_key, Range='bytes=0-4')['Body'].read()
+        if size > PdfUploadService.MAX_UPLOAD_BYTES or magic != b'%PDF-':
+            s3.delete_object(Bucket=bucket_name, Key=object_key)
+            raise ValueError("Uploaded file is not a valid PDF")
+        return claims['im_id'], object_key, size
+
+    @staticmethod
+    def queue_analysis(app, im_id, object_key, analyze):
+        """Run `analyze` on an uploaded object in a background thread and store the result as the IM's notes.
+
+        The notes are only written if the IM still points at object_key, so a
+        slow analysis never overwrites the notes of a newer upload.
+        """
+        return PdfUploadService._executor().submit(
+            PdfUploadService._analyze_object, app, im_id, object_key, analyze
+        )
+
+    ################################################################
+    #                    HELPER FUNCTIONS                          #
+    ################################################################
+    @staticmethod
+    def _analyze_object(app, im_id, object_key, analyze):
+        with app.app_context():
+            path = None
+            try:
+                s3 = get_s3_client()
+                bucket_name = os.getenv('AWS_BUCKET_NAME')
+                size = s3.head_object(Bucket=bucket_name, Key=object_key)['ContentLength']
+                if size > PdfUploadService.ANALYSIS_MAX_BYTES:
+                    print(f"Skipping analysis of {object_key}: larger than {PdfUploadService.ANALYSIS_MAX_BYTES} bytes")
+                    return None
+                hasher = hashlib.sha256()
+                body = s3.get_object(Bucket=bucket_name, Key=object_key)['Body']
+                with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
+                    path = f.name
+                    for chunk in body.iter_chunks(1024 * 1024):
+                        hasher.update(chunk)
+                        f.write(chunk)
+                sha256 = hasher.hexdigest()
+
+                existing = PdfUploadService.find_catalogued(sha256)
+                if existing is None:
+                    notes = PdfUploadService._format_notes(analyze(path))
+                    InstructionalMaterial.query.filter_by(id=im_id, s3_link=object_key).update(
+                        {'notes': notes}, synchronize_session=False
+                    )
+                    db.session.commit()
+                    existing = PdfUploadService._catalogue(sha256, object_key, size, notes)
+                    if existing is None:
+                        return notes
+
+                if existing.s3_key != object_key:
+                    # Same content as a catalogued object: point the IM at it and drop this copy
+                    InstructionalMaterial.query.filter_by(id=im_id, s3_link=object_key).update(
+                        {'s3_link': existing.s3_key, 'notes': existing.notes}, synchronize_session=False
+                    )
+                    db.session.commit()
+                    s3.delete_object(Bucket=bucket_name, Key=object_key)
+                return existing.notes
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error analyzing {object_key} for IM {im_id}: {str(e)}")
+                return None
+            finally:
+                db.session.remove()
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+    @staticmethod
+    def _is_referenced(object_key):
+        # No is_deleted filter: a soft-deleted IM can be restored with its PDF
+        return db.session.query(
+            InstructionalMaterial.query.filter_by(s3_link=object_key).exists()
+        ).scalar()
+
+    @staticmethod
+    def _catalogue(sha256, object_key, size, notes):
+        """Add a catalog entry. Returns None, or the existing entry if the hash was catalogued concurrently."""
+        try:
+            db.session.add(PdfObject(sha256, object_key, size, notes))
+            db.session.commit()
+            return None
+        except IntegrityError:
+            db.session.rollback()
+            return PdfObject.query.filter_by(sha256=sha256).first()
+
+    @staticmethod
+    def _executor():
+        global _analysis_executor, _analysis_executor_pid
+        if _analysis_executor is None or _analysis_executor_pid != os.getpid():
+            with _analysis_executor_lock:
+                if _analysis_executor is None or _analysis_executor_pid != os.getpid():
+                    _analysis_executor = ThreadPoolExecutor(
+                        max_workers=PdfUploadService.ANALYSIS_WORKERS, thread_name_prefix='pdf-analysis'
+                    )
+                    _analysis_executor_pid = os.getpid()
+        return _analysis_executor
+
+    @staticmethod
+    def _serializer():
+        return URLSafeTimedSerializer(os.getenv('JWT_SECRET_KEY'), salt='im-pdf-upload')
+
+    @staticmethod
+    def _format_notes(result):
+        if result is None or isinstance(result, str):
+            return result
+        return json.dumps(result)
+
+    @staticmethod
+    def _transfer_config():
+        config = TransferConfig(
+            multipart_threshold=PdfUploadService.PART_SIZE,
+            multipart_chunksize=PdfUploadService.PART_SIZE,
+            max_concurrency=PdfUploadService.MAX_CONCURRENCY,
+        )
+        # Parts read from a non-seekable stream are buffered in memory; cap how many
+        config.max_in_memory_upload_chunks = PdfUploadService.MAX_CONCURRENCY + 1
+        return config
+
+
+class _PdfUploadSink:
+    """File-like target for werkzeug's multipart parser that tees into S3, a hasher and a disk copy."""
+    PIPE_DEPTH = 64  # parser chunks (~64 KiB each) buffered ahead of the uploader
+    _EOF = object()
+
+    def __init__(self, filename, upload=True):
+        """upload=False only checks and hashes the content (for a file already in the catalog)."""
+        self.filename = filename
+        self.object_key = (
+            f"{PdfUploadService.S3_PREFIX}/{uuid.uuid4().hex}/{secure_filename(filename) or 'document.pdf'}"
+            if upload else None
+        )
+        self.size = 0
+        self.hasher = hashlib.sha256()
+
+        self._analysis = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) if upload else None
+        self.analysis_path = self._analysis.name if upload else None
+        self._pipe = queue.Queue(maxsize=self.PIPE_DEPTH)
+        self._pending = b''
+        self._eof = False
+        self._reader_eof = False
+        self._error = None
+        self._done = threading.Event()
+        if upload:
+            self._thread = threading.Thread(target=self._upload, name='pdf-upload', daemon=True)
+            self._thread.start()
+        else:
+            self._done.set()
+
+    # -- writer side (request thread) --
+    def write(self, data):
+        if self.size == 0 and not bytes(data[:5]) == b'%PDF-':
+            raise ValueError("Uploaded file is not a PDF")
+        self.size += len(data)
+        self.hasher.update(data)
+        if self._analysis is not None:
+            if self.size <= PdfUploadService.ANALYSIS_MAX_BYTES:
+                self._analysis.write(data)
+            else:
+                self.remove_analysis_copy()
+        if self.object_key:
+            self._put(bytes(data))
+        return len(data)
+
+    def seek(self, *args):
+        # Called by the parser once the part ends; the data has already gone to S3
+        return 0
+
+    def close(self):
+        if self._analysis is not None:
+            self._analysis.close()
+            self._analysis = None
+        if not self._eof:
+            self._eof = True
+            if self.object_key:
+                self._put(self._EOF)
+
+    def wait(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+
+    def abort(self, error):
+        """Fail the upload (the uploader aborts the multipart upload) and remove anything written."""
+        self._error = self._error or error
+        self._eof = True
+        try:
+            self._pipe.put_nowait(self._EOF)  # wake the uploader if it is waiting for data
+        except queue.Full:
+            pass
+        self._done.wait()
+        if not self.object_key:
+            return
+        try:
+            get_s3_client().delete_object(Bucket=os.getenv('AWS_BUCKET_NAME'), Key=self.object_key)
+        except Exception:
+            pass
+
+    def remove_analysis_copy(self):
+        if self._analysis is not None:
+            self._analysis.close()
+            self._analysis = None
+        if self.analysis_path and os.path.exists(self.analysis_path):
+            os.remove(self.analysis_path)
+        self.analysis_path = None
+
+    # -- reader side (upload thread) --
+    def read(self, size=-1):
+        chunks = [self._pending]
+        length = len(self._pending)
+        while (size < 0 or length < size) and not self._reader_eof:
+            item = self._pipe.get()
+            if self._error is not None:
+                raise self._error
+            if item is self._EOF:
+                self._reader_eof = True
+                break
+            chunks.append(item)
+            length += len(item)
+        data = b''.join(chunks)
+        if size < 0:
+            self._pending = b''
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+    def _upload(self):
+        try:
+            get_s3_client().upload_fileobj(
+                self,
+                os.getenv('AWS_BUCKET_NAME'),
+                self.object_key,
+                ExtraArgs={'ContentType': 'application/pdf'},
+                Config=PdfUploadService._transfer_config(),
+            )
+        except Exception as e:
+            # The writer sees this on its next write and stops
+            self._error = self._error or e
+        finally:
+            self._done.set()
+
+    def _put(self, item):
+        while True:
+            if self._error is not None:
+                raise self._error
+            try:
+                self._pipe.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
@@ -1,7 +1,7 @@
 import os
-import boto3
-import tempfile
 from dotenv import load_dotenv
+from api.services.s3_client import get_s3_client
+from api.services.s3_disk_cache import S3DiskCache
 
 load_dotenv()
 
@@ -11,8 +11,8 @@ class RequirementsService:
     @staticmethod
     def download_requirements_pdf():
         """
-        Download the requirements PDF from S3 (recommendation-letter.pdf)
-        Returns the file content or raises an exception
+        Get the requirements PDF from S3 (recommendation-letter.pdf) via the local disk cache
+        Returns the path of the cached copy (shared; do not modify or delete it) or raises an exception
         """
         try:
             bucket_name = os.getenv('AWS_BUCKET_NAME')
@@ -22,17 +22,30 @@ class RequirementsService:
             # The specific S3 key for the requirements PDF
             s3_key = "requirements/recommendation-letter.pdf"
             
-            # Create S3 client
-            s3 = boto3.client('s3')
+            file_path, _ = S3DiskCache.get_path(s3_key, bucket_name)
+            return file_path
             
-            # Create a temporary file to download to
-            temp_dir = tempfile.gettempdir()
-            temp_file_path = os.path.join(temp_dir, "recommendation-letter.pdf")
-            
-            # Download the file from S3
-            s3.download_file(bucket_name, s3_key, temp_file_path)
+        except Exception as e:
+            raise Exception(f"Requirements PDF download error: {str(e)}")
+    
+    @staticmethod
+    def send_requirements_pdf():
+        """
+        Response serving the requirements PDF as a download from the local disk cache
+        (conditional and Range requests are answered locally)
+        """
+        try:
+            bucket_name = os.getenv('AWS_BUCKET_NAME')
+            if not bucket_name:
+                raise ValueError("AWS_BUCKET_NAME not found in environment variables")
             
-            return temp_file_path
+            return S3DiskCache.send(
+                "requirements/recommendation-letter.pdf",
+                download_name='recommendation-letter.pdf',
+                mimetype='application/pdf',
+                as_attachment=True,
+                bucket_name=bucket_name,
+            )
             
         except Exception as e:
             raise Exception(f"Requirements PDF download error: {str(e)}")
@@ -50,7 +63,7 @@ class RequirementsService:
             
             s3_key = "requirements/recommendation-letter.pdf"
             
-            s3 = boto3.client('s3')
+            s3 = get_s3_client()
             
             # Generate presigned URL with content disposition for inline viewing
             params = {
@@ -97,7 +110,7 @@ class RequirementsService:
                 return False
             
             s3_key = "requirements/recommendation-letter.pdf"
-            s3 = boto3.client('s3')
+            s3 = get_s3_client()
             
             # Try to get object metadata
             s3.head_object(Bucket=bucket_name, Key=s3_key)
@@ -0,0 +1,45 @@
+import os
+import threading
+import boto3
+from botocore.config import Config
+from dotenv import load_dotenv
+
+load_dotenv()
+
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL') or None  # e.g. a local MinIO/LocalStack stand-in
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 50))
+S3_MAX_ATTEMPTS = int(os.getenv('S3_MAX_ATTEMPTS', 5))
+S3_RETRY_MODE = os.getenv('S3_RETRY_MODE', 'adaptive')
+S3_CONNECT_TIMEOUT = float(os.getenv('S3_CONNECT_TIMEOUT', 5))
+S3_READ_TIMEOUT = float(os.getenv('S3_READ_TIMEOUT', 60))
+S3_ADDRESSING_STYLE = os.getenv('S3_ADDRESSING_STYLE', 'path' if S3_ENDPOINT_URL else 'auto')
+
+_s3_client = None
+_s3_client_pid = None
+_s3_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Return the process-wide S3 client.
+
+    boto3 clients are thread-safe but slow to construct, and each one owns a
+    connection pool, so every service shares this one. It is created lazily
+    and rebuilt after a fork so worker processes never share sockets. Pool
+    size, retries (adaptive by default), timeouts and an optional endpoint
+    URL come from the S3_* settings.
+    """
+    global _s3_client, _s3_client_pid
+    if _s3_client is None or _s3_client_pid != os.getpid():
+        with _s3_client_lock:
+            if _s3_client is None or _s3_client_pid != os.getpid():
+                config = Config(
+                    max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                    retries={'total_max_attempts': S3_MAX_ATTEMPTS, 'mode': S3_RETRY_MODE},
+                    connect_timeout=S3_CONNECT_TIMEOUT,
+                    read_timeout=S3_READ_TIMEOUT,
+                    tcp_keepalive=True,
+                    s3={'addressing_style': S3_ADDRESSING_STYLE},
+                )
+                _s3_client = boto3.client('s3', endpoint_url=S3_ENDPOINT_URL, config=config)
+                _s3_client_pid = os.getpid()
+    return _s3_client
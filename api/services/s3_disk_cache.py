@@ -0,0 +1,272 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from botocore.exceptions import ClientError
+from flask import send_file, jsonify
+from dotenv import load_dotenv
+from api.services.s3_client import get_s3_client
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; fills are then only deduplicated within a process
+    fcntl = None
+
+load_dotenv()
+
+S3_CACHE_DIR = os.getenv('S3_CACHE_DIR', os.path.join(tempfile.gettempdir(), 's3-cache'))
+S3_CACHE_MAX_BYTES = int(os.getenv('S3_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+# Objects larger than this are never cached (they would evict everything else)
+S3_CACHE_MAX_OBJECT_BYTES = int(os.getenv('S3_CACHE_MAX_OBJECT_BYTES', 100 * 1024 * 1024))
+# How long a HEAD'ed ETag is trusted before S3 is asked again
+S3_CACHE_REVALIDATE_SECONDS = float(os.getenv('S3_CACHE_REVALIDATE_SECONDS', 30))
+
+_FILL_STRIPES = 64
+_fill_locks = [threading.Lock() for _ in range(_FILL_STRIPES)]
+_versions = {}  # (bucket, key) -> (etag, size, checked_at)
+_state_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+class S3DiskCache:
+    """Size-bounded LRU cache of S3 objects on local disk, shared by every worker on the host.
+
+    Entries are keyed by bucket, key and ETag, so a changed object is a
+    new entry and a stale copy is never served. The ETag is revalidated
+    with a HEAD at most every S3_CACHE_REVALIDATE_SECONDS. A miss is
+    downloaded to a temp file in the cache directory and renamed into
+    place, so readers never see a partial file. Concurrent misses for the
+    same entry are single-flighted with a lock (a flock when available, so
+    this also holds across processes): one download, and everyone else
+    waits for it. Hits bump the file's mtime, and the least recently used
+    files are removed once the directory exceeds S3_CACHE_MAX_BYTES.
+
+    send() serves an entry with send_file, so the WSGI server's file
+    wrapper (sendfile(2) under gunicorn) or USE_X_SENDFILE does the copy,
+    and Range/conditional requests are handled locally.
+    """
+
+    @staticmethod
+    def enabled():
+        return S3_CACHE_MAX_BYTES > 0
+
+    @staticmethod
+    def fits(object_key, bucket_name=None):
+        """Whether the object is small enough to be cached (one HEAD, reused by get_path).
+
+        False for a missing object, so callers fall back to S3StreamService, which answers 404.
+        """
+        if not S3DiskCache.enabled():
+            return False
+        bucket_name = bucket_name or os.getenv('AWS_BUCKET_NAME')
+        try:
+            _, size = S3DiskCache._current_version(bucket_name, object_key)
+        except ClientError as e:
+            if S3DiskCache._is_not_found(e):
+                return False
+            raise
+        return size <= S3_CACHE_MAX_OBJECT_BYTES
+
+    @staticmethod
+    def get_path(object_key, bucket_name=None):
+        """Local path of an up-to-date copy of the object, downloading it on a miss. Returns (path, etag)."""
+        bucket_name = bucket_name or os.getenv('AWS_BUCKET_NAME')
+        for attempt in (1, 2):
+            etag, _ = S3DiskCache._current_version(bucket_name, object_key)
+            path = S3DiskCache._entry_path(bucket_name, object_key, etag)
+            if S3DiskCache._touch(path):
+                with _state_lock:
+                    _stats['hits'] += 1
+                return path, etag
+
+            try:
+                with S3DiskCache._fill_lock(path):
+                    if not os.path.exists(path):
+                        with _state_lock:
+                            _stats['misses'] += 1
+                        S3DiskCache._fill(bucket_name, object_key, etag, path)
+            except ClientError as e:
+                # The object changed between the HEAD and the download; look it up again
+                if attempt == 2 or e.response.get('Error', {}).get('Code') != 'PreconditionFailed':
+                    raise
+                S3DiskCache._forget(bucket_name, object_key)
+                continue
+            S3DiskCache._evict()
+            return path, etag
+
+    @staticmethod
+    def send(object_key, download_name, mimetype=None, as_attachment=False, bucket_name=None):
+        """send_file response for the object, served from the cache (404 JSON if it is not in S3)."""
+        for attempt in (1, 2):
+            try:
+                path, etag = S3DiskCache.get_path(object_key, bucket_name)
+            except ClientError as e:
+                if not S3DiskCache._is_not_found(e):
+                    raise
+                S3DiskCache._forget(bucket_name or os.getenv('AWS_BUCKET_NAME'), object_key)
+                response = jsonify({'error': 'Object not found in storage'})
+                response.status_code = 404
+                return response
+            try:
+                return send_file(
+                    path,
+                    mimetype=mimetype,
+                    as_attachment=as_attachment,
+                    download_name=download_name,
+                    conditional=True,
+                    etag=etag.strip('"'),
+                )
+            except FileNotFoundError:
+                # Evicted between lookup and open
+                if attempt == 2:
+                    raise
+
+    @staticmethod
+    def stats():
+        with _state_lock:
+            return dict(_stats)
+
+    ################################################################
+    #                    HELPER FUNCTIONS                          #
+    ################################################################
+    @staticmethod
+    def _current_version(bucket_name, object_key):
+        now = time.monotonic()
+        with _state_lock:
+            known = _versions.get((bucket_name, object_key))
+        if known and now - known[2] < S3_CACHE_REVALIDATE_SECONDS:
+            return known[0], known[1]
+        head = get_s3_client().head_object(Bucket=bucket_name, Key=object_key)
+        with _state_lock:
+            _versions[(bucket_name, object_key)] = (head['ETag'], head['ContentLength'], now)
+        return head['ETag'], head['ContentLength']
+
+    @staticmethod
+    def _is_not_found(error):
+        code = str(error.response.get('Error', {}).get('Code', ''))
+        status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        return code in ('NoSuchKey', '404', 'NotFound') or status == 404
+
+    @staticmethod
+    def _forget(bucket_name, object_key):
+        with _state_lock:
+            _versions.pop((bucket_name, object_key), None)
+
+    @staticmethod
+    def _key_prefix(bucket_name, object_key):
+        return hashlib.sha256(f"{bucket_name}/{object_key}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _entry_path(bucket_name, object_key, etag):
+        etag_digest = hashlib.sha256(etag.encode('utf-8')).hexdigest()[:16]
+        name = f"{S3DiskCache._key_prefix(bucket_name, object_key)}-{etag_digest}"
+        return os.path.join(S3_CACHE_DIR, 'objects', name)
+
+    @staticmethod
+    def _touch(path):
+        """Mark an entry as recently used; False if it is not cached."""
+        try:
+            if time.time() - os.stat(path).st_mtime > 60:
+                os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _fill_lock(path):
+        stripe = int(os.path.basename(path)[:8], 16) % _FILL_STRIPES
+        return _FillLock(_fill_locks[stripe], os.path.join(S3_CACHE_DIR, 'locks', f"{stripe}.lock"))
+
+    @staticmethod
+    def _fill(bucket_name, object_key, etag, path):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # IfMatch guarantees the bytes belong to the ETag in the entry's name
+        body = get_s3_client().get_object(Bucket=bucket_name, Key=object_key, IfMatch=etag)['Body']
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.fill-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in body.iter_chunks(1024 * 1024):
+                    f.write(chunk)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            body.close()
+
+        # Drop copies of older versions of the same object
+        prefix = S3DiskCache._key_prefix(bucket_name, object_key) + '-'
+        for entry in os.scandir(directory):
+            if entry.name.startswith(prefix) and entry.path != path:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _evict():
+        directory = os.path.join(S3_CACHE_DIR, 'objects')
+        entries = []
+        total = 0
+        for entry in os.scandir(directory):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.startswith('.fill-'):
+                # Abandoned by a crashed fill
+                if time.time() - stat.st_mtime > 3600:
+                    S3DiskCache._remove(entry.path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        if total <= S3_CACHE_MAX_BYTES:
+            return
+        for _, size, path in sorted(entries):
+            if total <= S3_CACHE_MAX_BYTES:
+                break
+            if S3DiskCache._remove(path):
+                total -= size
+                with _state_lock:
+                    _stats['evictions'] += 1
+
+    @staticmethod
+    def _remove(path):
+        try:
+            # Open file handles (responses being sent) keep the data until they close
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class _FillLock:
+    """Thread lock plus, where supported, an flock so workers on the same host share the fill."""
+
+    def __init__(self, thread_lock, lock_path):
+        self.thread_lock = thread_lock
+        self.lock_path = lock_path
+        self._file = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if fcntl is not None:
+            try:
+                os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+                self._file = open(self.lock_path, 'a')
+                fcntl.flock(self._file, fcntl.LOCK_EX)
+            except Exception:
+                self.thread_lock.release()
+                raise
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self.thread_lock.release()
+        return False
@@ -0,0 +1,136 @@
+import os
+from botocore.exceptions import ClientError
+from flask import request, jsonify, Response
+from dotenv import load_dotenv
+from api.services.s3_client import get_s3_client
+
+load_dotenv()
+
+
+class S3StreamService:
+    """Serve an S3 object through the app with HTTP range and validator support.
+
+    A single `Range: bytes=...` request header is passed through to
+    get_object, so a viewer like PDF.js that fetches only the pages it
+    renders costs only those bytes from S3. `If-None-Match` is answered
+    with 304, and `If-Range` falls back to the full object when the ETag or
+    date no longer matches. The body is relayed in chunks and never
+    buffered.
+    """
+    CHUNK_SIZE = int(os.getenv('S3_STREAM_CHUNK_SIZE', 256 * 1024))
+    CACHE_CONTROL = os.getenv('S3_STREAM_CACHE_CONTROL', 'private, max-age=0, must-revalidate')
+
+    @staticmethod
+    def stream_object(object_key, filename=None, content_type=None):
+        """Flask Response for the current request, streaming `object_key` (200, 206, 304 or 416)."""
+        s3 = get_s3_client()
+        bucket_name = os.getenv('AWS_BUCKET_NAME')
+
+        if request.method == 'HEAD':
+            try:
+                obj = s3.head_object(Bucket=bucket_name, Key=object_key)
+            except ClientError as e:
+                return S3StreamService._error_response(e)
+            response = Response(status=200)
+            S3StreamService._set_headers(response, obj, filename, content_type)
+            response.content_length = obj['ContentLength']
+            return response
+
+        params = {'Bucket': bucket_name, 'Key': object_key}
+        if request.headers.get('If-None-Match'):
+            params['IfNoneMatch'] = request.headers['If-None-Match']
+
+        byte_range = S3StreamService._requested_range()
+        if byte_range:
+            params['Range'] = byte_range
+            # If-Range: only honour the range if the object is unchanged, otherwise send all of it
+            if_range = request.if_range
+            if if_range.etag:
+                params['IfMatch'] = f'"{if_range.etag}"'
+            elif if_range.date:
+                params['IfUnmodifiedSince'] = if_range.date
+
+        try:
+            obj = s3.get_object(**params)
+        except ClientError as e:
+            if S3StreamService._error_code(e) == 'PreconditionFailed' and byte_range:
+                params = {key: value for key, value in params.items()
+                          if key not in ('Range', 'IfMatch', 'IfUnmodifiedSince')}
+                try:
+                    obj = s3.get_object(**params)
+                except ClientError as retry_error:
+                    return S3StreamService._error_response(retry_error, object_key)
+            else:
+                return S3StreamService._error_response(e, object_key)
+
+        body = obj['Body']
+        response = Response(
+            body.iter_chunks(S3StreamService.CHUNK_SIZE),
+            status=206 if obj.get('ContentRange') else 200,
+            direct_passthrough=True,
+        )
+        S3StreamService._set_headers(response, obj, filename, content_type)
+        response.content_length = obj['ContentLength']
+        if obj.get('ContentRange'):
+            response.headers['Content-Range'] = obj['ContentRange']
+        response.call_on_close(body.close)
+        return response
+
+    ################################################################
+    #                    HELPER FUNCTIONS                          #
+    ################################################################
+    @staticmethod
+    def _requested_range():
+        """The Range header to forward to S3, or None for a full response.
+
+        Only a single byte range is forwarded. Multi-range requests get the
+        whole object, which RFC 9110 allows.
+        """
+        parsed = request.range
+        if parsed is None or parsed.units != 'bytes' or len(parsed.ranges) != 1:
+            return None
+        start, stop = parsed.ranges[0]
+        if start < 0:
+            return f"bytes={start}"  # suffix range: last -start bytes
+        return f"bytes={start}-{'' if stop is None else stop - 1}"
+
+    @staticmethod
+    def _set_headers(response, obj, filename, content_type):
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.headers['Content-Type'] = content_type or obj.get('ContentType') or 'application/octet-stream'
+        response.headers['Cache-Control'] = S3StreamService.CACHE_CONTROL
+        if obj.get('ETag'):
+            response.headers['ETag'] = obj['ETag']
+        if obj.get('LastModified'):
+            response.last_modified = obj['LastModified']
+        if filename:
+            response.headers.set('Content-Disposition', 'inline', filename=filename)
+
+    @staticmethod
+    def _error_code(error):
+        return str(error.response.get('Error', {}).get('Code', ''))
+
+    @staticmethod
+    def _error_response(error, object_key=None):
+        code = S3StreamService._error_code(error)
+        status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        if code == '304' or status == 304:
+            response = Response(status=304)
+            etag = error.response.get('ResponseMetadata', {}).get('HTTPHeaders', {}).get('etag')
+            if etag:
+                response.headers['ETag'] = etag
+            return response
+        if code == 'InvalidRange' or status == 416:
+            response = Response(status=416)
+            if object_key:
+                try:
+                    size = get_s3_client().head_object(Bucket=os.getenv('AWS_BUCKET_NAME'), Key=object_key)['ContentLength']
+                    response.headers['Content-Range'] = f"bytes */{size}"
+                except ClientError:
+                    pass
+            return response
+        if code in ('NoSuchKey', '404') or status == 404:
+            response = jsonify({'error': 'Object not found in storage'})
+            response.status_code = 404
+            return response
+        raise error
@@ -0,0 +1,245 @@
+import os
+import re
+import time
+import smtplib
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_LEADING_DOT = re.compile(rb'^\.', re.MULTILINE)
+
+
+class SMTPConnectionPool:
+    """Small pool of authenticated SMTP sessions shared by the email fallbacks.
+
+    Connections are handed out LIFO so the warmest session is reused first.
+    A session that has been idle longer than `idle_check_seconds` is probed
+    with NOOP before use, a session that fails while sending is discarded and
+    the message retried once on a fresh one, and every session is closed after
+    `max_messages` messages so servers that throttle long-lived sessions are
+    not tripped.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True, max_size=4,
+                 max_messages=100, idle_check_seconds=30, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_size = max_size
+        self.max_messages = max_messages
+        self.idle_check_seconds = idle_check_seconds
+        self.timeout = timeout
+
+        self._idle = []  # [(smtp, messages_sent, last_used)]
+        self._open = 0
+        self._cond = threading.Condition()
+
+    def send(self, sender, recipients, message):
+        """Send one message (a str or bytes from Message.as_string()/as_bytes()) to a list of recipients."""
+        for attempt in (1, 2):
+            smtp, sent = self._acquire()
+            try:
+                smtp.sendmail(sender, recipients, message)
+            except (smtplib.SMTPSenderRefused, smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:
+                # Refused sender/recipients/data: sendmail reset the session, so it is still usable.
+                # These subclass OSError too, so they must be caught before the clause below.
+                self._release_after_refusal(smtp, sent, e)
+                raise
+            except OSError as e:
+                self._discard(smtp)
+                if attempt == 2 or not self._connection_lost(e):
+                    raise
+                # The connection is gone; retry once on a fresh one
+                print(f"SMTP connection lost ({str(e)}), reconnecting...")
+                continue
+            except Exception:
+                self._release(smtp, sent + 1)
+                raise
+            self._release(smtp, sent + 1)
+            return True
+
+    def send_stream(self, sender, recipients, chunks):
+        """Send a message produced by `chunks()` (a callable returning an iterator of bytes).
+
+        The message is written to the DATA command chunk by chunk instead of
+        being built as one string. Chunks must consist of whole CRLF-terminated
+        lines. `chunks` is called again if the first connection drops.
+        """
+        for attempt in (1, 2):
+            smtp, sent = self._acquire()
+            try:
+                self._stream_data(smtp, sender, recipients, chunks())
+            except (smtplib.SMTPSenderRefused, smtplib.SMTPRecipientsRefused) as e:
+                # Refused before DATA (and reset): the session is still usable
+                self._release_after_refusal(smtp, sent, e)
+                raise
+            except OSError as e:
+                self._discard(smtp)
+                if attempt == 2 or not self._connection_lost(e):
+                    # A data error leaves the session state unknown; it is not resent either
+                    raise
+                print(f"SMTP connection lost ({str(e)}), reconnecting...")
+                continue
+            except Exception:
+                # Failed mid-DATA; the session state is unknown
+                self._discard(smtp)
+                raise
+            self._release(smtp, sent + 1)
+            return True
+
+    def close_all(self):
+        """Close every idle connection (e.g. on shutdown)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for smtp, _, _ in idle:
+            self._quit(smtp)
+
+    ################################################################
+    #                    HELPER FUNCTIONS                          #
+    ################################################################
+    def _acquire(self):
+        while True:
+            with self._cond:
+                while not self._idle and self._open >= self.max_size:
+                    self._cond.wait()
+                if self._idle:
+                    smtp, sent, last_used = self._idle.pop()
+                else:
+                    self._open += 1
+                    smtp = None
+
+            if smtp is None:
+                try:
+                    return self._connect(), 0
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+
+            if time.monotonic() - last_used < self.idle_check_seconds or self._is_alive(smtp):
+                return smtp, sent
+            self._discard(smtp)
+
+    def _release(self, smtp, sent):
+        if sent >= self.max_messages:
+            self._discard(smtp)
+            return
+        with self._cond:
+            self._idle.append((smtp, sent, time.monotonic()))
+            self._cond.notify()
+
+    def _release_after_refusal(self, smtp, sent, error):
+        # 421 means the server is closing the session (smtplib has already closed it)
+        codes = [getattr(error, 'smtp_code', None)]
+        codes.extend(code for code, _ in getattr(error, 'recipients', {}).values())
+        if 421 in codes:
+            self._discard(smtp)
+        else:
+            self._release(smtp, sent + 1)
+
+    @staticmethod
+    def _connection_lost(error):
+        """Whether a send failed because the connection dropped (as opposed to an SMTP reply)."""
+        if isinstance(error, smtplib.SMTPServerDisconnected):
+            return True
+        return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+    def _discard(self, smtp):
+        self._quit(smtp)
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            self._quit(smtp)
+            raise
+        return smtp
+
+    @staticmethod
+    def _stream_data(smtp, sender, recipients, chunks):
+        """MAIL/RCPT/DATA like smtplib.sendmail, but writing the message as it is produced."""
+        smtp.ehlo_or_helo_if_needed()
+        code, resp = smtp.mail(sender)
+        if code != 250:
+            smtp.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, sender)
+        refused = {}
+        for recipient in recipients:
+            code, resp = smtp.rcpt(recipient)
+            if code not in (250, 251):
+                refused[recipient] = (code, resp)
+        if len(refused) == len(recipients):
+            smtp.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        code, resp = smtp.docmd('data')
+        if code != 354:
+            raise smtplib.SMTPDataError(code, resp)
+        ends_with_crlf = True
+        for chunk in chunks:
+            if not chunk:
+                continue
+            # Dot-stuffing; chunks are whole lines, so every line start is matched
+            smtp.send(_LEADING_DOT.sub(b'..', chunk))
+            ends_with_crlf = chunk.endswith(b'\r\n')
+        smtp.send(b'.\r\n' if ends_with_crlf else b'\r\n.\r\n')
+        code, resp = smtp.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, resp)
+        return refused
+
+    @staticmethod
+    def _is_alive(smtp):
+        try:
+            return smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _quit(smtp):
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                smtp.close()
+            except OSError:
+                pass
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool():
+    """Return the process-wide SMTP pool built from the SMTP_* settings (rebuilt after a fork)."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = SMTPConnectionPool(
+                    host=os.getenv('SMTP_SERVER'),
+                    port=int(os.getenv('SMTP_PORT', 587)),
+                    username=os.getenv('SMTP_USERNAME'),
+                    password=os.getenv('SMTP_PASSWORD'),
+                    use_tls=os.getenv('SMTP_USE_TLS', 'true').lower() not in ('0', 'false', 'no'),
+                    max_size=int(os.getenv('SMTP_POOL_SIZE', 4)),
+                    max_messages=int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', 100)),
+                    idle_check_seconds=float(os.getenv('SMTP_IDLE_CHECK_SECONDS', 30)),
+                    timeout=float(os.getenv('SMTP_TIMEOUT', 30)),
+                )
+                _pool_pid = os.getpid()
+    return _pool
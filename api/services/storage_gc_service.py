@@ -0,0 +1,222 @@
+import os
+import time
+from datetime import datetime, timedelta, UTC
+from urllib.parse import urlparse, unquote
+from dotenv import load_dotenv
+from api.extensions import db
+from api.models.instructionalmaterials import InstructionalMaterial
+from api.models.im_certificates import IMCertificate
+from api.models.email_outbox import EmailOutbox
+from api.models.pdf_objects import PdfObject
+from api.services.s3_client import get_s3_client
+from api.services.pdf_upload_service import PdfUploadService
+from api.services.certificate_service import CertificateService
+from api.services.email_outbox_service import EmailOutboxService
+from api.services.email_attachments import ATTACHMENT_URL_EXPIRES
+
+load_dotenv()
+
+
+class StorageGCService:
+    """Find and delete S3 objects under the app's own prefixes that nothing references any more.
+
+    Every key the database points at is loaded into one in-memory set:
+    IM PDFs (soft-deleted IMs included, since they can be restored),
+    certificate DOCX/PDF/thumbnail keys, and attachments of outbox messages
+    that are not yet sent or were sent less than EMAIL_ATTACHMENT_URL_EXPIRES
+    ago (Brevo may still fetch them through a presigned URL). Each prefix is
+    then listed page by page, and unreferenced objects older than the grace
+    period are deleted with delete_objects, up to 1000 keys per call. The
+    grace period covers uploads whose database row is not committed yet
+    (streamed and presigned IM uploads, staged email attachments).
+
+    Certificate files are also kept by QR ID (`<prefix>/<qr_id>.docx`, `.pdf`
+    and `.thumb.png`), since legacy rows have no pdf_s3_link or thumbnail_key
+    until `flask certificates sync-links` and `thumbnails` have run. Links
+    stored as full S3 URLs are converted to their keys.
+
+    The pdf_objects catalog does not keep an object alive on its own: its
+    rows for collected objects are removed with them. Each batch is checked
+    against the IM and certificate tables again right before it is deleted.
+    Keys outside the managed prefixes are never considered.
+    """
+    GRACE_HOURS = float(os.getenv('STORAGE_GC_GRACE_HOURS', 24))
+    DELETE_BATCH_SIZE = 1000  # delete_objects limit
+    CERTIFICATE_SUFFIXES = ('.thumb.png', '.docx', '.pdf')
+    PAGE_SIZE = 1000
+
+    @staticmethod
+    def managed_prefixes():
+        return [
+            PdfUploadService.S3_PREFIX,
+            CertificateService.GENERATED_CERTIFICATES_PREFIX,
+            EmailOutboxService.ATTACHMENT_PREFIX,
+        ]
+
+    @staticmethod
+    def collect(prefixes=None, grace_hours=None, dry_run=False, batch_size=None, echo=print):
+        """Sweep the prefixes; returns counts, bytes and timings. With dry_run nothing is deleted."""
+        prefixes = prefixes or StorageGCService.managed_prefixes()
+        grace_hours = StorageGCService.GRACE_HOURS if grace_hours is None else grace_hours
+        batch_size = min(batch_size or StorageGCService.DELETE_BATCH_SIZE, StorageGCService.DELETE_BATCH_SIZE)
+        cutoff = datetime.now(UTC) - timedelta(hours=grace_hours)
+        bucket_name = os.getenv('AWS_BUCKET_NAME')
+        s3 = get_s3_client()
+
+        started = time.monotonic()
+        referenced = StorageGCService.referenced_keys()
+        stats = {
+            'referenced': len(referenced),
+            'listed': 0,
+            'listed_bytes': 0,
+            'orphaned': 0,
+            'orphaned_bytes': 0,
+            'too_recent': 0,
+            'deleted': 0,
+            'failed': 0,
+            'delete_calls': 0,
+            'reference_seconds': round(time.monotonic() - started, 3),
+        }
+        echo(f"Loaded {len(referenced)} referenced key(s) in {stats['reference_seconds']:.1f}s.")
+
+        pending = []
+
+        def flush():
+            if not pending:
+                return
+            if not dry_run:
+                # Rows written since the reference snapshot (e.g. a dedup hit on a catalogued object)
+                still_referenced = StorageGCService._still_referenced(pending)
+                if still_referenced:
+                    pending[:] = [key for key in pending if key not in still_referenced]
+                    stats['orphaned'] -= len(still_referenced)
+                    if not pending:
+                        return
+                PdfObject.query.filter(PdfObject.s3_key.in_(pending)).delete(synchronize_session=False)
+                db.session.commit()
+                response = s3.delete_objects(
+                    Bucket=bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in pending], 'Quiet': True},
+                )
+                errors = response.get('Errors', [])
+                for error in errors[:5]:
+                    echo(f"  could not delete {error.get('Key')}: {error.get('Code')} {error.get('Message')}")
+                stats['failed'] += len(errors)
+                stats['deleted'] += len(pending) - len(errors)
+                stats['delete_calls'] += 1
+            pending.clear()
+
+        for prefix in prefixes:
+            prefix = prefix.rstrip('/') + '/'
+            paginator = s3.get_paginator('list_objects_v2')
+            for page in paginator.paginate(
+                Bucket=bucket_name, Prefix=prefix, PaginationConfig={'PageSize': StorageGCService.PAGE_SIZE}
+            ):
+                for obj in page.get('Contents', []):
+                    stats['listed'] += 1
+                    stats['listed_bytes'] += obj.get('Size', 0)
+                    if obj['Key'] in referenced:
+                        continue
+                    if StorageGCService._as_utc(obj['LastModified']) > cutoff:
+                        stats['too_recent'] += 1
+                        continue
+                    stats['orphaned'] += 1
+                    stats['orphaned_bytes'] += obj.get('Size', 0)
+                    pending.append(obj['Key'])
+                    if len(pending) >= batch_size:
+                        flush()
+                elapsed = time.monotonic() - started
+                echo(
+                    f"  {prefix}: {stats['listed']} listed, {stats['orphaned']} orphaned "
+                    f"({stats['listed'] / elapsed if elapsed else 0:.0f} objects/s)"
+                )
+        flush()
+
+        stats['elapsed'] = time.monotonic() - started
+        stats['listed_per_second'] = stats['listed'] / stats['elapsed'] if stats['elapsed'] else 0.0
+        stats['deleted_per_second'] = stats['deleted'] / stats['elapsed'] if stats['elapsed'] else 0.0
+        return stats
+
+    @staticmethod
+    def referenced_keys():
+        """Every S3 key the database still points at."""
+        referenced = set()
+        bucket_name = os.getenv('AWS_BUCKET_NAME')
+
+        def add(query):
+            for row in query.yield_per(5000):
+                referenced.update(StorageGCService._key_from_link(value, bucket_name) for value in row if value)
+
+        add(db.session.query(InstructionalMaterial.s3_link).filter(InstructionalMaterial.s3_link.isnot(None)))
+        add(db.session.query(IMCertificate.s3_link, IMCertificate.pdf_s3_link, IMCertificate.thumbnail_key))
+        for (qr_id,) in db.session.query(IMCertificate.qr_id).yield_per(5000):
+            referenced.update(StorageGCService._certificate_keys(qr_id))
+        # Dead messages can be requeued, so their attachments are kept too, and sent ones
+        # until the presigned links in them have expired
+        links_valid_since = datetime.now(UTC).replace(tzinfo=None) - timedelta(seconds=ATTACHMENT_URL_EXPIRES)
+        for (payload,) in (
+            db.session.query(EmailOutbox.payload)
+            .filter(db.or_(EmailOutbox.status != 'sent', EmailOutbox.sent_at >= links_valid_since))
+            .yield_per(1000)
+        ):
+            payload = payload or {}
+            for attachment in payload.get('attachments') or []:
+                if attachment.get('s3_key'):
+                    referenced.add(attachment['s3_key'])
+            for key in ('docx_key', 'pdf_key'):
+                if payload.get(key):
+                    referenced.add(payload[key])
+        return referenced
+
+    ################################################################
+    #                    HELPER FUNCTIONS                          #
+    ################################################################
+    @staticmethod
+    def _still_referenced(keys):
+        referenced = {key for (key,) in db.session.query(InstructionalMaterial.s3_link)
+                      .filter(InstructionalMaterial.s3_link.in_(keys))}
+        for column in (IMCertificate.s3_link, IMCertificate.pdf_s3_link, IMCertificate.thumbnail_key):
+            referenced.update(key for (key,) in db.session.query(column).filter(column.in_(keys)))
+
+        keys_by_qr_id = {}
+        for key in keys:
+            qr_id = StorageGCService._certificate_qr_id(key)
+            if qr_id:
+                keys_by_qr_id.setdefault(qr_id, []).append(key)
+        if keys_by_qr_id:
+            for (qr_id,) in db.session.query(IMCertificate.qr_id).filter(IMCertificate.qr_id.in_(keys_by_qr_id)):
+                referenced.update(keys_by_qr_id[qr_id])
+        return referenced
+
+    @staticmethod
+    def _certificate_keys(qr_id):
+        prefix = CertificateService.GENERATED_CERTIFICATES_PREFIX
+        return [f"{prefix}/{qr_id}{suffix}" for suffix in StorageGCService.CERTIFICATE_SUFFIXES]
+
+    @staticmethod
+    def _certificate_qr_id(key):
+        """QR ID a certificate file key was named after, or None for other keys."""
+        prefix = CertificateService.GENERATED_CERTIFICATES_PREFIX + '/'
+        if not key.startswith(prefix):
+            return None
+        name = key[len(prefix):]
+        for suffix in StorageGCService.CERTIFICATE_SUFFIXES:
+            if name.endswith(suffix) and '/' not in name:
+                return name[:-len(suffix)]
+        return None
+
+    @staticmethod
+    def _key_from_link(link, bucket_name):
+        """S3 key of a stored link; legacy rows hold full virtual-hosted or path-style URLs."""
+        if not link.startswith(('http://', 'https://')):
+            return link
+        parsed = urlparse(link)
+        key = unquote(parsed.path.lstrip('/'))
+        host = parsed.hostname or ''
+        if bucket_name and key.startswith(f"{bucket_name}/") and not host.startswith(f"{bucket_name}."):
+            key = key[len(bucket_name) + 1:]
+        return key
+
+    @staticmethod
+    def _as_utc(value):
+        return value.replace(tzinfo=UTC) if value.tzinfo is None else value
@@ -10,5 +10,8 @@ load_dotenv()
 app = create_app()
 
 if __name__ == "__main__":
+    if os.getenv('EMAIL_OUTBOX_WORKER', '').lower() == 'thread':
+        from api.services.email_outbox_service import EmailOutboxService
+        EmailOutboxService.start_background_worker(app)
     port = int(os.environ.get('PORT', 8080))
     app.run(host='0.0.0.0', port=port)
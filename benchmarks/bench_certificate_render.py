@@ -0,0 +1,137 @@
+"""Compare certificate rendering paths: DOCX + LibreOffice vs. the raster layout.
+
+Runs entirely offline (no database, no S3):
+
+    python benchmarks/bench_certificate_render.py --count 20
+    python benchmarks/bench_certificate_render.py --docx path/to/template.docx --background bg.png
+
+Without --docx/--background a minimal template and a blank A4 landscape
+background are generated. The background is copied into
+CERTIFICATE_ASSET_DIR (a temporary directory unless it is set), since the
+renderer only reads local backgrounds from there; a --layout file's
+background must already resolve inside it. The DOCX path is skipped if
+LibreOffice is missing.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import argparse
+import tempfile
+from datetime import date
+from io import BytesIO
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Read by the renderer at import time
+OWN_ASSET_DIR = 'CERTIFICATE_ASSET_DIR' not in os.environ
+if OWN_ASSET_DIR:
+    os.environ['CERTIFICATE_ASSET_DIR'] = tempfile.mkdtemp(prefix='cert-bench-')
+    atexit.register(shutil.rmtree, os.environ['CERTIFICATE_ASSET_DIR'], True)
+ASSET_DIR = os.environ['CERTIFICATE_ASSET_DIR']
+
+from PIL import Image
+from docx import Document
+from api.services.certificate_service import CertificateService
+
+
+FIELDS = {
+    'im_id': 1,
+    'college_name': 'College of Computer and Information Sciences',
+    'course_code': 'COMP 101',
+    'course_title': 'Introduction to Computing',
+    'program_name': 'Bachelor of Science in Computer Science',
+    'semester': '1st Semester',
+    'semester_label': 'First Semester',
+    'academic_year': '2025-2026',
+    'validity_duration': 'three (3) years',
+    'course_code_and_title': 'COMP 101: Introduction to Computing',
+    'author_name': 'Juan Santos Dela Cruz',
+    'author_rank': 'Assistant Professor III',
+    'author_rank_and_name': 'Assistant Professor III Juan Santos Dela Cruz',
+    'date_issued': date.today().strftime("%B %d, %Y"),
+}
+
+
+def default_docx():
+    doc = Document()
+    doc.add_paragraph('CERTIFICATE OF APPRECIATION')
+    doc.add_paragraph('is awarded to {{AUTHOR_RANK_AND_NAME}}')
+    doc.add_paragraph('for {{COURSE_CODE_AND_TITLE}}, {{SEMESTER}} {{ACADEMIC_YEAR}}')
+    doc.add_paragraph('Given on {{DATE_ISSUED}}')
+    doc.add_paragraph(CertificateService.QR_PLACEHOLDER)
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def default_layout(background):
+    return json.dumps({
+        'background': background,
+        'dpi': 150,
+        'fields': [
+            {'text': 'CERTIFICATE OF APPRECIATION', 'x': 877, 'y': 250, 'size': 72, 'anchor': 'mm'},
+            {'text': '{author_rank_and_name}', 'x': 877, 'y': 520, 'size': 64, 'anchor': 'mm', 'max_width': 1500},
+            {'text': '{course_code_and_title}', 'x': 877, 'y': 650, 'size': 40, 'anchor': 'mm', 'max_width': 1500},
+            {'text': '{semester_label}, A.Y. {academic_year}', 'x': 877, 'y': 720, 'size': 36, 'anchor': 'mm'},
+            {'text': 'Given on {date_issued}', 'x': 877, 'y': 800, 'size': 32, 'anchor': 'mm'},
+        ],
+        'qr': {'x': 1450, 'y': 900, 'size': 250},
+    }).encode('utf-8')
+
+
+def bench(label, template_bytes, count):
+    timings = []
+    pdfs = 0
+    for i in range(count):
+        started = time.perf_counter()
+        _docx, pdf = CertificateService._render_certificate(template_bytes, FIELDS, f"CERT-BENCH-{i}", date.today())
+        timings.append(time.perf_counter() - started)
+        pdfs += 1 if pdf else 0
+    timings.sort()
+    print(f"{label:<8} n={count:<4} pdfs={pdfs:<4} "
+          f"mean={sum(timings) / count * 1000:8.1f} ms  "
+          f"p50={timings[count // 2] * 1000:8.1f} ms  "
+          f"max={timings[-1] * 1000:8.1f} ms  "
+          f"({count / sum(timings):.1f} certs/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--docx', help='DOCX template to benchmark')
+    parser.add_argument('--background', help='Background image for the raster layout')
+    parser.add_argument('--layout', help='JSON layout (its "background" must resolve inside CERTIFICATE_ASSET_DIR)')
+    args = parser.parse_args()
+
+    background = None
+    try:
+        if args.layout:
+            with open(args.layout, 'rb') as f:
+                layout_bytes = f.read()
+        else:
+            background = os.path.join(ASSET_DIR, f"bench-background-{os.getpid()}.png")
+            if args.background:
+                shutil.copyfile(args.background, background)
+            else:
+                Image.new('RGB', (1754, 1240), 'white').save(background)  # A4 landscape @ 150 dpi
+            layout_bytes = default_layout(os.path.basename(background))
+        bench('raster', layout_bytes, args.count)
+
+        if shutil.which('soffice') or shutil.which('libreoffice'):
+            if args.docx:
+                with open(args.docx, 'rb') as f:
+                    docx_bytes = f.read()
+            else:
+                docx_bytes = default_docx()
+            bench('docx', docx_bytes, args.count)
+        else:
+            print("docx     skipped: LibreOffice not found")
+    finally:
+        if background and not OWN_ASSET_DIR:
+            os.remove(background)
+
+if __name__ == '__main__':
+    main()
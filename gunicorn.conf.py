@@ -0,0 +1,9 @@
+import os
+
+
+def post_worker_init(worker):
+    # Deliver queued emails from a thread in each web worker instead of a separate `flask email-worker`.
+    # Only the web server starts it, so `flask` CLI commands never dispatch email.
+    if os.getenv('EMAIL_OUTBOX_WORKER', '').lower() == 'thread':
+        from api.services.email_outbox_service import EmailOutboxService
+        EmailOutboxService.start_background_worker(worker.wsgi)
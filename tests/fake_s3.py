@@ -0,0 +1,111 @@
+import hashlib
+from io import BytesIO
+from datetime import datetime, UTC
+from botocore.exceptions import ClientError
+
+
+class FakeBody:
+    def __init__(self, data):
+        self._buffer = BytesIO(data)
+
+    def read(self, size=-1):
+        return self._buffer.read(size)
+
+    def iter_chunks(self, chunk_size=1024):
+        while True:
+            chunk = self._buffer.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        pass
+
+
+class FakeS3:
+    """In-memory stand-in for the boto3 S3 client calls the services make."""
+
+    def __init__(self):
+        self.objects = {}  # key -> (data, last_modified)
+        self.calls = []
+
+    def put(self, key, data, last_modified=None):
+        self.objects[key] = (data, last_modified or datetime.now(UTC))
+
+    def etag(self, key):
+        return '"%s"' % hashlib.md5(self.objects[key][0]).hexdigest()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.calls.append(('put_object', Key))
+        self.put(Key, Body if isinstance(Body, bytes) else Body.read())
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None, Config=None, Callback=None):
+        self.calls.append(('upload_fileobj', key))
+        self.put(key, fileobj.read())
+
+    def download_fileobj(self, bucket, key, fileobj, Config=None):
+        self.calls.append(('download_fileobj', key))
+        fileobj.write(self._get(key, 'GetObject')[0])
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self.calls.append(('head_object', Key))
+        data, last_modified = self._get(Key, 'HeadObject', code='404')
+        return {'ContentLength': len(data), 'ETag': self.etag(Key), 'LastModified': last_modified,
+                'ContentType': 'application/pdf'}
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None, IfNoneMatch=None, **kwargs):
+        self.calls.append(('get_object', Key))
+        data, last_modified = self._get(Key, 'GetObject')
+        etag = self.etag(Key)
+        if IfMatch and IfMatch != etag:
+            raise self._error('PreconditionFailed', 412, 'GetObject')
+        if IfNoneMatch and IfNoneMatch == etag:
+            raise self._error('304', 304, 'GetObject')
+        response = {'ETag': etag, 'LastModified': last_modified, 'ContentType': 'application/pdf'}
+        if Range:
+            start, end = Range.split('=', 1)[1].split('-')
+            total = len(data)
+            if start == '':
+                start, end = total - int(end), total - 1
+            start, end = int(start), min(int(end) if end else total - 1, total - 1)
+            if start >= total:
+                raise self._error('InvalidRange', 416, 'GetObject')
+            response.update(Body=FakeBody(data[start:end + 1]), ContentLength=end - start + 1,
+                            ContentRange=f"bytes {start}-{end}/{total}")
+        else:
+            response.update(Body=FakeBody(data), ContentLength=len(data))
+        return response
+
+    def delete_object(self, Bucket, Key):
+        self.calls.append(('delete_object', Key))
+        self.objects.pop(Key, None)
+
+    def delete_objects(self, Bucket, Delete):
+        self.calls.append(('delete_objects', len(Delete['Objects'])))
+        for obj in Delete['Objects']:
+            self.objects.pop(obj['Key'], None)
+        return {'Deleted': Delete['Objects']}
+
+    def get_paginator(self, name):
+        objects = self.objects
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix='', PaginationConfig=None, **kwargs):
+                keys = sorted(key for key in objects if key.startswith(Prefix))
+                yield {'Contents': [
+                    {'Key': key, 'Size': len(objects[key][0]), 'LastModified': objects[key][1]} for key in keys
+                ]}
+
+        return Paginator()
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn=3600):
+        return f"https://bucket.s3.amazonaws.com/{Params['Key']}?X-Amz-Expires={ExpiresIn}"
+
+    def _get(self, key, operation, code='NoSuchKey'):
+        if key not in self.objects:
+            raise self._error(code, 404, operation)
+        return self.objects[key]
+
+    @staticmethod
+    def _error(code, status, operation):
+        return ClientError({'Error': {'Code': code}, 'ResponseMetadata': {'HTTPStatusCode': status}}, operation)
@@ -0,0 +1,118 @@
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from datetime import date
+from api import create_app
+from api.extensions import db
+from api.models.colleges import College
+from api.models.subjects import Subject
+from api.models.serviceims import ServiceIM
+from api.models.instructionalmaterials import InstructionalMaterial
+from api.models.authors import Author
+from api.models.users import User
+from api.models.im_certificates import IMCertificate
+from api.services.certificate_service import CertificateService
+
+class CertificateServiceTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.testing = True
+
+        with self.app.app_context():
+            db.create_all()
+            self._create_test_data()
+
+        # Rendering, conversion and S3 are not under test here
+        self.patches = [
+            patch.object(CertificateService, '_render_certificate', return_value=(b'docx', b'%PDF-1.4')),
+            patch.object(CertificateService, '_upload_certificate_files',
+                         side_effect=lambda qr_id, *args, **kwargs: (
+                             f"generated-certificates/{qr_id}.docx",
+                             f"generated-certificates/{qr_id}.pdf",
+                             f"generated-certificates/{qr_id}.thumb.png",
+                         )),
+            patch('api.services.certificate_service.get_s3_client', return_value=MagicMock()),
+            patch('api.services.certificate_service.CertificateVerificationService.invalidate'),
+        ]
+        self.render = self.patches[0].start()
+        for p in self.patches[1:]:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        with self.app.app_context():
+            db.session.remove()
+            for table in reversed(db.metadata.sorted_tables):
+                db.session.execute(table.delete())
+            db.session.commit()
+
+    def _create_test_data(self):
+        college = College(abbreviation="TESTCOL", name="Test College", created_by="system", updated_by="system")
+        subject = Subject(code="TEST101", name="Test Subject", created_by="system", updated_by="system")
+        db.session.add_all([college, subject])
+        db.session.flush()
+        service_im = ServiceIM(college_id=college.id, subject_id=subject.id)
+        db.session.add(service_im)
+        db.session.flush()
+
+        user = User(role="Faculty", staff_id="CERT1", first_name="Cert", last_name="Author",
+                    email="certauthor@example.com", password="testpassword", phone_number="1234567890",
+                    birth_date=date(1990, 1, 1), created_by="system", updated_by="system", rank="Professor")
+        im = InstructionalMaterial(im_type="Service", status="Published", validity="2025", version="1",
+                                   s3_link="ims/test.pdf", created_by="system", updated_by="system",
+                                   service_im_id=service_im.id, semester="1st semester", published=1)
+        db.session.add_all([user, im])
+        db.session.flush()
+        db.session.add(Author(im_id=im.id, user_id=user.id))
+        db.session.commit()
+
+        self.im_id = im.id
+        self.user_id = user.id
+
+    def test_generate_twice_reuses_certificate(self):
+        with self.app.app_context():
+            first = CertificateService.generate_certificates(self.im_id, template_bytes=b'template')
+            second = CertificateService.generate_certificates(self.im_id, template_bytes=b'template')
+
+            self.assertEqual(IMCertificate.query.filter_by(im_id=self.im_id, user_id=self.user_id).count(), 1)
+            self.assertFalse(first[0]['reused'])
+            self.assertTrue(second[0]['reused'])
+            self.assertEqual(first[0]['qr_id'], second[0]['qr_id'])
+            self.assertEqual(self.render.call_count, 1, "An unchanged certificate should not be re-rendered")
+
+    def test_concurrent_insert_returns_existing_certificate(self):
+        with self.app.app_context():
+            first = CertificateService.generate_certificate_for_user(self.im_id, self.user_id, template_bytes=b'template')
+
+            # A second request that looked before the first one committed still sees no certificate
+            im_fields = CertificateService._build_im_fields(db.session.get(InstructionalMaterial, self.im_id))
+            second = CertificateService._generate_certificate(
+                b'template', CertificateService._template_hash(b'template'),
+                db.session.get(User, self.user_id), im_fields, existing=None,
+            )
+
+            self.assertEqual(IMCertificate.query.filter_by(im_id=self.im_id, user_id=self.user_id).count(), 1)
+            self.assertEqual(first['qr_id'], second['qr_id'])
+            self.assertTrue(second['reused'])
+
+    def test_rerender_sweep_skips_uploaded_templates(self):
+        from api.services.certificate_batch_service import CertificateBatchService
+        with self.app.app_context():
+            with patch.object(CertificateService, '_download_template', return_value=b'default v1'):
+                CertificateService.generate_certificates(self.im_id)
+            cert = IMCertificate.query.filter_by(im_id=self.im_id, user_id=self.user_id).first()
+            self.assertEqual(cert.template_source, CertificateService.TEMPLATE_S3_KEY)
+
+            new_hash = CertificateService._template_hash(b'default v2')
+            self.assertEqual(CertificateBatchService.count_stale(new_hash), 1)
+
+            CertificateService.generate_certificates(self.im_id, template_bytes=b'custom upload')
+            cert = IMCertificate.query.filter_by(im_id=self.im_id, user_id=self.user_id).first()
+            self.assertEqual(cert.template_source, CertificateService.UPLOADED_TEMPLATE_SOURCE)
+            self.assertEqual(CertificateBatchService.count_stale(new_hash), 0,
+                             "Certificates from an uploaded template must never be swept")
+
+            cert.template_source = None
+            db.session.commit()
+            self.assertEqual(CertificateBatchService.count_stale(new_hash), 0)
+            self.assertEqual(CertificateBatchService.count_stale(new_hash, include_legacy=True), 1)
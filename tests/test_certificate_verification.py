@@ -0,0 +1,114 @@
+import os
+from unittest import TestCase
+from unittest.mock import patch
+from datetime import date
+from api import create_app
+from api.extensions import db
+from api.models.colleges import College
+from api.models.subjects import Subject
+from api.models.serviceims import ServiceIM
+from api.models.instructionalmaterials import InstructionalMaterial
+from api.models.users import User
+from api.models.im_certificates import IMCertificate
+from api.models.im_certificate_aliases import IMCertificateAlias
+from api.services.certificate_verification_service import CertificateVerificationService
+
+class CertificateVerificationTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.testing = True
+        self.client = self.app.test_client()
+        CertificateVerificationService._cache.clear()
+        self.secret = patch.dict(os.environ, {'CERTIFICATE_QR_SECRET': 'qr-secret'})
+        self.secret.start()
+
+        with self.app.app_context():
+            db.create_all()
+            self._create_test_data()
+
+    def tearDown(self):
+        self.secret.stop()
+        CertificateVerificationService._cache.clear()
+        with self.app.app_context():
+            db.session.remove()
+            for table in reversed(db.metadata.sorted_tables):
+                db.session.execute(table.delete())
+            db.session.commit()
+
+    def _create_test_data(self):
+        college = College(abbreviation="TESTCOL", name="Test College", created_by="system", updated_by="system")
+        subject = Subject(code="TEST101", name="Test Subject", created_by="system", updated_by="system")
+        db.session.add_all([college, subject])
+        db.session.flush()
+        service_im = ServiceIM(college_id=college.id, subject_id=subject.id)
+        user = User(role="Faculty", staff_id="VER1", first_name="Ver", last_name="Author",
+                    email="verauthor@example.com", password="testpassword", phone_number="1234567890",
+                    birth_date=date(1990, 1, 1), created_by="system", updated_by="system")
+        db.session.add_all([service_im, user])
+        db.session.flush()
+        im = InstructionalMaterial(im_type="Service", status="Published", validity="2025", version="1",
+                                   s3_link="ims/test.pdf", created_by="system", updated_by="system",
+                                   service_im_id=service_im.id)
+        db.session.add(im)
+        db.session.flush()
+        certificate = IMCertificate(qr_id="CERT-KEPT", im_id=im.id, user_id=user.id,
+                                    s3_link="generated-certificates/CERT-KEPT.docx", date_issued=date(2024, 1, 1))
+        db.session.add(certificate)
+        db.session.flush()
+        # A duplicate merged into CERT-KEPT when (im_id, user_id) became unique
+        db.session.add(IMCertificateAlias("CERT-MERGED", certificate.id))
+        db.session.commit()
+
+    def test_verify_certificate(self):
+        response = self.client.get('/certificates/verify/CERT-KEPT')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['holder_name'], "Ver Author")
+        self.assertEqual(response.json['subject'], "TEST101: Test Subject")
+        self.assertEqual(response.json['source'], 'database')
+
+    def test_merged_qr_id_stays_verifiable(self):
+        response = self.client.get('/certificates/verify/CERT-MERGED')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['qr_id'], "CERT-MERGED")
+        self.assertEqual(response.json['holder_name'], "Ver Author")
+
+    def test_unknown_qr_id(self):
+        response = self.client.get('/certificates/verify/CERT-UNKNOWN')
+
+        self.assertEqual(response.status_code, 404)
+
+    def _token(self, qr_id="CERT-KEPT"):
+        return CertificateVerificationService.build_token(qr_id, "Ver Author", "TEST101: Test Subject", "2024-01-01")
+
+    def test_signed_token_is_answered_from_its_claims(self):
+        response = self.client.get(f'/certificates/verify/CERT-KEPT?token={self._token()}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['source'], 'signature')
+        self.assertEqual(response.json['holder_name'], "Ver Author")
+
+    def test_signed_token_of_deleted_certificate_is_rejected(self):
+        token = self._token()
+        with self.app.app_context():
+            db.session.query(IMCertificateAlias).delete()
+            db.session.query(IMCertificate).delete()
+            db.session.commit()
+
+        response = self.client.get(f'/certificates/verify/CERT-KEPT?token={token}')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_expired_token_falls_back_to_database(self):
+        token = self._token()
+        with patch.object(CertificateVerificationService, 'TOKEN_MAX_AGE_SECONDS', -1):
+            response = self.client.get(f'/certificates/verify/CERT-KEPT?token={token}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['source'], 'database')
+
+    def test_token_for_another_certificate(self):
+        response = self.client.get(f'/certificates/verify/CERT-MERGED?token={self._token()}')
+
+        self.assertEqual(response.status_code, 400)
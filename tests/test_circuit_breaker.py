@@ -0,0 +1,103 @@
+import smtplib
+import socket
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from api import create_app
+from api.extensions import db
+from api.services.circuit_breaker import CircuitBreaker, CircuitOpenError, get_email_breaker
+from api.services.email_service import EmailService
+
+class CircuitBreakerTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.testing = True
+
+        with self.app.app_context():
+            db.create_all()
+        get_email_breaker('smtp').reset()
+
+    def tearDown(self):
+        get_email_breaker('smtp').reset()
+        with self.app.app_context():
+            db.session.remove()
+            for table in reversed(db.metadata.sorted_tables):
+                db.session.execute(table.delete())
+            db.session.commit()
+
+    def test_opens_at_failure_rate(self):
+        breaker = CircuitBreaker('test', failure_rate=0.5, min_calls=4, window=10, cooldown=60)
+        breaker.record_success()
+        breaker.record_failure("boom")
+        breaker.record_failure("boom")
+        self.assertEqual(breaker.status()['state'], CircuitBreaker.CLOSED, "Below min_calls the breaker stays closed")
+
+        breaker.record_failure("boom")
+        self.assertEqual(breaker.status()['state'], CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertGreater(breaker.retry_in(), 0)
+
+    def test_half_open_probe_closes_on_success(self):
+        breaker = CircuitBreaker('test', min_calls=1, cooldown=0, half_open_probes=1)
+        breaker.record_failure("boom")
+        self.assertEqual(breaker.status()['state'], CircuitBreaker.OPEN)
+
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.status()['state'], CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow(), "Only one probe is let through while half-open")
+
+        breaker.record_success()
+        self.assertEqual(breaker.status()['state'], CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.status()['window_calls'], 0)
+
+    def test_half_open_probe_reopens_on_failure(self):
+        breaker = CircuitBreaker('test', min_calls=1, cooldown=0)
+        breaker.record_failure("boom")
+        self.assertTrue(breaker.allow())
+        breaker.record_failure("still down")
+
+        status = breaker.status()
+        self.assertEqual(status['state'], CircuitBreaker.OPEN)
+        self.assertEqual(status['times_opened'], 2)
+        self.assertEqual(status['last_error'], "still down")
+
+    def _smtp_send_raising(self, error):
+        pool = MagicMock()
+        pool.send.side_effect = error
+        with patch('api.services.email_service.get_smtp_pool', return_value=pool):
+            with self.assertRaises(type(error)):
+                EmailService._smtp_send('sender@example.com', ['user@example.com'], 'message')
+        return get_email_breaker('smtp').status()
+
+    def test_refused_messages_do_not_count_against_smtp(self):
+        errors = [
+            smtplib.SMTPRecipientsRefused({'user@example.com': (550, b'no such user')}),
+            smtplib.SMTPSenderRefused(553, b'sender rejected', 'sender@example.com'),
+            smtplib.SMTPDataError(552, b'message too large'),
+        ]
+        for error in errors:
+            status = self._smtp_send_raising(error)
+            self.assertEqual(status['window_failures'], 0, f"{type(error).__name__} should not count as a failure")
+        self.assertEqual(status['window_calls'], len(errors))
+
+    def test_connection_errors_count_against_smtp(self):
+        errors = [
+            smtplib.SMTPServerDisconnected("connection closed"),
+            smtplib.SMTPAuthenticationError(535, b'bad credentials'),
+            smtplib.SMTPSenderRefused(421, b'service not available', 'sender@example.com'),
+            socket.timeout("timed out"),
+            ConnectionRefusedError("refused"),
+        ]
+        for error in errors:
+            get_email_breaker('smtp').reset()
+            status = self._smtp_send_raising(error)
+            self.assertEqual(status['window_failures'], 1, f"{type(error).__name__} should count as a failure")
+
+    def test_open_smtp_breaker_refuses_without_sending(self):
+        breaker = get_email_breaker('smtp')
+        for _ in range(breaker.min_calls):
+            breaker.record_failure("down")
+        pool = MagicMock()
+        with patch('api.services.email_service.get_smtp_pool', return_value=pool):
+            with self.assertRaises(CircuitOpenError):
+                EmailService._smtp_send('sender@example.com', ['user@example.com'], 'message')
+        pool.send.assert_not_called()
@@ -0,0 +1,97 @@
+from unittest import TestCase
+from datetime import date, timedelta
+from api import create_app
+from api.extensions import db
+from api.models.colleges import College
+from api.models.subjects import Subject
+from api.models.serviceims import ServiceIM
+from api.models.instructionalmaterials import InstructionalMaterial
+from api.models.authors import Author
+from api.models.users import User
+from api.models.email_outbox import EmailOutbox
+from api.models.notification_ledger import NotificationLedger
+from api.services.deadline_notification_service import DeadlineNotificationService
+
+class DeadlineNotificationTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.testing = True
+        self.today = date(2026, 3, 10)
+
+        with self.app.app_context():
+            db.create_all()
+            self._create_test_data()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            for table in reversed(db.metadata.sorted_tables):
+                db.session.execute(table.delete())
+            db.session.commit()
+
+    def _create_test_data(self):
+        college = College(abbreviation="TESTCOL", name="Test College", created_by="system", updated_by="system")
+        subject = Subject(code="TEST101", name="Test Subject", created_by="system", updated_by="system")
+        db.session.add_all([college, subject])
+        db.session.flush()
+        service_im = ServiceIM(college_id=college.id, subject_id=subject.id)
+        db.session.add(service_im)
+        db.session.flush()
+
+        author = User(role="Faculty", staff_id="DL1", first_name="Due", last_name="Author",
+                      email="dueauthor@example.com", password="testpassword", phone_number="1234567890",
+                      birth_date=date(1990, 1, 1), created_by="system", updated_by="system")
+        no_email = User(role="Faculty", staff_id="DL2", first_name="No", last_name="Email",
+                        email="", password="testpassword", phone_number="1234567890",
+                        birth_date=date(1990, 1, 1), created_by="system", updated_by="system")
+        im = InstructionalMaterial(im_type="Service", status="For Resubmission", validity="2025", version="1",
+                                   s3_link="ims/test.pdf", created_by="system", updated_by="system",
+                                   service_im_id=service_im.id, due_date=self.today + timedelta(days=3))
+        db.session.add_all([author, no_email, im])
+        db.session.flush()
+        db.session.add_all([Author(im_id=im.id, user_id=author.id), Author(im_id=im.id, user_id=no_email.id)])
+        db.session.commit()
+
+        self.im_id = im.id
+        self.author_id = author.id
+        self.no_email_id = no_email.id
+
+    def test_reminder_is_queued_once_per_day_remaining(self):
+        with self.app.app_context():
+            self.assertEqual(DeadlineNotificationService.send_deadline_notifications(today=self.today, digest=False), 1)
+            self.assertEqual(DeadlineNotificationService.send_deadline_notifications(today=self.today, digest=False), 0,
+                             "A second run on the same day must not queue the reminder again")
+
+            next_day = self.today + timedelta(days=1)
+            self.assertEqual(DeadlineNotificationService.send_deadline_notifications(today=next_day, digest=False), 1)
+
+            kinds = sorted(kind for (kind,) in db.session.query(NotificationLedger.kind))
+            self.assertEqual(kinds, ['deadline_2', 'deadline_3'])
+            self.assertEqual(EmailOutbox.query.filter_by(kind='deadline').count(), 2)
+
+    def test_past_due_notice_is_queued_once(self):
+        with self.app.app_context():
+            overdue = self.today + timedelta(days=5)
+            self.assertEqual(DeadlineNotificationService.send_deadline_notifications(today=overdue, digest=False), 1)
+            self.assertEqual(DeadlineNotificationService.send_deadline_notifications(today=overdue + timedelta(days=1),
+                                                                                     digest=False), 0)
+
+            message = EmailOutbox.query.one()
+            self.assertEqual(message.kind, 'past_due')
+            self.assertEqual(message.payload['receiver_email'], 'dueauthor@example.com')
+
+    def test_digest_groups_by_recipient(self):
+        with self.app.app_context():
+            self.assertEqual(DeadlineNotificationService.send_deadline_notifications(today=self.today, digest=True), 1)
+            message = EmailOutbox.query.one()
+            self.assertEqual(message.kind, 'deadline_digest')
+            self.assertEqual(len(message.payload['items']), 1)
+
+    def test_authors_without_email_are_skipped(self):
+        with self.app.app_context():
+            pending = DeadlineNotificationService.pending_notifications(today=self.today)
+            self.assertEqual([notice['user_id'] for notice in pending], [self.author_id])
+
+            DeadlineNotificationService.send_deadline_notifications(today=self.today, digest=False)
+            self.assertEqual(NotificationLedger.query.filter_by(user_id=self.no_email_id).count(), 0,
+                             "No ledger row, so the notice still goes out once an address is added")
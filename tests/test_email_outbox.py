@@ -0,0 +1,124 @@
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from sqlalchemy.orm import Query
+from api import create_app
+from api.extensions import db
+from api.models.email_outbox import EmailOutbox
+from api.services.email_service import EmailService
+from api.services.email_outbox_service import EmailOutboxService
+
+class EmailOutboxTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.testing = True
+
+        with self.app.app_context():
+            db.create_all()
+
+        self.sender = MagicMock(return_value=True)
+        self.patches = [
+            patch.object(EmailService, 'any_provider_available', return_value=True),
+            patch.object(EmailOutboxService, '_prepare', side_effect=lambda message: (self.sender, dict(message.payload))),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        with self.app.app_context():
+            db.session.remove()
+            for table in reversed(db.metadata.sorted_tables):
+                db.session.execute(table.delete())
+            db.session.commit()
+
+    def _enqueue(self, count=1):
+        for i in range(count):
+            EmailOutboxService.enqueue('deadline_digest', receiver_email=f"user{i}@example.com")
+        db.session.commit()
+
+    def test_claim_is_exclusive(self):
+        with self.app.app_context():
+            self._enqueue(3)
+            first = EmailOutboxService._claim(10)
+            second = EmailOutboxService._claim(10)
+
+            self.assertEqual(len(first), 3)
+            self.assertEqual(second, [], "Claimed messages must not be handed to a second dispatcher")
+            self.assertEqual({m.status for m in EmailOutbox.query.all()}, {'sending'})
+
+    def test_claim_skips_rows_taken_after_selection(self):
+        with self.app.app_context():
+            self._enqueue(2)
+            first_id, second_id = [m.id for m in EmailOutbox.query.order_by(EmailOutbox.id.asc())]
+            real_update = Query.update
+
+            # Another dispatcher claims the first row between our SELECT and our UPDATE
+            def racing_update(query, values, **kwargs):
+                db.session.execute(
+                    EmailOutbox.__table__.update()
+                    .where(EmailOutbox.id == first_id)
+                    .values(status='sending', locked_at=EmailOutboxService._utcnow())
+                )
+                return real_update(query, values, **kwargs)
+
+            with patch.object(Query, 'update', autospec=True, side_effect=racing_update):
+                claimed = EmailOutboxService._claim(10)
+
+            self.assertEqual([m.id for m in claimed], [second_id])
+
+    def test_successful_send_marks_sent(self):
+        with self.app.app_context():
+            self._enqueue()
+            result = EmailOutboxService.dispatch_batch()
+            message = EmailOutbox.query.one()
+
+            self.assertEqual(result['sent'], 1)
+            self.assertEqual(message.status, 'sent')
+            self.assertEqual(message.attempts, 1)
+            self.assertIsNotNone(message.sent_at)
+
+    def test_failed_send_is_retried_with_backoff(self):
+        with self.app.app_context():
+            self._enqueue()
+            self.sender.side_effect = RuntimeError("provider down")
+            result = EmailOutboxService.dispatch_batch()
+            message = EmailOutbox.query.one()
+
+            self.assertEqual(result['retried'], 1)
+            self.assertEqual(message.status, 'pending')
+            self.assertEqual(message.attempts, 1)
+            self.assertIn("provider down", message.last_error)
+            self.assertGreater(message.next_attempt_at, EmailOutboxService._utcnow())
+            self.assertEqual(EmailOutboxService._claim(10), [], "A message in backoff is not due yet")
+
+    def test_permanent_error_is_dead_lettered_immediately(self):
+        with self.app.app_context():
+            self._enqueue()
+            self.sender.side_effect = ValueError("no valid recipient emails provided")
+            result = EmailOutboxService.dispatch_batch()
+            message = EmailOutbox.query.one()
+
+            self.assertEqual(result['dead'], 1)
+            self.assertEqual(message.status, 'dead')
+            self.assertEqual(message.attempts, 1)
+            self.assertEqual(self.sender.call_count, 1)
+
+    def test_dead_letter_after_max_attempts(self):
+        with self.app.app_context():
+            self._enqueue()
+            message = EmailOutbox.query.one()
+            message.attempts = EmailOutboxService.MAX_ATTEMPTS - 1
+            db.session.commit()
+            self.sender.side_effect = RuntimeError("provider down")
+
+            result = EmailOutboxService.dispatch_batch()
+            message = EmailOutbox.query.one()
+
+            self.assertEqual(result['dead'], 1)
+            self.assertEqual(message.status, 'dead')
+
+            self.assertEqual(EmailOutboxService.requeue_dead(), 1)
+            message = EmailOutbox.query.one()
+            self.assertEqual(message.status, 'pending')
+            self.assertEqual(message.attempts, 0)
@@ -0,0 +1,158 @@
+import os
+import hashlib
+from io import BytesIO
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from werkzeug.exceptions import RequestEntityTooLarge
+from flask import request
+from api import create_app
+from api.extensions import db
+from api.models.instructionalmaterials import InstructionalMaterial
+from api.models.pdf_objects import PdfObject
+from api.services.pdf_upload_service import PdfUploadService
+from tests.fake_s3 import FakeS3
+
+PDF = b'%PDF-1.7\n' + b'0123456789abcdef' * 4096
+
+class PdfUploadTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.testing = True
+
+        with self.app.app_context():
+            db.create_all()
+
+        self.s3 = FakeS3()
+        self.patches = [
+            patch.dict(os.environ, {'AWS_BUCKET_NAME': 'bucket'}),
+            patch('api.services.pdf_upload_service.get_s3_client', return_value=self.s3),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        with self.app.app_context():
+            db.session.remove()
+            for table in reversed(db.metadata.sorted_tables):
+                db.session.execute(table.delete())
+            db.session.commit()
+
+    def _receive(self, content, filename='module.pdf', analyze=None, headers=None):
+        with self.app.test_request_context(
+            '/instructionalmaterials/upload',
+            method='POST',
+            data={'file': (BytesIO(content), filename), 'im_type': 'Service'},
+            content_type='multipart/form-data',
+            headers=headers or {},
+        ):
+            return PdfUploadService.receive(request, analyze=analyze)
+
+    def test_pdf_is_streamed_to_s3_and_analysed(self):
+        seen = {}
+
+        def analyze(path):
+            with open(path, 'rb') as f:
+                seen['content'] = f.read()
+            seen['path'] = path
+            return {'missing': []}
+
+        form, _, upload = self._receive(PDF, analyze=analyze)
+
+        self.assertEqual(form['im_type'], 'Service')
+        self.assertTrue(upload.object_key.startswith(f"{PdfUploadService.S3_PREFIX}/"))
+        self.assertTrue(upload.object_key.endswith('/module.pdf'))
+        self.assertEqual(self.s3.objects[upload.object_key][0], PDF)
+        self.assertEqual(upload.size, len(PDF))
+        self.assertEqual(upload.sha256, hashlib.sha256(PDF).hexdigest())
+        self.assertEqual(seen['content'], PDF)
+        self.assertEqual(upload.notes, '{"missing": []}')
+        self.assertFalse(os.path.exists(seen['path']), "The analysis copy is removed after the request")
+
+    def test_non_pdf_content_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self._receive(b'PK\x03\x04 not a pdf' * 100)
+
+        self.assertEqual(self.s3.objects, {}, "Nothing is left in S3 for a rejected upload")
+
+    def test_oversized_upload_is_rejected(self):
+        with patch.object(PdfUploadService, 'MAX_UPLOAD_BYTES', 1024):
+            with self.assertRaises(RequestEntityTooLarge):
+                self._receive(PDF)
+
+        self.assertEqual(self.s3.objects, {})
+
+    def test_large_pdf_is_uploaded_without_analysis(self):
+        analyze = MagicMock()
+        with patch.object(PdfUploadService, 'ANALYSIS_MAX_BYTES', 1024):
+            _, _, upload = self._receive(PDF, analyze=analyze)
+
+        analyze.assert_not_called()
+        self.assertIsNone(upload.notes)
+        self.assertEqual(self.s3.objects[upload.object_key][0], PDF)
+
+    def test_request_without_pdf_part(self):
+        form, _, upload = self._receive(b'plain text', filename='notes.txt')
+
+        self.assertIsNone(upload)
+        self.assertEqual(self.s3.objects, {})
+
+    def test_second_upload_of_same_content_is_a_duplicate(self):
+        analyze = MagicMock(return_value={'missing': []})
+        _, _, first = self._receive(PDF, analyze=analyze)
+        _, _, second = self._receive(PDF, filename='copy.pdf', analyze=analyze)
+
+        self.assertTrue(second.duplicate)
+        self.assertEqual(second.object_key, first.object_key)
+        self.assertEqual(second.notes, first.notes)
+        self.assertEqual(analyze.call_count, 1, "Catalogued content is not analysed again")
+        self.assertEqual(list(self.s3.objects), [first.object_key], "The second copy is removed from S3")
+
+    def test_declared_hash_of_known_content_skips_upload(self):
+        _, _, first = self._receive(PDF)
+        self.s3.calls.clear()
+
+        _, _, second = self._receive(PDF, headers={'X-Content-SHA256': hashlib.sha256(PDF).hexdigest()})
+
+        self.assertTrue(second.duplicate)
+        self.assertEqual(second.object_key, first.object_key)
+        self.assertEqual([call for call in self.s3.calls if call[0] == 'upload_fileobj'], [])
+
+    def test_declared_hash_must_match_the_body(self):
+        self._receive(PDF)
+        other = b'%PDF-1.7\n' + b'different content' * 100
+
+        with self.assertRaises(ValueError):
+            self._receive(other, headers={'X-Content-SHA256': hashlib.sha256(PDF).hexdigest()})
+
+    def test_catalog_entry_for_deleted_object_is_dropped(self):
+        _, _, upload = self._receive(PDF)
+        self.s3.delete_object(Bucket='bucket', Key=upload.object_key)
+
+        with self.app.app_context():
+            self.assertIsNone(PdfUploadService.find_catalogued(upload.sha256))
+            self.assertEqual(PdfObject.query.count(), 0)
+
+        _, _, again = self._receive(PDF)
+        self.assertFalse(again.duplicate, "The content is uploaded again once its object is gone")
+        self.assertIn(again.object_key, self.s3.objects)
+
+    def test_shared_object_is_kept_while_an_im_references_it(self):
+        _, _, upload = self._receive(PDF)
+        with self.app.app_context():
+            im = InstructionalMaterial(im_type="Service", status="Published", validity="2025", version="1",
+                                       s3_link=upload.object_key, created_by="system", updated_by="system")
+            im.is_deleted = True  # soft-deleted IMs can be restored with their PDF
+            db.session.add(im)
+            db.session.commit()
+
+            self.assertFalse(PdfUploadService.delete_object(upload.object_key))
+            self.assertIn(upload.object_key, self.s3.objects)
+            self.assertEqual(PdfObject.query.count(), 1)
+
+            db.session.delete(im)
+            db.session.commit()
+            self.assertTrue(PdfUploadService.delete_object(upload.object_key))
+            self.assertEqual(self.s3.objects, {})
+            self.assertEqual(PdfObject.query.count(), 0, "The catalog entry goes with the object")
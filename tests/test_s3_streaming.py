@@ -0,0 +1,129 @@
+import os
+import json
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+from api import create_app
+from api.extensions import db
+from api.services import s3_disk_cache
+from api.services.s3_disk_cache import S3DiskCache
+from api.services.s3_stream_service import S3StreamService
+from tests.fake_s3 import FakeS3
+
+PDF = b'%PDF-1.4\n' + bytes(range(256)) * 40
+KEY = 'instructional-materials/sample.pdf'
+
+class S3StreamingTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.testing = True
+
+        with self.app.app_context():
+            db.create_all()
+
+        self.s3 = FakeS3()
+        self.s3.put(KEY, PDF)
+        self.cache_dir = tempfile.mkdtemp()
+        self.patches = [
+            patch.dict(os.environ, {'AWS_BUCKET_NAME': 'bucket'}),
+            patch('api.services.s3_stream_service.get_s3_client', return_value=self.s3),
+            patch('api.services.s3_disk_cache.get_s3_client', return_value=self.s3),
+            patch.object(s3_disk_cache, 'S3_CACHE_DIR', self.cache_dir),
+            patch.dict(s3_disk_cache._versions, clear=True),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        with self.app.app_context():
+            db.session.remove()
+            for table in reversed(db.metadata.sorted_tables):
+                db.session.execute(table.delete())
+            db.session.commit()
+
+    def _stream(self, key=KEY, method='GET', headers=None):
+        with self.app.test_request_context('/pdf', method=method, headers=headers or {}):
+            response = S3StreamService.stream_object(key, filename='sample.pdf', content_type='application/pdf')
+            body = b''.join(response.response) if response.status_code in (200, 206) else response.get_data()
+            return response, body
+
+    def test_range_request_returns_partial_content(self):
+        response, body = self._stream(headers={'Range': 'bytes=100-199'})
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], f"bytes 100-199/{len(PDF)}")
+        self.assertEqual(body, PDF[100:200])
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(response.headers['ETag'], self.s3.etag(KEY))
+
+    def test_suffix_range(self):
+        response, body = self._stream(headers={'Range': 'bytes=-10'})
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, PDF[-10:])
+
+    def test_full_response_without_range(self):
+        response, body = self._stream()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, PDF)
+        self.assertEqual(response.content_length, len(PDF))
+
+    def test_matching_etag_returns_not_modified(self):
+        response, _ = self._stream(headers={'If-None-Match': self.s3.etag(KEY)})
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_stale_if_range_returns_whole_object(self):
+        response, body = self._stream(headers={'Range': 'bytes=0-9', 'If-Range': '"outdated"'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, PDF)
+
+    def test_unsatisfiable_range(self):
+        response, _ = self._stream(headers={'Range': f"bytes={len(PDF) + 10}-"})
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'], f"bytes */{len(PDF)}")
+
+    def test_head_request(self):
+        response, _ = self._stream(method='HEAD')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_length, len(PDF))
+        self.assertNotIn(('get_object', KEY), self.s3.calls)
+
+    def test_missing_object_returns_not_found(self):
+        response, body = self._stream(key='instructional-materials/missing.pdf')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(body), {'error': 'Object not found in storage'})
+
+    def test_disk_cache_serves_ranges_and_validators(self):
+        with self.app.test_request_context('/pdf', headers={'Range': 'bytes=0-99'}):
+            self.assertTrue(S3DiskCache.fits(KEY))
+            response = S3DiskCache.send(KEY, download_name='sample.pdf', mimetype='application/pdf')
+            response.direct_passthrough = False
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response.get_data(), PDF[:100])
+            etag = response.headers['ETag']
+
+        with self.app.test_request_context('/pdf', headers={'If-None-Match': etag}):
+            response = S3DiskCache.send(KEY, download_name='sample.pdf', mimetype='application/pdf')
+            self.assertEqual(response.status_code, 304)
+
+        self.assertEqual([call for call in self.s3.calls if call[0] == 'get_object'], [('get_object', KEY)],
+                         "The second request is answered from the cached copy")
+
+    def test_disk_cache_missing_object_returns_not_found(self):
+        missing = 'instructional-materials/missing.pdf'
+        with self.app.test_request_context('/pdf'):
+            self.assertFalse(S3DiskCache.fits(missing), "A missing object falls back to the streaming path")
+            response = S3DiskCache.send(missing, download_name='missing.pdf')
+
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.get_json(), {'error': 'Object not found in storage'})
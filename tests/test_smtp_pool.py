@@ -0,0 +1,105 @@
+import smtplib
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from api import create_app
+from api.extensions import db
+from api.services.smtp_pool import SMTPConnectionPool
+
+class SMTPConnectionPoolTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.testing = True
+
+        with self.app.app_context():
+            db.create_all()
+
+        self.sessions = []
+
+        def connect():
+            smtp = MagicMock()
+            smtp.noop.return_value = (250, b'ok')
+            self.sessions.append(smtp)
+            return smtp
+
+        self.pool = SMTPConnectionPool('smtp.example.com', 587, max_size=2)
+        self.connect = patch.object(self.pool, '_connect', side_effect=connect)
+        self.connect.start()
+
+    def tearDown(self):
+        self.connect.stop()
+        with self.app.app_context():
+            db.session.remove()
+            for table in reversed(db.metadata.sorted_tables):
+                db.session.execute(table.delete())
+            db.session.commit()
+
+    def _send_raising(self, error):
+        self.pool.send('sender@example.com', ['warmup@example.com'], 'warmup')
+        smtp = self.sessions[0]
+        smtp.sendmail.side_effect = error
+        with self.assertRaises(type(error)):
+            self.pool.send('sender@example.com', ['user@example.com'], 'message')
+        return smtp
+
+    def test_refusals_keep_the_session_and_do_not_resend(self):
+        errors = [
+            smtplib.SMTPRecipientsRefused({'user@example.com': (550, b'no such user')}),
+            smtplib.SMTPSenderRefused(553, b'sender rejected', 'sender@example.com'),
+            smtplib.SMTPDataError(552, b'message too large'),
+        ]
+        for error in errors:
+            self.sessions.clear()
+            self.pool._idle.clear()
+            self.pool._open = 0
+            smtp = self._send_raising(error)
+
+            self.assertEqual(smtp.sendmail.call_count, 2, f"{type(error).__name__} must not be resent")
+            self.assertEqual(len(self.sessions), 1, "No new connection should be opened")
+            smtp.quit.assert_not_called()
+            self.assertEqual(self.pool._idle[0][0], smtp, "The refused session goes back to the pool")
+
+    def test_service_unavailable_discards_without_resending(self):
+        smtp = self._send_raising(smtplib.SMTPSenderRefused(421, b'closing', 'sender@example.com'))
+
+        self.assertEqual(smtp.sendmail.call_count, 2)
+        self.assertEqual(len(self.sessions), 1)
+        self.assertEqual(self.pool._idle, [])
+        self.assertEqual(self.pool._open, 0)
+
+    def test_dropped_connection_is_retried_on_a_fresh_session(self):
+        self.pool.send('sender@example.com', ['warmup@example.com'], 'warmup')
+        stale = self.sessions[0]
+        stale.sendmail.side_effect = smtplib.SMTPServerDisconnected("connection closed")
+
+        self.assertTrue(self.pool.send('sender@example.com', ['user@example.com'], 'message'))
+
+        self.assertEqual(len(self.sessions), 2)
+        self.sessions[1].sendmail.assert_called_once_with('sender@example.com', ['user@example.com'], 'message')
+        self.assertEqual([smtp for smtp, _, _ in self.pool._idle], [self.sessions[1]])
+        self.assertEqual(self.pool._open, 1)
+
+    def test_stream_refusal_keeps_the_session(self):
+        self.pool.send('sender@example.com', ['warmup@example.com'], 'warmup')
+        smtp = self.sessions[0]
+        chunks = MagicMock(return_value=iter([b'Subject: test\r\n\r\nbody\r\n']))
+        refused = smtplib.SMTPRecipientsRefused({'user@example.com': (550, b'no such user')})
+
+        with patch.object(SMTPConnectionPool, '_stream_data', side_effect=refused):
+            with self.assertRaises(smtplib.SMTPRecipientsRefused):
+                self.pool.send_stream('sender@example.com', ['user@example.com'], chunks)
+
+        chunks.assert_called_once()
+        self.assertEqual(len(self.sessions), 1)
+        smtp.quit.assert_not_called()
+        self.assertEqual(self.pool._idle[0][0], smtp)
+
+    def test_stream_data_error_is_not_resent(self):
+        chunks = MagicMock(return_value=iter([b'Subject: test\r\n\r\nbody\r\n']))
+
+        with patch.object(SMTPConnectionPool, '_stream_data', side_effect=smtplib.SMTPDataError(552, b'too large')):
+            with self.assertRaises(smtplib.SMTPDataError):
+                self.pool.send_stream('sender@example.com', ['user@example.com'], chunks)
+
+        chunks.assert_called_once()
+        self.assertEqual(len(self.sessions), 1)
+        self.assertEqual(self.pool._open, 0, "A session that failed mid-DATA is discarded")
@@ -0,0 +1,150 @@
+import os
+from unittest import TestCase
+from unittest.mock import patch
+from datetime import date, datetime, timedelta, UTC
+from api import create_app
+from api.extensions import db
+from api.models.colleges import College
+from api.models.subjects import Subject
+from api.models.serviceims import ServiceIM
+from api.models.instructionalmaterials import InstructionalMaterial
+from api.models.users import User
+from api.models.im_certificates import IMCertificate
+from api.models.email_outbox import EmailOutbox
+from api.models.pdf_objects import PdfObject
+from api.services.storage_gc_service import StorageGCService
+from tests.fake_s3 import FakeS3
+
+class StorageGCTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.testing = True
+        self.s3 = FakeS3()
+        self.patches = [
+            patch.dict(os.environ, {'AWS_BUCKET_NAME': 'bucket'}),
+            patch('api.services.storage_gc_service.get_s3_client', return_value=self.s3),
+        ]
+        for p in self.patches:
+            p.start()
+
+        with self.app.app_context():
+            db.create_all()
+            self._create_test_data()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        with self.app.app_context():
+            db.session.remove()
+            for table in reversed(db.metadata.sorted_tables):
+                db.session.execute(table.delete())
+            db.session.commit()
+
+    def _create_test_data(self):
+        college = College(abbreviation="TESTCOL", name="Test College", created_by="system", updated_by="system")
+        subject = Subject(code="TEST101", name="Test Subject", created_by="system", updated_by="system")
+        db.session.add_all([college, subject])
+        db.session.flush()
+        service_im = ServiceIM(college_id=college.id, subject_id=subject.id)
+        user = User(role="Faculty", staff_id="GC1", first_name="Gc", last_name="Author",
+                    email="gcauthor@example.com", password="testpassword", phone_number="1234567890",
+                    birth_date=date(1990, 1, 1), created_by="system", updated_by="system")
+        db.session.add_all([service_im, user])
+        db.session.flush()
+        im = InstructionalMaterial(im_type="Service", status="Published", validity="2025", version="1",
+                                   s3_link="instructional-materials/kept.pdf", created_by="system",
+                                   updated_by="system", service_im_id=service_im.id)
+        db.session.add(im)
+        db.session.flush()
+
+        # Legacy certificate: full URL in s3_link, PDF and thumbnail never recorded
+        db.session.add(IMCertificate(qr_id="CERT-1", im_id=im.id, user_id=user.id,
+                                     s3_link="https://bucket.s3.amazonaws.com/generated-certificates/CERT-1.docx",
+                                     date_issued=date(2024, 1, 1)))
+
+        now = datetime.now(UTC).replace(tzinfo=None)
+        recently_sent = EmailOutbox('files', {'attachments': [{'s3_key': 'email-attachments/recent/a.pdf'}]})
+        recently_sent.status, recently_sent.sent_at = 'sent', now - timedelta(hours=1)
+        long_sent = EmailOutbox('files', {'attachments': [{'s3_key': 'email-attachments/old/a.pdf'}]})
+        long_sent.status, long_sent.sent_at = 'sent', now - timedelta(days=30)
+        db.session.add_all([recently_sent, long_sent])
+        db.session.add(PdfObject('a' * 64, 'instructional-materials/orphan.pdf', 10))
+        db.session.commit()
+
+        two_days_ago = datetime.now(UTC) - timedelta(days=2)
+        for key in (
+            'instructional-materials/kept.pdf',
+            'instructional-materials/orphan.pdf',
+            'generated-certificates/CERT-1.docx',
+            'generated-certificates/CERT-1.pdf',
+            'generated-certificates/CERT-1.thumb.png',
+            'generated-certificates/CERT-99.pdf',
+            'email-attachments/recent/a.pdf',
+            'email-attachments/old/a.pdf',
+        ):
+            self.s3.put(key, b'data', last_modified=two_days_ago)
+        self.s3.put('instructional-materials/just-uploaded.pdf', b'data')
+
+    def test_reference_set_covers_legacy_certificates_and_urls(self):
+        with self.app.app_context():
+            referenced = StorageGCService.referenced_keys()
+
+        self.assertIn('instructional-materials/kept.pdf', referenced)
+        self.assertIn('generated-certificates/CERT-1.docx', referenced, "URL links are converted to keys")
+        self.assertIn('generated-certificates/CERT-1.pdf', referenced, "Legacy PDFs are derived from the QR ID")
+        self.assertIn('generated-certificates/CERT-1.thumb.png', referenced)
+        self.assertIn('email-attachments/recent/a.pdf', referenced, "Presigned links may still be fetched")
+        self.assertNotIn('email-attachments/old/a.pdf', referenced)
+        self.assertNotIn('generated-certificates/CERT-99.pdf', referenced)
+
+    def test_key_from_link(self):
+        self.assertEqual(StorageGCService._key_from_link('generated-certificates/CERT-1.pdf', 'bucket'),
+                         'generated-certificates/CERT-1.pdf')
+        self.assertEqual(
+            StorageGCService._key_from_link('https://bucket.s3.ap-southeast-1.amazonaws.com/a/b%20c.pdf?X-Amz-Expires=60', 'bucket'),
+            'a/b c.pdf',
+        )
+        self.assertEqual(StorageGCService._key_from_link('https://s3.amazonaws.com/bucket/a/b.pdf', 'bucket'), 'a/b.pdf')
+
+    def test_collect_deletes_only_old_orphans(self):
+        with self.app.app_context():
+            dry = StorageGCService.collect(grace_hours=24, dry_run=True, echo=lambda message: None)
+            self.assertEqual(dry['orphaned'], 3)
+            self.assertEqual(dry['deleted'], 0)
+            self.assertEqual(len(self.s3.objects), 9)
+
+            stats = StorageGCService.collect(grace_hours=24, echo=lambda message: None)
+            self.assertEqual(stats['deleted'], 3)
+            self.assertEqual(stats['too_recent'], 1)
+            self.assertEqual(PdfObject.query.count(), 0, "Catalog rows of collected objects are pruned")
+
+        self.assertEqual(sorted(self.s3.objects), [
+            'email-attachments/recent/a.pdf',
+            'generated-certificates/CERT-1.docx',
+            'generated-certificates/CERT-1.pdf',
+            'generated-certificates/CERT-1.thumb.png',
+            'instructional-materials/just-uploaded.pdf',
+            'instructional-materials/kept.pdf',
+        ])
+
+    def test_late_reference_is_not_deleted(self):
+        with self.app.app_context():
+            original = StorageGCService.referenced_keys
+
+            # A certificate row for CERT-99 is committed after the reference snapshot was taken
+            def snapshot_then_issue():
+                referenced = original()
+                user = User(role="Faculty", staff_id="GC2", first_name="Late", last_name="Author",
+                            email="lateauthor@example.com", password="testpassword", phone_number="1234567890",
+                            birth_date=date(1990, 1, 1), created_by="system", updated_by="system")
+                db.session.add(user)
+                db.session.flush()
+                db.session.add(IMCertificate(qr_id="CERT-99", im_id=InstructionalMaterial.query.first().id,
+                                             user_id=user.id, s3_link="", date_issued=date(2024, 1, 1)))
+                db.session.commit()
+                return referenced
+
+            with patch.object(StorageGCService, 'referenced_keys', side_effect=snapshot_then_issue):
+                StorageGCService.collect(grace_hours=24, echo=lambda message: None)
+
+        self.assertIn('generated-certificates/CERT-99.pdf', self.s3.objects)